@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Attendance Aggregates
+Read queries over the trigger-maintained agg_* tables, plus full-recompute checks
+"""
+
+SECTIONS_SQL = """
+    SELECT s.section_id, s.section_name, s.academic_year,
+           COALESCE(e.student_count, 0) as student_count
+    FROM sections s
+    LEFT JOIN agg_section_enrollment e ON e.section_id = s.section_id
+    ORDER BY s.section_name
+"""
+
+SECTION_COLUMNS = ('section_id', 'section_name', 'academic_year', 'student_count')
+
+SECTION_DAILY_SQL = """
+    SELECT sa.session_date, COUNT(*) as sessions,
+           SUM(sa.present_count), SUM(sa.late_count),
+           COALESCE(MAX(e.student_count), 0)
+    FROM agg_session_attendance sa
+    LEFT JOIN agg_section_enrollment e ON e.section_id = sa.section_id
+    WHERE sa.section_id = %s AND sa.session_date BETWEEN %s AND %s
+    GROUP BY sa.session_date
+    ORDER BY sa.session_date
+"""
+
+SECTION_SUBJECTS_SQL = """
+    SELECT sa.subject_name, COUNT(*) as sessions,
+           SUM(sa.present_count), SUM(sa.late_count),
+           COALESCE(MAX(e.student_count), 0)
+    FROM agg_session_attendance sa
+    LEFT JOIN agg_section_enrollment e ON e.section_id = sa.section_id
+    WHERE sa.section_id = %s
+    GROUP BY sa.subject_name
+    ORDER BY sa.subject_name
+"""
+
+STUDENT_SUBJECTS_SQL = """
+    SELECT sa.section_id, sa.subject_name, COUNT(*) as sessions,
+           COALESCE(MAX(st.present_count), 0), COALESCE(MAX(st.late_count), 0)
+    FROM student_sections ss
+    JOIN agg_session_attendance sa ON sa.section_id = ss.section_id
+    LEFT JOIN agg_student_subject st
+           ON st.person_id = ss.person_id
+          AND st.section_id = sa.section_id
+          AND st.subject_name = sa.subject_name
+    WHERE ss.person_id = %s
+    GROUP BY sa.section_id, sa.subject_name
+    ORDER BY sa.section_id, sa.subject_name
+"""
+
+# The same answers computed from attendance directly, for benchmarks and spot checks
+RECOMPUTE_SECTION_DAILY_SQL = """
+    SELECT a.timestamp::date as session_date,
+           COUNT(DISTINCT a.schedule_id) as sessions,
+           COUNT(*) FILTER (WHERE a.status = 'present'),
+           COUNT(*) FILTER (WHERE a.status = 'late'),
+           (SELECT COUNT(*) FROM student_sections ss WHERE ss.section_id = %s)
+    FROM attendance a
+    JOIN schedule sc ON sc.schedule_id = a.schedule_id
+    WHERE sc.section_id = %s AND a.status IN ('present', 'late')
+      AND a.timestamp >= %s AND a.timestamp < %s::date + 1
+    GROUP BY a.timestamp::date
+    ORDER BY session_date
+"""
+
+RECOMPUTE_SECTION_SUBJECTS_SQL = """
+    SELECT COALESCE(sc.subject_name, '') as subject_name,
+           COUNT(DISTINCT (a.schedule_id, a.timestamp::date)) as sessions,
+           COUNT(*) FILTER (WHERE a.status = 'present'),
+           COUNT(*) FILTER (WHERE a.status = 'late'),
+           (SELECT COUNT(*) FROM student_sections ss WHERE ss.section_id = %s)
+    FROM attendance a
+    JOIN schedule sc ON sc.schedule_id = a.schedule_id
+    WHERE sc.section_id = %s AND a.status IN ('present', 'late')
+    GROUP BY COALESCE(sc.subject_name, '')
+    ORDER BY subject_name
+"""
+
+RECOMPUTE_STUDENT_SUBJECTS_SQL = """
+    WITH held AS (
+        SELECT sc.section_id, COALESCE(sc.subject_name, '') as subject_name,
+               COUNT(DISTINCT (a.schedule_id, a.timestamp::date)) as sessions
+        FROM attendance a
+        JOIN schedule sc ON sc.schedule_id = a.schedule_id
+        JOIN student_sections ss ON ss.section_id = sc.section_id AND ss.person_id = %s
+        WHERE a.status IN ('present', 'late')
+        GROUP BY sc.section_id, COALESCE(sc.subject_name, '')
+    ),
+    mine AS (
+        SELECT sc.section_id, COALESCE(sc.subject_name, '') as subject_name,
+               COUNT(*) FILTER (WHERE a.status = 'present') as present_count,
+               COUNT(*) FILTER (WHERE a.status = 'late') as late_count
+        FROM attendance a
+        JOIN schedule sc ON sc.schedule_id = a.schedule_id
+        WHERE a.person_id = %s AND a.status IN ('present', 'late')
+        GROUP BY sc.section_id, COALESCE(sc.subject_name, '')
+    )
+    SELECT held.section_id, held.subject_name, held.sessions,
+           COALESCE(mine.present_count, 0), COALESCE(mine.late_count, 0)
+    FROM held
+    LEFT JOIN mine USING (section_id, subject_name)
+    ORDER BY held.section_id, held.subject_name
+"""
+
+# Each pair is (aggregate table contents, the same rows recomputed from source tables)
+CONSISTENCY_CHECKS = {
+    'section_enrollment': (
+        "SELECT section_id, student_count FROM agg_section_enrollment",
+        "SELECT section_id, COUNT(*) FROM student_sections GROUP BY section_id",
+    ),
+    'session_attendance': (
+        """SELECT schedule_id, session_date, section_id, subject_name, present_count, late_count
+           FROM agg_session_attendance""",
+        """SELECT a.schedule_id, a.timestamp::date, sc.section_id, COALESCE(sc.subject_name, ''),
+                  COUNT(*) FILTER (WHERE a.status = 'present'),
+                  COUNT(*) FILTER (WHERE a.status = 'late')
+           FROM attendance a
+           JOIN schedule sc ON sc.schedule_id = a.schedule_id
+           WHERE a.status IN ('present', 'late')
+           GROUP BY a.schedule_id, a.timestamp::date, sc.section_id, COALESCE(sc.subject_name, '')""",
+    ),
+    'student_subject': (
+        """SELECT person_id, section_id, subject_name, present_count, late_count
+           FROM agg_student_subject
+           WHERE present_count + late_count > 0""",
+        """SELECT a.person_id, sc.section_id, COALESCE(sc.subject_name, ''),
+                  COUNT(*) FILTER (WHERE a.status = 'present'),
+                  COUNT(*) FILTER (WHERE a.status = 'late')
+           FROM attendance a
+           JOIN schedule sc ON sc.schedule_id = a.schedule_id
+           WHERE a.status IN ('present', 'late')
+           GROUP BY a.person_id, sc.section_id, COALESCE(sc.subject_name, '')""",
+    ),
+}
+
+
+def _rate(attended, expected):
+    return round(100.0 * attended / expected, 2) if expected else None
+
+
+def section_rows(cursor):
+    """Sections with enrolled student counts"""
+    cursor.execute(SECTIONS_SQL)
+    return [dict(zip(SECTION_COLUMNS, row)) for row in cursor.fetchall()]
+
+
+def _rate_rows(rows, key):
+    results = []
+    for label, sessions, present, late, enrolled in rows:
+        attended = present + late
+        results.append({
+            key: label,
+            'sessions': sessions,
+            'present': present,
+            'late': late,
+            'enrolled': enrolled,
+            'attendance_percentage': _rate(attended, sessions * enrolled),
+        })
+    return results
+
+
+def section_daily(cursor, section_id, date_from, date_to, recompute=False):
+    """Per-day attendance rate for a section over a date range"""
+    if recompute:
+        cursor.execute(RECOMPUTE_SECTION_DAILY_SQL, (section_id, section_id, date_from, date_to))
+    else:
+        cursor.execute(SECTION_DAILY_SQL, (section_id, date_from, date_to))
+    rows = [(row[0].isoformat(),) + tuple(row[1:]) for row in cursor.fetchall()]
+    return _rate_rows(rows, 'date')
+
+
+def section_subjects(cursor, section_id, recompute=False):
+    """Per-subject attendance rate for a section"""
+    if recompute:
+        cursor.execute(RECOMPUTE_SECTION_SUBJECTS_SQL, (section_id, section_id))
+    else:
+        cursor.execute(SECTION_SUBJECTS_SQL, (section_id,))
+    return _rate_rows(cursor.fetchall(), 'subject_name')
+
+
+def student_subjects(cursor, person_id, recompute=False):
+    """Per-subject attendance rate for one student"""
+    if recompute:
+        cursor.execute(RECOMPUTE_STUDENT_SUBJECTS_SQL, (person_id, person_id))
+    else:
+        cursor.execute(STUDENT_SUBJECTS_SQL, (person_id,))
+    results = []
+    for section_id, subject_name, sessions, present, late in cursor.fetchall():
+        results.append({
+            'section_id': section_id,
+            'subject_name': subject_name,
+            'sessions': sessions,
+            'present': present,
+            'late': late,
+            'attendance_percentage': _rate(present + late, sessions),
+        })
+    return results
+
+
+def check_consistency(cursor):
+    """Compare every aggregate table against a full recompute"""
+    report = {}
+    for name, (actual_sql, expected_sql) in CONSISTENCY_CHECKS.items():
+        cursor.execute(f"""
+            WITH actual AS ({actual_sql}), expected AS ({expected_sql})
+            SELECT
+                (SELECT COUNT(*) FROM (SELECT * FROM expected EXCEPT SELECT * FROM actual) missing),
+                (SELECT COUNT(*) FROM (SELECT * FROM actual EXCEPT SELECT * FROM expected) unexpected)
+        """)
+        missing, unexpected = cursor.fetchone()
+        report[name] = {'missing_or_wrong': missing, 'unexpected': unexpected}
+    report['consistent'] = all(
+        check['missing_or_wrong'] == 0 and check['unexpected'] == 0
+        for check in report.values()
+    )
+    return report
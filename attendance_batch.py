@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Batched RFID Attendance
+Set-based tag resolution and multi-row inserts for bulk attendance
+"""
+
+import csv
+import io
+import logging
+from collections import namedtuple
+from datetime import datetime
+
+from psycopg2 import extensions
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+
+# Batches at least this large are staged through COPY instead of INSERT ... VALUES
+COPY_THRESHOLD = 2000
+
+RFID_LOOKUP_SQL = """
+    SELECT p.rfid_tag, p.person_id, p.name, p.id_number
+    FROM persons p
+    WHERE p.rfid_tag = ANY(%s) AND p.status = 'active' AND p.role = 'student'
+"""
+
+INSERT_VALUES_SQL = """
+    INSERT INTO attendance
+    (schedule_id, person_id, rfid_tag, status, method, confidence_score, location, notes, timestamp)
+    VALUES %s
+    ON CONFLICT (schedule_id, person_id) DO NOTHING
+    RETURNING person_id
+"""
+
+INSERT_VALUES_TEMPLATE = "(%s, %s, %s, 'present', 'rfid', 1.0, 'classroom', %s, %s)"
+
+STAGE_TABLE_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS attendance_batch_stage (
+        person_id INT,
+        rfid_tag VARCHAR(100),
+        timestamp TIMESTAMP
+    ) ON COMMIT DELETE ROWS
+"""
+
+INSERT_FROM_STAGE_SQL = """
+    INSERT INTO attendance
+    (schedule_id, person_id, rfid_tag, status, method, confidence_score, location, notes, timestamp)
+    SELECT %s, person_id, rfid_tag, 'present', 'rfid', 1.0, 'classroom', 'RFID scan: ' || rfid_tag, timestamp
+    FROM attendance_batch_stage
+    ON CONFLICT (schedule_id, person_id) DO NOTHING
+    RETURNING person_id
+"""
+
+# Confirmed non-RFID attendance (e.g. zoom), across schedules, with per-row confidence
+INSERT_CONFIRMED_SQL = """
+    WITH v (schedule_id, person_id, method, confidence_score, timestamp) AS (VALUES %s),
+    inserted AS (
+        INSERT INTO attendance
+        (schedule_id, person_id, rfid_tag, status, method, confidence_score, location, notes, timestamp)
+        SELECT v.schedule_id, v.person_id, p.rfid_tag, 'present', v.method, v.confidence_score, 'online',
+               'Confirmed ' || v.method || ' attendance', v.timestamp
+        FROM v
+        JOIN persons p ON p.person_id = v.person_id AND p.status = 'active' AND p.role = 'student'
+        ON CONFLICT (schedule_id, person_id) DO NOTHING
+        RETURNING schedule_id, person_id, rfid_tag, method, timestamp
+    )
+    SELECT i.schedule_id, i.person_id, p.name, p.id_number, i.rfid_tag, i.method, i.timestamp
+    FROM inserted i
+    JOIN persons p ON p.person_id = i.person_id
+"""
+
+INSERT_CONFIRMED_TEMPLATE = "(%s::int, %s::int, %s, %s::float, %s::timestamp)"
+
+# One written attendance row, as returned by the batch functions and passed to hooks
+AttendanceRecord = namedtuple('AttendanceRecord', 'person_id name id_number rfid_tag timestamp method')
+
+# Callables run as hook(cursor, schedule_id, records) after new rows are inserted
+_record_hooks = []
+
+
+def add_record_hook(hook):
+    """Register a hook that runs inside the inserting transaction"""
+    _record_hooks.append(hook)
+
+
+def parse_scans(attendance_data):
+    """Normalize raw scan items into (rfid_tag, timestamp) pairs"""
+    scans = []
+    for item in attendance_data:
+        rfid_tag = item['rfid_tag']
+        timestamp = datetime.fromisoformat(item.get('timestamp', datetime.now().isoformat()))
+        scans.append((rfid_tag, timestamp))
+    return scans
+
+
+def resolve_rfid_tags(cursor, rfid_tags):
+    """Map each known tag to (person_id, name, id_number) with a single query"""
+    tags = list(set(rfid_tags))
+    if not tags:
+        return {}
+    cursor.execute(RFID_LOOKUP_SQL, (tags,))
+    return {row[0]: (row[1], row[2], row[3]) for row in cursor.fetchall()}
+
+
+def insert_attendance_rows(cursor, schedule_id, rows):
+    """Insert (person_id, rfid_tag, timestamp) rows, returning the person_ids actually written"""
+    if not rows:
+        return set()
+
+    # psycopg2 cannot COPY while a green wait callback is installed (gevent workers)
+    if len(rows) >= COPY_THRESHOLD and extensions.get_wait_callback() is None:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for person_id, rfid_tag, timestamp in rows:
+            writer.writerow((person_id, rfid_tag, timestamp.isoformat()))
+        buffer.seek(0)
+
+        cursor.execute(STAGE_TABLE_SQL)
+        cursor.execute('TRUNCATE attendance_batch_stage')
+        cursor.copy_expert(
+            'COPY attendance_batch_stage (person_id, rfid_tag, timestamp) FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+        cursor.execute(INSERT_FROM_STAGE_SQL, (schedule_id,))
+        inserted = cursor.fetchall()
+    else:
+        values = [
+            (schedule_id, person_id, rfid_tag, f"RFID scan: {rfid_tag}", timestamp)
+            for person_id, rfid_tag, timestamp in rows
+        ]
+        inserted = execute_values(
+            cursor, INSERT_VALUES_SQL, values,
+            template=INSERT_VALUES_TEMPLATE, page_size=len(values), fetch=True
+        )
+    return {row[0] for row in inserted}
+
+
+def record_rfid_batch(cursor, schedule_id, scans, people=None, known=None):
+    """Mark attendance for a batch of (rfid_tag, timestamp) scans
+
+    Returns the same counters as the per-scan loop it replaces plus the
+    AttendanceRecords that were written, in scan order, and an outcomes
+    list aligned with scans ('recorded', 'duplicate' or 'unknown'). Repeated
+    scans of one student keep the first; the UNIQUE (schedule_id, person_id)
+    constraint decides against rows already in the table. people may be a
+    pre-resolved {rfid_tag: (person_id, name, id_number)} map, in which
+    case tags missing from it fail without a lookup query. known may be a
+    set of person_ids already recorded for the schedule; their scans count
+    as duplicates without reaching the insert. present_person_ids lists
+    everyone attempted, who is in the table once the transaction commits.
+    """
+    results = {
+        'successful': 0,
+        'failed': 0,
+        'duplicates': 0,
+        'known_duplicates': 0,
+        'attendance_records': [],
+        'present_person_ids': [],
+        'outcomes': ['unknown'] * len(scans)
+    }
+    outcomes = results['outcomes']
+
+    if people is None:
+        people = resolve_rfid_tags(cursor, [rfid_tag for rfid_tag, _ in scans])
+
+    candidates = []
+    positions = []
+    seen = set()
+    for position, (rfid_tag, timestamp) in enumerate(scans):
+        person = people.get(rfid_tag)
+        if not person:
+            results['failed'] += 1
+            continue
+        person_id = person[0]
+        if person_id in seen or (known is not None and person_id in known):
+            results['duplicates'] += 1
+            results['known_duplicates'] += person_id not in seen
+            outcomes[position] = 'duplicate'
+            continue
+        seen.add(person_id)
+        candidates.append((person_id, rfid_tag, timestamp))
+        positions.append(position)
+
+    inserted = insert_attendance_rows(cursor, schedule_id, candidates)
+    results['present_person_ids'] = [person_id for person_id, _, _ in candidates]
+
+    for position, (person_id, rfid_tag, timestamp) in zip(positions, candidates):
+        if person_id not in inserted:
+            results['duplicates'] += 1
+            outcomes[position] = 'duplicate'
+            continue
+        _, name, id_number = people[rfid_tag]
+        results['successful'] += 1
+        outcomes[position] = 'recorded'
+        results['attendance_records'].append(
+            AttendanceRecord(person_id, name, id_number, rfid_tag, timestamp, 'rfid')
+        )
+
+    _run_record_hooks(cursor, schedule_id, results['attendance_records'])
+
+    return results
+
+
+def record_confirmed_batch(cursor, rows):
+    """Insert (schedule_id, person_id, method, confidence_score, timestamp) rows
+
+    Rows may span schedules. Returns the AttendanceRecords actually written;
+    rows for unknown or inactive students and rows already present are skipped.
+    """
+    if not rows:
+        return []
+    written = execute_values(
+        cursor, INSERT_CONFIRMED_SQL, rows,
+        template=INSERT_CONFIRMED_TEMPLATE, page_size=len(rows), fetch=True
+    )
+
+    by_schedule = {}
+    for schedule_id, person_id, name, id_number, rfid_tag, method, timestamp in written:
+        by_schedule.setdefault(schedule_id, []).append(
+            AttendanceRecord(person_id, name, id_number, rfid_tag, timestamp, method)
+        )
+    for schedule_id, records in by_schedule.items():
+        _run_record_hooks(cursor, schedule_id, records)
+    return [record for records in by_schedule.values() for record in records]
+
+
+def _run_record_hooks(cursor, schedule_id, records):
+    if records:
+        for hook in _record_hooks:
+            hook(cursor, schedule_id, records)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Attendance Export
+Streams filtered attendance as CSV or NDJSON through a server-side cursor
+"""
+
+import io
+import csv
+import json
+import zlib
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = [
+    'attendance_id', 'timestamp', 'schedule_id', 'section_id', 'section_name', 'subject_name',
+    'person_id', 'name', 'id_number', 'rfid_tag', 'status', 'method', 'confidence_score', 'location',
+]
+
+EXPORT_SQL = """
+    SELECT a.attendance_id, a.timestamp, a.schedule_id, sc.section_id, s.section_name, sc.subject_name,
+           a.person_id, p.name, p.id_number, a.rfid_tag, a.status, a.method, a.confidence_score, a.location
+    FROM attendance a
+    JOIN schedule sc ON sc.schedule_id = a.schedule_id
+    JOIN sections s ON s.section_id = sc.section_id
+    JOIN persons p ON p.person_id = a.person_id
+    WHERE {filters}
+    ORDER BY a.timestamp, a.attendance_id
+"""
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+def build_query(section_id=None, schedule_id=None, date_from=None, date_to=None):
+    """Export SQL and parameters for the given filters; dates are inclusive"""
+    filters = []
+    params = []
+    if section_id is not None:
+        filters.append('sc.section_id = %s')
+        params.append(section_id)
+    if schedule_id is not None:
+        filters.append('a.schedule_id = %s')
+        params.append(schedule_id)
+    if date_from is not None:
+        filters.append('a.timestamp >= %s')
+        params.append(date_from)
+    if date_to is not None:
+        filters.append('a.timestamp < %s::date + 1')
+        params.append(date_to)
+    return EXPORT_SQL.format(filters=' AND '.join(filters) or 'TRUE'), params
+
+
+def iter_chunks(conn, sql, params, chunk_size=2000):
+    """Yield lists of at most chunk_size rows from a named cursor"""
+    cursor = conn.cursor(name=f'attendance_export_{uuid.uuid4().hex[:12]}')
+    cursor.itersize = chunk_size
+    try:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+
+def _value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def csv_chunks(chunks):
+    """Encode row chunks as CSV, header first, one bytes object per chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    yield buffer.getvalue().encode()
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode()
+
+
+def ndjson_chunks(chunks):
+    """Encode row chunks as newline-delimited JSON objects, one bytes object per chunk"""
+    for rows in chunks:
+        yield ''.join(
+            json.dumps(dict(zip(COLUMNS, [_value(value) for value in row]))) + '\n'
+            for row in rows
+        ).encode()
+
+
+ENCODERS = {
+    'csv': csv_chunks,
+    'ndjson': ndjson_chunks,
+}
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a byte stream into a single gzip member as it goes"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(conn, fmt, sql, params, chunk_size=2000, gzip=False):
+    """Encoded export body as a generator of bytes"""
+    try:
+        body = ENCODERS[fmt](iter_chunks(conn, sql, params, chunk_size))
+        if gzip:
+            body = gzip_chunks(body)
+        yield from body
+    except Exception as e:
+        # Headers are already sent, so the client sees a truncated body
+        logger.error(f"Attendance export error: {e}")
+        raise
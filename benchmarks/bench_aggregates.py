@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Attendance Aggregates Benchmark
+Analytics queries from the trigger-maintained aggregates versus a full recompute
+over a synthetic academic year, plus consistency checks after edits
+
+Usage: BENCH_DB_HOST=localhost python benchmarks/bench_aggregates.py --sections 20 --weeks 40
+"""
+
+import random
+import argparse
+import statistics
+from datetime import date, datetime, time, timedelta
+
+from psycopg2.extras import execute_values
+
+from common import connect, scratch_schema, seed_students, timed, emit
+
+import aggregates
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+
+ATTENDANCE_SQL = """
+    INSERT INTO attendance (schedule_id, person_id, rfid_tag, status, method, timestamp)
+    SELECT o.schedule_id, ss.person_id, p.rfid_tag,
+           CASE WHEN random() < %s THEN 'late' ELSE 'present' END, 'rfid', o.at
+    FROM unnest(%s::int[], %s::int[], %s::timestamp[]) AS o(schedule_id, section_id, at)
+    JOIN student_sections ss ON ss.section_id = o.section_id
+    JOIN persons p ON p.person_id = ss.person_id
+    WHERE random() < %s
+"""
+
+
+def seed_year(cursor, args):
+    """Sections, students and one schedule row per class session, then a year of attendance
+
+    attendance is UNIQUE (schedule_id, person_id), so each weekly occurrence
+    of a subject gets its own schedule row.
+    """
+    cursor.execute("SELECT setseed(%s)", (args.seed / 1000.0,))
+    cursor.execute("""
+        INSERT INTO persons (name, rfid_tag, role, id_number)
+        VALUES ('Bench Teacher', 'BENCHTEACHER', 'teacher', 'BT1')
+        RETURNING person_id
+    """)
+    teacher_id = cursor.fetchone()[0]
+    cursor.execute("INSERT INTO classrooms (room_number) VALUES ('BENCH-101') RETURNING classroom_id")
+    classroom_id = cursor.fetchone()[0]
+
+    section_ids = []
+    for index in range(args.sections):
+        cursor.execute(
+            "INSERT INTO sections (section_name) VALUES (%s) RETURNING section_id",
+            (f'Y{index:03d}',)
+        )
+        section_id = cursor.fetchone()[0]
+        seed_students(cursor, args.students, section_id, prefix=f'Y{index:03d}-')
+        section_ids.append(section_id)
+
+    start = date.today() - timedelta(weeks=args.weeks)
+    start -= timedelta(days=start.weekday())
+    sessions = []
+    for section_id in section_ids:
+        for subject in range(args.subjects):
+            day = subject % len(DAYS)
+            begins = time(9 + subject // len(DAYS))
+            for week in range(args.weeks):
+                at = datetime.combine(start + timedelta(weeks=week, days=day), begins)
+                sessions.append((section_id, f'Subject {subject + 1}', DAYS[day], begins, at))
+
+    schedule_ids = execute_values(cursor, """
+        INSERT INTO schedule (section_id, teacher_id, classroom_id, subject_name, day_of_week, start_time, end_time)
+        VALUES %s RETURNING schedule_id
+    """, [
+        (section_id, teacher_id, classroom_id, subject, day, begins, time(begins.hour + 1))
+        for section_id, subject, day, begins, _ in sessions
+    ], page_size=1000, fetch=True)
+
+    by_week = {}
+    for (schedule_id,), (section_id, _, _, _, at) in zip(schedule_ids, sessions):
+        by_week.setdefault(at.isocalendar()[:2], []).append((schedule_id, section_id, at))
+    return section_ids, start, by_week
+
+
+def load_attendance(cursor, by_week, args):
+    """One INSERT per week, so the statement triggers see realistic batch sizes"""
+    for week in sorted(by_week):
+        schedule_ids, section_ids, timestamps = zip(*by_week[week])
+        cursor.execute(ATTENDANCE_SQL, (
+            args.late_rate, list(schedule_ids), list(section_ids), list(timestamps), args.present_rate
+        ))
+
+
+def compare(cursor, label, fn, arg_sets, repeat):
+    """Best and median time per call for the aggregate read and the full recompute"""
+    row = {'query': label}
+    answers = {}
+    for mode in ('aggregate', 'recompute'):
+        timings = []
+        for _ in range(repeat):
+            for args in arg_sets:
+                run = {}
+                with timed(run, 'ms'):
+                    answer = fn(cursor, *args, recompute=(mode == 'recompute'))
+                timings.append(run['ms'])
+                answers.setdefault(mode, {})[args] = answer
+        row[mode] = {'best_ms': min(timings), 'median_ms': round(statistics.median(timings), 3)}
+    row['speedup'] = round(row['recompute']['median_ms'] / max(row['aggregate']['median_ms'], 1e-6), 1)
+    row['answers_match'] = answers['aggregate'] == answers['recompute']
+    return row
+
+
+def consistency(cursor, report, key):
+    run = {}
+    with timed(run, 'ms'):
+        result = aggregates.check_consistency(cursor)
+    result['elapsed_ms'] = run['ms']
+    report[key] = result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sections', type=int, default=20)
+    parser.add_argument('--students', type=int, default=60)
+    parser.add_argument('--subjects', type=int, default=6)
+    parser.add_argument('--weeks', type=int, default=40)
+    parser.add_argument('--present-rate', type=float, default=0.85)
+    parser.add_argument('--late-rate', type=float, default=0.1)
+    parser.add_argument('--samples', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report = {'benchmark': 'aggregates', 'config': vars(args)}
+
+    with scratch_schema() as schema:
+        conn = connect(schema)
+        cursor = conn.cursor()
+
+        with timed(report, 'seed_ms'):
+            section_ids, start, by_week = seed_year(cursor, args)
+            conn.commit()
+        with timed(report, 'load_attendance_with_triggers_ms'):
+            load_attendance(cursor, by_week, args)
+            conn.commit()
+        cursor.execute('ANALYZE')
+        conn.commit()
+
+        cursor.execute("SELECT COUNT(*) FROM attendance")
+        report['attendance_rows'] = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM agg_session_attendance")
+        report['session_rows'] = cursor.fetchone()[0]
+
+        sampled_sections = rng.sample(section_ids, min(args.samples, len(section_ids)))
+        cursor.execute(
+            "SELECT person_id FROM student_sections WHERE section_id = ANY(%s)", (sampled_sections,)
+        )
+        sampled_students = rng.sample([row[0] for row in cursor.fetchall()], args.samples)
+        month_from = (start + timedelta(weeks=args.weeks // 2)).isoformat()
+        month_to = (start + timedelta(weeks=args.weeks // 2, days=30)).isoformat()
+
+        report['queries'] = [
+            compare(cursor, 'section_daily_30d', aggregates.section_daily,
+                    [(section_id, month_from, month_to) for section_id in sampled_sections], args.repeat),
+            compare(cursor, 'section_daily_year', aggregates.section_daily,
+                    [(section_id, start.isoformat(), date.today().isoformat()) for section_id in sampled_sections],
+                    args.repeat),
+            compare(cursor, 'section_subjects', aggregates.section_subjects,
+                    [(section_id,) for section_id in sampled_sections], args.repeat),
+            compare(cursor, 'student_subjects', aggregates.student_subjects,
+                    [(person_id,) for person_id in sampled_students], args.repeat),
+        ]
+        with timed(report, 'sections_list_ms'):
+            aggregates.section_rows(cursor)
+        conn.rollback()
+
+        consistency(cursor, report, 'consistency_after_load')
+
+        # Edits the triggers must follow: late marks, date fixes, removals, a transfer and timetable changes
+        with timed(report, 'edits_ms'):
+            cursor.execute("UPDATE attendance SET status = 'late' WHERE attendance_id % 97 = 0")
+            cursor.execute("UPDATE attendance SET timestamp = timestamp + interval '1 day' WHERE attendance_id % 311 = 0")
+            cursor.execute("DELETE FROM attendance WHERE attendance_id % 53 = 0")
+            cursor.execute("DELETE FROM student_sections WHERE person_id = %s", (sampled_students[0],))
+            cursor.execute("UPDATE schedule SET subject_name = 'Renamed' WHERE schedule_id = (SELECT MAX(schedule_id) FROM schedule)")
+            cursor.execute("DELETE FROM schedule WHERE schedule_id = (SELECT MIN(schedule_id) FROM schedule)")
+            conn.commit()
+        consistency(cursor, report, 'consistency_after_edits')
+
+        with timed(report, 'full_rebuild_ms'):
+            cursor.execute("SELECT attendance_aggregates_rebuild()")
+            conn.commit()
+        consistency(cursor, report, 'consistency_after_rebuild')
+        conn.rollback()
+
+        cursor.close()
+        conn.close()
+
+    emit(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Worker Mode Benchmark
+Starts the app under gunicorn sync, gthread and gevent workers in turn and
+drives each with the same 1,000 concurrent keep-alive clients, reporting
+throughput, latency, client errors and the PostgreSQL connections each mode
+holds (sampled from pg_stat_activity) while under load
+
+Seed first with seed_load.py; the servers read its schema from the manifest.
+
+Usage: BENCH_DB_HOST=localhost python benchmarks/bench_async_workers.py --clients 1000 --duration 30
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import statistics
+import threading
+import subprocess
+import http.client
+
+from common import REPO_ROOT, BENCH_DB_CONFIG, connect, emit
+from seed_load import DEFAULT_MANIFEST
+from load_test import run_phase, parse_mix
+
+GEVENT_CONFIG = os.path.join(REPO_ROOT, 'gunicorn_gevent.conf.py')
+
+ACTIVITY_SQL = """
+    SELECT COUNT(*), COUNT(*) FILTER (WHERE state = 'active'), COUNT(*) FILTER (WHERE state LIKE 'idle in%%')
+    FROM pg_stat_activity
+    WHERE application_name = %s
+"""
+
+
+def worker_args(mode, args):
+    if mode == 'sync':
+        return ['--workers', str(args.workers)]
+    if mode == 'gthread':
+        return ['--workers', str(args.workers), '--worker-class', 'gthread', '--threads', str(args.threads)]
+    if mode == 'gevent':
+        return ['--config', GEVENT_CONFIG, '--workers', str(args.workers)]
+    raise SystemExit(f'Unknown mode {mode!r}; expected sync, gthread or gevent')
+
+
+def start_server(mode, args, manifest):
+    """Launch gunicorn for mode and wait for /health; returns (process, application_name)"""
+    application_name = f'bench-{mode}-{os.getpid()}'
+    env = dict(
+        os.environ,
+        PGOPTIONS=f"-c search_path={manifest['schema']},public",
+        PGAPPNAME=application_name,
+        DB_HOST=BENCH_DB_CONFIG['host'],
+        DB_PORT=str(BENCH_DB_CONFIG['port']),
+        DB_NAME=BENCH_DB_CONFIG['database'],
+        DB_USER=BENCH_DB_CONFIG['user'],
+        DB_PASSWORD=BENCH_DB_CONFIG['password'],
+        DB_SSLMODE=BENCH_DB_CONFIG['sslmode'],
+        DB_POOL_MAX=str(args.pool_max),
+        METRICS_DIR=os.path.join(REPO_ROOT, 'spool', f'metrics-bench-{mode}'),
+        ONLINE_SESSIONS_ENABLED='false',
+    )
+    command = [sys.executable, '-m', 'gunicorn', *worker_args(mode, args),
+               '--bind', f'127.0.0.1:{args.port}', '--timeout', '120', 'updated_app_render_ready:app']
+    log = open(os.path.join(REPO_ROOT, 'spool', f'bench-{mode}.log'), 'w')
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'gunicorn ({mode}) exited with {process.returncode}; see spool/bench-{mode}.log')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', args.port, timeout=2)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return process, application_name
+        except OSError:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise SystemExit(f'gunicorn ({mode}) did not answer /health within 60s')
+
+
+class ActivitySampler:
+    """Counts the server's PostgreSQL backends every interval seconds in a background thread"""
+
+    def __init__(self, application_name, interval=0.25):
+        self.application_name = application_name
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        conn = connect()
+        conn.autocommit = True
+        cursor = conn.cursor()
+        while not self._stop.wait(self.interval):
+            cursor.execute(ACTIVITY_SQL, (self.application_name,))
+            self.samples.append(cursor.fetchone())
+        conn.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self):
+        if not self.samples:
+            return {}
+        held, active, idle_in_transaction = zip(*self.samples)
+        return {
+            'held_max': max(held),
+            'held_median': statistics.median(held),
+            'active_max': max(active),
+            'active_median': statistics.median(active),
+            'idle_in_transaction_max': max(idle_in_transaction),
+        }
+
+
+def totals(phase):
+    endpoints = phase['endpoints'].values()
+    requests = sum(endpoint['requests'] for endpoint in endpoints)
+    return {
+        'requests': requests,
+        'ok': sum(endpoint['ok'] for endpoint in endpoints),
+        'errors': sum(endpoint['errors'] for endpoint in endpoints),
+        'throughput_rps': round(requests / phase['elapsed_seconds'], 2),
+        'p99_ms': max((endpoint.get('p99_ms', 0.0) for endpoint in endpoints), default=0.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST)
+    parser.add_argument('--modes', default='sync,gthread,gevent')
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers in every mode')
+    parser.add_argument('--threads', type=int, default=50, help='threads per gthread worker')
+    parser.add_argument('--pool-max', type=int, default=10, help='DB_POOL_MAX per worker')
+    parser.add_argument('--mix', default='schedules=4,bulk=2,sections=3')
+    parser.add_argument('--scans', type=int, default=40)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--port', type=int, default=5100)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+    mix = parse_mix(args.mix)
+
+    # One socket per client plus headroom
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < args.clients + 256:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, args.clients + 1024), hard))
+
+    phase_args = argparse.Namespace(
+        base_url=f'http://127.0.0.1:{args.port}', concurrency=args.clients,
+        scans=args.scans, timeout=args.timeout, seed=args.seed,
+    )
+    report = {'benchmark': 'worker_modes', 'config': vars(args), 'schema': manifest['schema'], 'modes': {}}
+    for mode in args.modes.split(','):
+        process, application_name = start_server(mode, args, manifest)
+        try:
+            result = {}
+            try:
+                if args.warmup > 0:
+                    run_phase(phase_args, manifest, mix, args.warmup, record=False)
+                with ActivitySampler(application_name) as sampler:
+                    phase = run_phase(phase_args, manifest, mix, args.duration)
+                result.update(totals(phase), connections=sampler.summary(), endpoints=phase['endpoints'],
+                              client_cpu_ratio=phase['client_cpu_ratio'])
+            except SystemExit as e:
+                # Typically clients timing out at login because the mode cannot admit them all
+                result['failed'] = str(e)
+            report['modes'][mode] = result
+        finally:
+            process.terminate()
+            process.wait(timeout=60)
+
+    emit(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Bulk Attendance Benchmark
+Per-scan queries versus the batched engine at 50, 500 and 5,000 scans
+
+Usage: BENCH_DB_HOST=localhost python benchmarks/bench_bulk_attendance.py
+"""
+
+import random
+import argparse
+from datetime import datetime
+
+from common import connect, scratch_schema, seed_students, timed, emit
+
+import attendance_batch
+
+
+def per_row_attendance(cursor, schedule_id, attendance_data):
+    """The original three-queries-per-scan loop, kept as the baseline"""
+    results = {'successful': 0, 'failed': 0, 'duplicates': 0, 'attendance_records': []}
+    for item in attendance_data:
+        rfid_tag = item['rfid_tag']
+        timestamp = datetime.fromisoformat(item.get('timestamp', datetime.now().isoformat()))
+        cursor.execute("""
+            SELECT p.person_id, p.name, p.id_number
+            FROM persons p
+            WHERE p.rfid_tag = %s AND p.status = 'active' AND p.role = 'student'
+        """, (rfid_tag,))
+        person_result = cursor.fetchone()
+        if not person_result:
+            results['failed'] += 1
+            continue
+        person_id, name, id_number = person_result
+        cursor.execute("""
+            SELECT attendance_id FROM attendance
+            WHERE schedule_id = %s AND person_id = %s
+        """, (schedule_id, person_id))
+        if cursor.fetchone():
+            results['duplicates'] += 1
+            continue
+        cursor.execute("""
+            INSERT INTO attendance
+            (schedule_id, person_id, rfid_tag, status, method, confidence_score, location, notes, timestamp)
+            VALUES (%s, %s, %s, 'present', 'rfid', %s, 'classroom', %s, %s)
+        """, (schedule_id, person_id, rfid_tag, 1.0, f"RFID scan: {rfid_tag}", timestamp))
+        results['successful'] += 1
+        results['attendance_records'].append({'person_id': person_id, 'name': name})
+    return results
+
+
+def batched_attendance(cursor, schedule_id, attendance_data):
+    scans = attendance_batch.parse_scans(attendance_data)
+    return attendance_batch.record_rfid_batch(cursor, schedule_id, scans)
+
+
+def make_scans(tags, count, rng):
+    """count scans: mostly known tags, ~5% repeats and ~5% unknown tags"""
+    now = datetime.now().isoformat()
+    picked = rng.sample(tags, min(count, len(tags)))
+    scans = [{'rfid_tag': tag, 'timestamp': now} for tag in picked[:int(count * 0.9)]]
+    while len(scans) < int(count * 0.95):
+        scans.append({'rfid_tag': rng.choice(picked), 'timestamp': now})
+    while len(scans) < count:
+        scans.append({'rfid_tag': f'UNKNOWN{len(scans)}', 'timestamp': now})
+    rng.shuffle(scans)
+    return scans
+
+
+def summary(results):
+    return {key: results[key] for key in ('successful', 'duplicates', 'failed')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='50,500,5000')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    rng = random.Random(args.seed)
+    report = {'benchmark': 'bulk_attendance', 'repeat': args.repeat, 'sizes': []}
+
+    with scratch_schema() as schema:
+        conn = connect(schema)
+        cursor = conn.cursor()
+        tags = seed_students(cursor, max(sizes))
+        conn.commit()
+
+        for size in sizes:
+            scans = make_scans(tags, size, rng)
+            row = {'scans': size}
+            for name, fn in (('per_row', per_row_attendance), ('batched', batched_attendance)):
+                timings = []
+                for _ in range(args.repeat):
+                    cursor.execute('TRUNCATE attendance')
+                    conn.commit()
+                    run = {}
+                    with timed(run, 'ms'):
+                        results = fn(cursor, 1, scans)
+                        conn.commit()
+                    timings.append(run['ms'])
+                row[name] = {'best_ms': min(timings), 'runs_ms': timings, 'summary': summary(results)}
+            row['speedup'] = round(row['per_row']['best_ms'] / max(row['batched']['best_ms'], 1e-6), 2)
+            row['summaries_match'] = row['per_row']['summary'] == row['batched']['summary']
+            report['sizes'].append(row)
+
+        cursor.close()
+        conn.close()
+
+    emit(report)
+
+
+if __name__ == '__main__':
+    main()
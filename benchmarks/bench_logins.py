@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Login Benchmark
+The start-of-day login burst: every teacher logs in a few times (laptop,
+phone, a re-login) from many concurrent clients. Compares logins per second
+and latency for:
+
+  before         SELECT ... AND password = %s, then UPDATE last_login and commit, per login
+  inline_bcrypt  one SELECT, bcrypt checked in the request thread, UPDATE and commit per login
+  after          the logins module: credential cache, bcrypt in the bounded pool, batched last_login
+
+Users are stored with bcrypt hashes, except for the before mode, whose SQL
+comparison needs plaintext.
+
+Usage: BENCH_DB_HOST=localhost python benchmarks/bench_logins.py --teachers 300 --repeats 3 --concurrency 32
+"""
+
+import time
+import random
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from common import BENCH_DB_CONFIG, connect, scratch_schema, emit
+
+import db_pool
+import logins
+
+PLAINTEXT_SQL = """
+    SELECT u.id, u.username, u.role, p.name
+    FROM users u
+    LEFT JOIN persons p ON u.person_id = p.person_id
+    WHERE u.username = %s AND u.password = %s
+"""
+
+
+def seed_users(cursor, count, stored):
+    cursor.execute("""
+        INSERT INTO users (username, password, role)
+        SELECT 'bench-teacher-' || g, %s, 'teacher'
+        FROM generate_series(1, %s) g
+    """, (stored, count))
+
+
+def login_before(username, password):
+    with db_pool.db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(PLAINTEXT_SQL, (username, password))
+        user = cursor.fetchone()
+        if user:
+            cursor.execute("UPDATE users SET last_login = NOW() WHERE id = %s", (user[0],))
+            conn.commit()
+        cursor.close()
+    return user is not None
+
+
+def login_inline_bcrypt(username, password):
+    with db_pool.db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(logins.CREDENTIALS_SQL, (username,))
+        credentials = cursor.fetchone()
+        matched = bool(credentials) and logins.check_password(password, credentials[4])
+        if matched:
+            cursor.execute("UPDATE users SET last_login = NOW() WHERE id = %s", (credentials[0],))
+            conn.commit()
+        cursor.close()
+    return matched
+
+
+def make_login_after(cache, pool, writer):
+    """The /login flow with the database, hashing and last_login write split apart"""
+    def login_after(username, password):
+        user = cache.get(username, password)
+        if user is None:
+            credentials = None
+            with db_pool.db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(logins.CREDENTIALS_SQL, (username,))
+                credentials = cursor.fetchone()
+                cursor.close()
+            if credentials and pool.check(password, credentials[4], timeout=30):
+                user = credentials[:4]
+                cache.put(username, password, user)
+        if user:
+            writer.touch(user[0])
+        return user is not None
+    return login_after
+
+
+def run(login, attempts, concurrency):
+    """Time every attempt from concurrency client threads"""
+    def timed_login(attempt):
+        started = time.perf_counter()
+        ok = login(*attempt)
+        return ok, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        results = list(clients.map(timed_login, attempts))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(ms for _, ms in results)
+    return {
+        'logins': len(results),
+        'ok': sum(ok for ok, _ in results),
+        'seconds': round(elapsed, 3),
+        'logins_per_second': round(len(results) / elapsed, 2),
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--teachers', type=int, default=300)
+    parser.add_argument('--repeats', type=int, default=3, help='logins per teacher')
+    parser.add_argument('--concurrency', type=int, default=32, help='concurrent clients')
+    parser.add_argument('--rounds', type=int, default=10, help='bcrypt cost, as in enhanced_schema.sql ($2a$10$)')
+    parser.add_argument('--hash-threads', type=int, default=4, help='LOGIN_HASH_THREADS')
+    parser.add_argument('--pool-max', type=int, default=10, help='DB_POOL_MAX')
+    parser.add_argument('--password', default='bench-password')
+    parser.add_argument('--modes', default='before,inline_bcrypt,after')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    hashed = bcrypt.hashpw(args.password.encode(), bcrypt.gensalt(args.rounds)).decode()
+    attempts = [(f'bench-teacher-{index % args.teachers + 1}', args.password)
+                for index in range(args.teachers * args.repeats)]
+    rng.shuffle(attempts)
+    report = {'benchmark': 'logins', 'config': vars(args), 'modes': {}}
+
+    with scratch_schema() as schema:
+        conn = connect(schema)
+        conn.autocommit = True
+        cursor = conn.cursor()
+        seed_users(cursor, args.teachers, hashed)
+        db_pool.configure(dict(BENCH_DB_CONFIG, options=f'-c search_path={schema},public'), maxconn=args.pool_max)
+
+        for mode in args.modes.split(','):
+            stored = args.password if mode == 'before' else hashed
+            cursor.execute("UPDATE users SET password = %s, last_login = NULL", (stored,))
+            if mode == 'before':
+                result = run(login_before, attempts, args.concurrency)
+            elif mode == 'inline_bcrypt':
+                result = run(login_inline_bcrypt, attempts, args.concurrency)
+            elif mode == 'after':
+                cache = logins.CredentialCache()
+                pool = logins.PasswordPool(max_workers=args.hash_threads, max_pending=args.teachers * args.repeats)
+                writer = logins.LastLoginWriter()
+                result = run(make_login_after(cache, pool, writer), attempts, args.concurrency)
+                # The writer's flush is part of the cost; it runs off the request path in the app
+                flush_started = time.perf_counter()
+                while writer.flush() >= writer.batch_size:
+                    pass
+                result['last_login_flush_ms'] = round((time.perf_counter() - flush_started) * 1000, 3)
+                result.update(login_cache=cache.stats(), password_pool=pool.stats(), last_login=writer.stats())
+            else:
+                raise SystemExit(f'Unknown mode {mode!r}')
+            cursor.execute("SELECT COUNT(*) FROM users WHERE last_login IS NOT NULL")
+            result['last_login_set'] = cursor.fetchone()[0]
+            report['modes'][mode] = result
+
+        db_pool.get_pool().closeall()
+        cursor.close()
+        conn.close()
+
+    modes = report['modes']
+    if 'after' in modes:
+        for mode in ('before', 'inline_bcrypt'):
+            if mode in modes:
+                report[f'speedup_vs_{mode}'] = round(
+                    modes['after']['logins_per_second'] / max(modes[mode]['logins_per_second'], 1e-6), 2
+                )
+    emit(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Online Session Load Test
+Hundreds of concurrent sessions x dozens of faces at several frames per second
+through the confirmation engine, optionally writing marks to a scratch schema
+
+Usage: python benchmarks/bench_online_sessions.py --sessions 300 --faces 40 --fps 4 --minutes 8
+       BENCH_DB_HOST=localhost python benchmarks/bench_online_sessions.py --db
+"""
+
+import time
+import random
+import argparse
+import threading
+import tracemalloc
+from contextlib import nullcontext
+
+from common import BENCH_DB_CONFIG, connect, scratch_schema, seed_students, emit
+
+import db_pool
+from online_sessions import SessionEngine
+
+
+def seed_sessions(cursor, sessions, faces):
+    """One schedule row and `faces` enrolled students per session; returns (schedule_id, person_ids) pairs"""
+    cursor.execute("SELECT person_id FROM persons WHERE role = 'teacher' LIMIT 1")
+    teacher_id = cursor.fetchone()[0]
+    seed_students(cursor, sessions * faces, prefix='ZOOM')
+    cursor.execute("SELECT person_id FROM persons WHERE rfid_tag LIKE 'ZOOM%' ORDER BY person_id")
+    people = [row[0] for row in cursor.fetchall()]
+    cursor.execute("""
+        INSERT INTO schedule (section_id, teacher_id, classroom_id, subject_name, day_of_week, start_time, end_time, class_type)
+        SELECT 1, %s, 1, 'Online ' || g, 'Monday', '09:00', '10:00', 'online'
+        FROM generate_series(1, %s) g
+        RETURNING schedule_id
+    """, (teacher_id, sessions))
+    schedule_ids = [row[0] for row in cursor.fetchall()]
+    return [(schedule_id, people[i * faces:(i + 1) * faces]) for i, schedule_id in enumerate(schedule_ids)]
+
+
+def drive(engine, rosters, args, rng, latencies):
+    """Replay every frame of every session in simulated time, as fast as the engine accepts them
+
+    Every tenth frame's ingest latency is sampled.
+    """
+    start = time.time()
+    frames = int(args.minutes * 60 * args.fps)
+    for frame in range(frames):
+        now = start + frame / args.fps
+        for meeting_id, people in rosters:
+            detections = [
+                (person_id, rng.uniform(0.6, 1.0), now)
+                for person_id in people
+                if rng.random() < args.visibility
+            ]
+            started = time.perf_counter()
+            engine.ingest(meeting_id, detections, now=now)
+            if frame % 10 == 0:
+                latencies.append(time.perf_counter() - started)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sessions', type=int, default=300)
+    parser.add_argument('--faces', type=int, default=40)
+    parser.add_argument('--fps', type=float, default=4)
+    parser.add_argument('--minutes', type=float, default=8)
+    parser.add_argument('--visibility', type=float, default=0.9, help='chance a face is detected in a frame')
+    parser.add_argument('--threads', type=int, default=1, help='concurrent ingest threads, sessions split between them')
+    parser.add_argument('--db', action='store_true', help='write marks to a scratch schema')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    report = {'benchmark': 'online_sessions', 'config': vars(args)}
+    engine = SessionEngine()
+
+    with (scratch_schema() if args.db else nullcontext()) as schema:
+        if args.db:
+            conn = connect(schema)
+            cursor = conn.cursor()
+            seeded = seed_sessions(cursor, args.sessions, args.faces)
+            conn.commit()
+            conn.close()
+            db_pool.configure(dict(BENCH_DB_CONFIG, options=f'-c search_path={schema},public'), maxconn=2)
+        else:
+            people = iter(range(1, args.sessions * args.faces + 1))
+            seeded = [(i + 1, [next(people) for _ in range(args.faces)]) for i in range(args.sessions)]
+
+        tracemalloc.start()
+        rosters = []
+        for schedule_id, people in seeded:
+            meeting_id = f'meeting-{schedule_id}'
+            engine.start_session(meeting_id, schedule_id)
+            rosters.append((meeting_id, people))
+
+        writer_stop = threading.Event()
+        write_times = []
+
+        def write_loop():
+            while not writer_stop.wait(engine.flush_interval):
+                started = time.perf_counter()
+                if engine.flush():
+                    write_times.append(time.perf_counter() - started)
+
+        writer = threading.Thread(target=write_loop, daemon=True) if args.db else None
+        if writer:
+            writer.start()
+
+        latencies = []
+        groups = [rosters[i::args.threads] for i in range(args.threads)]
+        threads = [
+            threading.Thread(target=drive, args=(engine, group, args, random.Random(args.seed + i), latencies))
+            for i, group in enumerate(groups)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        if writer:
+            writer_stop.set()
+            writer.join()
+            while engine.flush():
+                pass
+
+        stats = engine.stats()
+        simulated = args.minutes * 60
+        report.update({
+            'wall_seconds': round(elapsed, 2),
+            'simulated_seconds': simulated,
+            'realtime_factor': round(simulated / elapsed, 2),
+            'detections_per_second': round(stats['detections'] / elapsed, 1),
+            'frame_ingest_p50_us': round(percentile(latencies, 0.5) * 1e6, 1),
+            'frame_ingest_p99_us': round(percentile(latencies, 0.99) * 1e6, 1),
+            'tracemalloc_current_mb': round(current / 1e6, 2),
+            'tracemalloc_peak_mb': round(peak / 1e6, 2),
+            'bytes_per_tracked_student': round(current / max(stats['tracked_students'], 1), 1),
+            'engine': stats,
+        })
+        if args.db:
+            report['write_batches'] = len(write_times)
+            report['avg_write_ms'] = round(sum(write_times) * 1000 / len(write_times), 3) if write_times else 0.0
+            conn = connect(schema)
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*), AVG(confidence_score) FROM attendance WHERE method = 'zoom'")
+            rows, confidence = cursor.fetchone()
+            report['zoom_rows_written'] = rows
+            report['avg_confidence_written'] = round(confidence, 4) if confidence else None
+            conn.close()
+            db_pool.get_pool().closeall()
+
+    emit(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Attendance Partitioning Benchmark
+Query plans and timings for the hot attendance queries on the old single-heap
+layout versus the migrated layout (term partitions and query-shaped indexes)
+
+Both schemas start from the pre-migration layout and receive the same terms
+of data. The "after" schema is migrated with migrate.py once its first term
+is loaded, then opens a new partition per term, so the run also exercises
+the migration on a populated table.
+
+Usage: BENCH_DB_HOST=localhost python benchmarks/bench_partitioning.py --terms 4 --weeks 16
+"""
+
+import random
+import argparse
+import statistics
+from datetime import date, datetime, time, timedelta
+
+from psycopg2.extras import execute_values
+
+from common import connect, scratch_schema, timed, emit
+from seed_load import DAYS, seed_people, load_attendance
+
+import migrate
+import aggregates
+import attendance_batch
+
+# The attendance layout and indexes from before migrations 001 and 004; 002 and 003 re-run over the objects kept
+LEGACY_LAYOUT_SQL = """
+    DROP TABLE attendance CASCADE;
+    DROP TABLE attendance_terms;
+    DROP FUNCTION attendance_start_term(TEXT);
+    DROP INDEX idx_persons_active_student_rfid;
+    CREATE INDEX idx_persons_rfid ON persons(rfid_tag);
+
+    CREATE TABLE attendance (
+        attendance_id SERIAL PRIMARY KEY,
+        schedule_id INT REFERENCES schedule(schedule_id) ON DELETE CASCADE,
+        person_id INT REFERENCES persons(person_id) ON DELETE CASCADE,
+        rfid_tag VARCHAR(100),
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        status VARCHAR(10) CHECK (status IN ('present', 'absent', 'late')) DEFAULT 'present',
+        method VARCHAR(20) DEFAULT 'rfid' CHECK (method IN ('rfid', 'face', 'manual', 'zoom')),
+        confidence_score FLOAT,
+        location VARCHAR(50),
+        notes TEXT,
+        UNIQUE (schedule_id, person_id)
+    );
+    CREATE INDEX idx_attendance_schedule_id ON attendance(schedule_id);
+    CREATE INDEX idx_attendance_person_id ON attendance(person_id);
+    CREATE INDEX idx_attendance_timestamp ON attendance(timestamp);
+
+    CREATE TRIGGER attendance_aggregates_insert
+        AFTER INSERT ON attendance REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION attendance_aggregates_insert();
+    CREATE TRIGGER attendance_aggregates_delete
+        AFTER DELETE ON attendance REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION attendance_aggregates_delete();
+    CREATE TRIGGER attendance_aggregates_update
+        AFTER UPDATE ON attendance REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION attendance_aggregates_update();
+
+    DELETE FROM schema_migrations;
+"""
+
+DUPLICATE_CHECK_SQL = "SELECT attendance_id FROM attendance WHERE schedule_id = %s AND person_id = %s"
+
+STUDENT_HISTORY_SQL = """
+    SELECT a.timestamp, a.schedule_id, a.status
+    FROM attendance a
+    WHERE a.person_id = %s AND a.timestamp >= %s
+    ORDER BY a.timestamp
+"""
+
+
+def seed_term(cursor, args, term, people):
+    """One schedule row per weekly session of the term, then its attendance; returns the term's schedule_ids"""
+    teacher_ids, classroom_ids, section_ids = people
+    start = date.today() - timedelta(weeks=args.weeks * (args.terms - term))
+    start -= timedelta(days=start.weekday())
+    sessions = []
+    for section_index, section_id in enumerate(section_ids):
+        for subject in range(args.subjects):
+            day = (section_index + subject) % len(DAYS)
+            begins = time(8 + subject % 8)
+            for week in range(args.weeks):
+                at = datetime.combine(start + timedelta(weeks=week, days=day), begins)
+                sessions.append((
+                    section_id, teacher_ids[(section_index + subject) % len(teacher_ids)],
+                    classroom_ids[section_index % len(classroom_ids)], f'T{term} Subject {subject + 1}',
+                    DAYS[day], begins, time(begins.hour + 1), at,
+                ))
+    schedule_ids = execute_values(cursor, """
+        INSERT INTO schedule (section_id, teacher_id, classroom_id, subject_name, day_of_week, start_time, end_time)
+        VALUES %s RETURNING schedule_id
+    """, [session[:7] for session in sessions], page_size=1000, fetch=True)
+
+    by_week = {}
+    for (schedule_id,), session in zip(schedule_ids, sessions):
+        by_week.setdefault(session[-1].isocalendar()[:2], []).append((schedule_id, session[0], session[-1]))
+    load_attendance(cursor, args, by_week)
+    return [schedule_id for schedule_id, in schedule_ids]
+
+
+def build(args, schema, migrated):
+    """Load the legacy layout and every term into schema, migrating after the first term if asked"""
+    report = {}
+    conn = connect(schema)
+    cursor = conn.cursor()
+    cursor.execute(LEGACY_LAYOUT_SQL)
+    cursor.execute("SELECT setseed(%s)", (args.seed / 1000.0,))
+    teacher_ids, classroom_ids, section_ids, tags = seed_people(cursor, args)
+    conn.commit()
+
+    term_schedules = []
+    for term in range(1, args.terms + 1):
+        if migrated and term > 1:
+            cursor.execute('SELECT attendance_start_term(%s)', (f'term_{term}',))
+        with timed(report, f'seed_term_{term}_ms'):
+            term_schedules.append(seed_term(cursor, args, term, (teacher_ids, classroom_ids, section_ids)))
+        conn.commit()
+        if migrated and term == 1:
+            with timed(report, 'migrate_ms'):
+                report['migrations_applied'] = migrate.migrate(conn)
+            conn.autocommit = False
+
+    conn.autocommit = True
+    cursor.execute('VACUUM ANALYZE')
+    cursor.execute("SELECT COUNT(*) FROM attendance")
+    report['attendance_rows'] = cursor.fetchone()[0]
+    cursor.execute("SELECT person_id FROM persons WHERE role = 'student' AND rfid_tag LIKE 'LTS%' ORDER BY person_id")
+    students = [row[0] for row in cursor.fetchall()]
+    if migrated:
+        cursor.execute("SELECT term_name, first_schedule_id FROM attendance_terms ORDER BY first_schedule_id")
+        report['terms'] = cursor.fetchall()
+        report['aggregates_consistent'] = aggregates.check_consistency(cursor)['consistent']
+    conn.autocommit = False
+    return conn, cursor, report, (term_schedules, tags, students)
+
+
+def plan_nodes(node, depth=0):
+    """Compact plan outline: node type, relation and index per line"""
+    line = '  ' * depth + node['Node Type']
+    if node.get('Relation Name'):
+        line += f" on {node['Relation Name']}"
+    if node.get('Index Name'):
+        line += f" using {node['Index Name']}"
+    lines = [line]
+    for child in node.get('Plans', []):
+        lines.extend(plan_nodes(child, depth + 1))
+    return lines
+
+
+def relations(node):
+    found = {node['Relation Name']} if node.get('Relation Name') else set()
+    for child in node.get('Plans', []):
+        found |= relations(child)
+    return found
+
+
+def explain(cursor, sql, params, repeat):
+    """Plan outline and buffer counts from one EXPLAIN (ANALYZE, BUFFERS), plus timed runs"""
+    cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql, params)
+    result = cursor.fetchone()[0][0]
+    plan = result['Plan']
+    timings = []
+    for _ in range(repeat):
+        run = {}
+        with timed(run, 'ms'):
+            cursor.execute(sql, params)
+            cursor.fetchall()
+        timings.append(run['ms'])
+    return {
+        'plan': plan_nodes(plan),
+        'attendance_relations_scanned': sorted(r for r in relations(plan) if r.startswith('attendance')),
+        'shared_hit_blocks': plan.get('Shared Hit Blocks', 0),
+        'shared_read_blocks': plan.get('Shared Read Blocks', 0),
+        'planning_ms': round(result.get('Planning Time', 0.0), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'best_ms': min(timings),
+    }
+
+
+def workload(args, seeded, rng):
+    """The same parameters for both layouts: each query shape against the latest term"""
+    term_schedules, tags, students = seeded
+    section_id, section_tags = next(iter(tags.items()))
+    cutoff = datetime.combine(date.today() - timedelta(weeks=args.weeks // 2), time(0))
+    return {
+        'duplicate_check': (DUPLICATE_CHECK_SQL, (rng.choice(term_schedules[-1]), rng.choice(students))),
+        'rfid_lookup': (attendance_batch.RFID_LOOKUP_SQL, (rng.sample(section_tags, min(40, len(section_tags))),)),
+        'student_history': (STUDENT_HISTORY_SQL, (rng.choice(students), cutoff)),
+        'section_daily_recompute': (
+            aggregates.RECOMPUTE_SECTION_DAILY_SQL, (section_id, section_id, cutoff.date(), date.today())
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=3000)
+    parser.add_argument('--sections', type=int, default=100)
+    parser.add_argument('--teachers', type=int, default=40)
+    parser.add_argument('--classrooms', type=int, default=30)
+    parser.add_argument('--subjects', type=int, default=6)
+    parser.add_argument('--terms', type=int, default=4)
+    parser.add_argument('--weeks', type=int, default=16, help='weeks per term')
+    parser.add_argument('--present-rate', type=float, default=0.85)
+    parser.add_argument('--late-rate', type=float, default=0.1)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    args.password = 'bench'
+
+    report = {'benchmark': 'attendance_partitioning', 'config': vars(args), 'layouts': {}, 'queries': {}}
+    with scratch_schema() as before_schema, scratch_schema() as after_schema:
+        layouts = {}
+        for name, schema, migrated in (('before', before_schema, False), ('after', after_schema, True)):
+            conn, cursor, build_report, seeded = build(args, schema, migrated)
+            layouts[name] = (conn, cursor)
+            report['layouts'][name] = build_report
+
+        # Schedule ids and tags line up: both schemas were seeded identically
+        queries = workload(args, seeded, random.Random(args.seed))
+        for label, (sql, params) in queries.items():
+            row = {}
+            for name, (conn, cursor) in layouts.items():
+                row[name] = explain(cursor, sql, params, args.repeat)
+                conn.rollback()
+            row['speedup'] = round(row['before']['median_ms'] / max(row['after']['median_ms'], 1e-6), 2)
+            report['queries'][label] = row
+
+        for conn, cursor in layouts.values():
+            cursor.close()
+            conn.close()
+
+    emit(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Term Report Benchmark
+Builds the term report (every student x subject percentage, plus defaulter
+lists) the way report_engine does, with three bulk queries and NumPy, and
+the row-by-row way, looping over raw attendance rows in Python. Checks both
+find the same defaulters.
+
+Against a database it reads the schema seeded by seed_load.py from the
+manifest; --synthetic generates the same shapes in memory instead, timing the
+Python side only.
+
+Usage: BENCH_DB_HOST=localhost python benchmarks/seed_load.py --students 10000 --sections 400 --weeks 30
+       BENCH_DB_HOST=localhost python benchmarks/bench_reports.py
+       python benchmarks/bench_reports.py --synthetic --students 10000 --weeks 30
+"""
+
+import json
+import random
+import argparse
+from collections import defaultdict
+from datetime import date, time, datetime, timedelta
+
+from common import connect, timed, emit
+from seed_load import DEFAULT_MANIFEST
+
+import report_engine
+
+RAW_SQL = """
+    SELECT a.person_id, sc.section_id, COALESCE(sc.subject_name, ''), a.status
+    FROM attendance a
+    JOIN schedule sc ON sc.schedule_id = a.schedule_id
+    WHERE a.timestamp >= %s AND a.timestamp < %s AND a.status IN ('present', 'late')
+"""
+
+SPAN_SQL = "SELECT MIN(timestamp)::date, MAX(timestamp)::date FROM attendance"
+
+
+def row_by_row(first_day, last_day, slots, enrollment, raw_rows, threshold):
+    """The report computed with dicts and loops: expected sessions per subject, then one pass per attendance row"""
+    expected = defaultdict(int)
+    for section_id, subject, day, _ in slots:
+        current = first_day
+        while current <= last_day:
+            if report_engine.DAY_NAMES[current.weekday()] == day:
+                expected[(section_id, subject)] += 1
+            current += timedelta(days=1)
+    subjects = defaultdict(list)
+    for section_id, subject in sorted(expected):
+        subjects[section_id].append(subject)
+
+    tallies = defaultdict(lambda: [0, 0])
+    for person_id, section_id, subject, status in raw_rows:
+        tally = tallies[(person_id, section_id, subject)]
+        tally[0 if status == 'present' else 1] += 1
+
+    defaulters = []
+    for person_id, section_id, _, _ in enrollment:
+        total_expected = total_attended = 0
+        for subject in subjects[section_id]:
+            present, late = tallies.get((person_id, section_id, subject), (0, 0))
+            total_expected += expected[(section_id, subject)]
+            total_attended += present + late
+        if total_expected and 100.0 * total_attended / total_expected < threshold:
+            defaulters.append(person_id)
+    return sorted(defaulters)
+
+
+def synthetic(args, rng):
+    """(first_day, last_day, slots, enrollment, counts, raw_rows) shaped like a seed_load term"""
+    first_day = date(2026, 1, 5)
+    last_day = first_day + timedelta(weeks=args.weeks) - timedelta(days=1)
+    slots = [
+        (section_id, f'Subject {subject + 1}', report_engine.DAY_NAMES[subject % 5], time(8 + subject))
+        for section_id in range(1, args.sections + 1) for subject in range(args.subjects)
+    ]
+    enrollment = sorted(
+        ((person_id, person_id % args.sections + 1, f'Student {person_id}', f'S{person_id:06d}')
+         for person_id in range(1, args.students + 1)),
+        key=lambda row: (row[1], row[2], row[0]),
+    )
+    counts, raw_rows = [], []
+    for person_id, section_id, _, _ in enrollment:
+        rate = rng.uniform(0.5, 1.0)
+        for subject in range(args.subjects):
+            attended = sum(rng.random() < rate for _ in range(args.weeks))
+            late = sum(rng.random() < args.late_rate for _ in range(attended))
+            name = f'Subject {subject + 1}'
+            counts.append((person_id, section_id, name, attended - late, late))
+            raw_rows.extend([(person_id, section_id, name, 'present')] * (attended - late))
+            raw_rows.extend([(person_id, section_id, name, 'late')] * late)
+    return first_day, last_day, slots, enrollment, counts, raw_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST)
+    parser.add_argument('--synthetic', action='store_true', help='generate data in memory instead of querying')
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--sections', type=int, default=400)
+    parser.add_argument('--subjects', type=int, default=6)
+    parser.add_argument('--weeks', type=int, default=30)
+    parser.add_argument('--late-rate', type=float, default=0.1)
+    parser.add_argument('--threshold', type=float, default=75.0)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    report = {'benchmark': 'term_reports', 'config': vars(args)}
+    engine, baseline = {}, {}
+
+    if args.synthetic:
+        first_day, last_day, slots, enrollment, counts, raw_rows = synthetic(args, random.Random(args.seed))
+    else:
+        with open(args.manifest) as f:
+            report['schema'] = json.load(f)['schema']
+        conn = connect(report['schema'])
+        cursor = conn.cursor()
+        cursor.execute(SPAN_SQL)
+        first_day, last_day = cursor.fetchone()
+
+        # The engine's three queries, timed apart from the NumPy build
+        with timed(engine, 'slots_query_ms'):
+            cursor.execute(report_engine.SLOTS_SQL, (first_day, last_day))
+            slots = cursor.fetchall()
+        with timed(engine, 'enrollment_query_ms'):
+            cursor.execute(report_engine.ENROLLMENT_SQL)
+            enrollment = cursor.fetchall()
+        with timed(engine, 'counts_query_ms'):
+            cursor.execute(report_engine.STUDENT_COUNTS_SQL, (first_day, last_day + timedelta(days=1)))
+            counts = cursor.fetchall()
+        with timed(baseline, 'raw_query_ms'):
+            cursor.execute(RAW_SQL, (first_day, last_day + timedelta(days=1)))
+            raw_rows = cursor.fetchall()
+        cursor.close()
+        conn.close()
+
+    # Every session of the term has happened, as row_by_row assumes
+    end_of_term = datetime.combine(last_day, time.max)
+    with timed(engine, 'build_ms'):
+        term = report_engine.TermReport(first_day, last_day, slots, enrollment, counts, now=end_of_term)
+    sections = sorted(set(term.enr_section.tolist()))
+    with timed(engine, 'every_section_ms'):
+        for section_id in sections:
+            term.section(section_id)
+    with timed(engine, 'defaulters_ms'):
+        found = term.defaulters(args.threshold)
+    with timed(engine, 'defaulters_by_subject_ms'):
+        by_subject = term.defaulters(args.threshold, by_subject=True)
+    engine['section_ms_avg'] = round(engine['every_section_ms'] / max(len(sections), 1), 3)
+
+    with timed(baseline, 'defaulters_ms'):
+        expected = row_by_row(first_day, last_day, slots, enrollment, raw_rows, args.threshold)
+
+    query_ms = sum(value for key, value in engine.items() if key.endswith('_query_ms'))
+    report.update({
+        'term': {'from': first_day.isoformat(), 'to': last_day.isoformat()},
+        'rows': {
+            'students': len(enrollment), 'sections': len(sections), 'slots': len(slots),
+            'report_rows': term.rows, 'count_rows': len(counts), 'attendance_rows': len(raw_rows),
+        },
+        'engine': engine,
+        'row_by_row': baseline,
+        'defaulters': len(found),
+        'defaulters_by_subject': len(by_subject),
+        'same_defaulters': sorted(student['person_id'] for student in found) == expected,
+        'engine_total_ms': round(query_ms + engine['build_ms'] + engine['defaulters_ms'], 3),
+        'row_by_row_total_ms': round(sum(baseline.values()), 3),
+    })
+    report['speedup'] = round(report['row_by_row_total_ms'] / max(report['engine_total_ms'], 1e-6), 2)
+    emit(report)
+
+
+if __name__ == '__main__':
+    main()
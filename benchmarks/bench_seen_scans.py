@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Seen Scans Benchmark
+A class changeover replayed against one schedule: readers post small batches
+in which most tags were already recorded or were sent moments ago. Compares
+every batch going to the database (the UNIQUE constraint finding duplicates)
+with the seen-set and reader debounce answering repeats from memory
+
+Usage: BENCH_DB_HOST=localhost python benchmarks/bench_seen_scans.py --students 60 --requests 2000
+"""
+
+import random
+import argparse
+from datetime import datetime, timedelta
+
+from psycopg2.extensions import cursor as base_cursor
+
+from common import connect, scratch_schema, seed_students, timed, emit
+
+import attendance_batch
+import seen_scans
+
+
+class CountingCursor(base_cursor):
+    statements = 0
+
+    def execute(self, query, vars=None):
+        CountingCursor.statements += 1
+        return super().execute(query, vars)
+
+
+def make_requests(tags, count, readers, batch, rng):
+    """(reader, scans) posts: each reader re-sends tags it saw a few seconds ago, like a held card"""
+    started = datetime.now()
+    posts = []
+    for index in range(count):
+        at = started + timedelta(seconds=index * 0.2)
+        reader = f'reader-{index % readers}'
+        picked = rng.sample(tags, batch)
+        posts.append((reader, [(tag, at + timedelta(milliseconds=offset * 50)) for offset, tag in enumerate(picked)]))
+    return posts
+
+
+def without_filter(conn, cursor, people, posts):
+    """Every post reaches record_rfid_batch and the database"""
+    totals = {'successful': 0, 'duplicates': 0, 'db_requests': 0}
+    for _, scans in posts:
+        results = attendance_batch.record_rfid_batch(cursor, 1, scans, people)
+        conn.commit()
+        totals['successful'] += results['successful']
+        totals['duplicates'] += results['duplicates']
+        totals['db_requests'] += 1
+    return totals
+
+
+def with_filter(conn, cursor, people, posts, debounce_window):
+    """The bulk_attendance flow: debounce, then the seen-set, then the database only for new students"""
+    seen = seen_scans.SeenScans(debounce_window=debounce_window)
+    totals = {'successful': 0, 'duplicates': 0, 'db_requests': 0}
+    for reader, scans in posts:
+        scans, repeated = seen.debounce(reader, 1, scans)
+        known = seen.known(1)
+        resolved = {tag: people[tag] for tag, _ in scans}
+        if not scans or (known is not None and all(person[0] in known for person in resolved.values())):
+            results = attendance_batch.record_rfid_batch(None, 1, scans, resolved, known)
+            seen.count(results['known_duplicates'], without_db=True)
+        else:
+            known = seen.warm(cursor, 1)
+            results = attendance_batch.record_rfid_batch(cursor, 1, scans, resolved, known)
+            conn.commit()
+            seen.add(1, results['present_person_ids'])
+            seen.count(results['known_duplicates'])
+            totals['db_requests'] += 1
+        seen.remember(reader, 1, scans)
+        totals['successful'] += results['successful']
+        totals['duplicates'] += results['duplicates'] + len(repeated)
+    totals['seen_scans'] = seen.stats()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=60)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--batch', type=int, default=5, help='tags per post')
+    parser.add_argument('--debounce', type=float, default=5.0)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report = {'benchmark': 'seen_scans', 'config': vars(args), 'modes': {}}
+
+    with scratch_schema() as schema:
+        conn = connect(schema)
+        conn.cursor_factory = CountingCursor
+        cursor = conn.cursor()
+        tags = seed_students(cursor, args.students)
+        conn.commit()
+        people = attendance_batch.resolve_rfid_tags(cursor, tags)
+        posts = make_requests(tags, args.requests, args.readers, args.batch, rng)
+
+        for name, run in (('without_filter', lambda: without_filter(conn, cursor, people, posts)),
+                          ('with_filter', lambda: with_filter(conn, cursor, people, posts, args.debounce))):
+            cursor.execute('TRUNCATE attendance')
+            conn.commit()
+            CountingCursor.statements = 0
+            result = {}
+            with timed(result, 'ms'):
+                result.update(run())
+            result['statements'] = CountingCursor.statements
+            report['modes'][name] = result
+
+        cursor.close()
+        conn.close()
+
+    before, after = report['modes']['without_filter'], report['modes']['with_filter']
+    report['same_recorded'] = before['successful'] == after['successful']
+    report['speedup'] = round(before['ms'] / max(after['ms'], 1e-6), 2)
+    report['statements_saved'] = before['statements'] - after['statements']
+    emit(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Response Serialization Benchmark
+Building and encoding a 5,000-scan bulk attendance response the old way (record
+dicts, a second list of result dicts, stdlib json with sorted keys) versus
+AttendanceRecord tuples mapped once and encoded by serialization.dumps_bytes,
+plus payload size and time for gzip and brotli
+
+Usage: python benchmarks/bench_serialization.py --scans 5000
+"""
+
+import json
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+from werkzeug.http import http_date
+
+from common import timed, emit
+
+import serialization
+from attendance_batch import AttendanceRecord
+
+
+def flask_default(o):
+    if isinstance(o, datetime):
+        return http_date(o)
+    raise TypeError(type(o).__name__)
+
+
+def make_rows(count):
+    started = datetime(2025, 1, 6, 9, 0)
+    return [
+        (100000 + i, f'Student {i:05d}', f'25000{i:05d}', f'{0xB2F7AF6A + i:08X}', started + timedelta(seconds=i // 10))
+        for i in range(count)
+    ]
+
+
+def before(rows, total):
+    """Batch record dicts, then the route's result dicts, then Flask's default provider"""
+    records = [
+        {'person_id': person_id, 'name': name, 'id_number': id_number,
+         'rfid_tag': rfid_tag, 'timestamp': timestamp, 'method': 'rfid'}
+        for person_id, name, id_number, rfid_tag, timestamp in rows
+    ]
+    response = {
+        'success': True,
+        'results': [],
+        'summary': {'total': total, 'successful': len(records), 'duplicates': 0, 'failed': 0},
+    }
+    for record in records:
+        response['results'].append({
+            'success': True,
+            'person_id': record['person_id'],
+            'name': record['name'],
+            'student': {'name': record['name'], 'section': 'N/A'},
+            'rfid_tag': record['rfid_tag'],
+            'timestamp': record['timestamp'].isoformat(),
+            'method': record['method'],
+            'isDuplicate': False,
+        })
+    return json.dumps(response, default=flask_default, ensure_ascii=True, sort_keys=True,
+                      separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def after(rows, total):
+    """AttendanceRecord tuples mapped once, encoded by the app's provider"""
+    records = [
+        AttendanceRecord(person_id, name, id_number, rfid_tag, timestamp, 'rfid')
+        for person_id, name, id_number, rfid_tag, timestamp in rows
+    ]
+    return serialization.dumps_bytes({
+        'success': True,
+        'results': serialization.bulk_results(records),
+        'summary': {'total': total, 'successful': len(records), 'duplicates': 0, 'failed': 0},
+    }) + b'\n'
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        run = {}
+        with timed(run, 'ms'):
+            result = fn()
+        timings.append(run['ms'])
+    return result, {'best_ms': min(timings), 'median_ms': round(statistics.median(timings), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scans', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--gzip-level', type=int, default=5)
+    parser.add_argument('--brotli-quality', type=int, default=4)
+    args = parser.parse_args()
+
+    rows = make_rows(args.scans)
+    report = {
+        'benchmark': 'serialization',
+        'scans': args.scans,
+        'encoder': 'orjson' if serialization.orjson is not None else 'stdlib',
+        'brotli_available': serialization.brotli is not None,
+    }
+
+    old_body, report['before'] = best_of(lambda: before(rows, args.scans), args.repeat)
+    new_body, report['after'] = best_of(lambda: after(rows, args.scans), args.repeat)
+    report['before']['bytes'] = len(old_body)
+    report['after']['bytes'] = len(new_body)
+    report['speedup'] = round(report['before']['median_ms'] / max(report['after']['median_ms'], 1e-6), 2)
+    report['same_document'] = json.loads(old_body) == json.loads(new_body)
+
+    encodings = ['gzip'] + (['br'] if serialization.brotli is not None else [])
+    report['compression'] = {}
+    for encoding in encodings:
+        body, timing = best_of(
+            lambda: serialization.compress(new_body, encoding, args.gzip_level, args.brotli_quality), args.repeat
+        )
+        report['compression'][encoding] = dict(timing, bytes=len(body), ratio=round(len(new_body) / len(body), 2))
+
+    emit(report)
+
+
+if __name__ == '__main__':
+    main()
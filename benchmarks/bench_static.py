@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Static Page Benchmark
+Requests per second for the dashboard page through a Flask test client: the
+old routes (template compiled per request, send_from_directory per request)
+versus static_assets, for full, gzip and conditional (304) requests
+
+Usage: python benchmarks/bench_static.py --requests 2000
+"""
+
+import time
+import argparse
+
+from flask import Flask, request, send_from_directory, render_template_string
+
+from common import REPO_ROOT, emit
+
+import static_assets
+
+PAGE = 'analytics_dashboard.html'
+
+
+def make_app():
+    app = Flask(__name__, root_path=REPO_ROOT)
+    with open(f'{REPO_ROOT}/{PAGE}') as f:
+        template = f.read()
+    files = static_assets.StaticAssets(app.root_path)
+    page = files.page(app.jinja_env.from_string(template).render())
+
+    @app.route('/before/index')
+    def before_index():
+        return render_template_string(template)
+
+    @app.route('/before/<path:path>')
+    def before_static(path):
+        return send_from_directory('.', path)
+
+    @app.route('/after/index')
+    def after_index():
+        return files.respond(page, request)
+
+    @app.route('/after/<path:path>')
+    def after_static(path):
+        asset = files.lookup(path)
+        return files.respond(asset, request) if asset is not None else send_from_directory('.', path)
+
+    return app, files
+
+
+def rate(client, url, count, headers=None):
+    response = client.get(url, headers=headers)
+    started = time.perf_counter()
+    for _ in range(count):
+        client.get(url, headers=headers).close()
+    elapsed = time.perf_counter() - started
+    return {
+        'status': response.status_code,
+        'bytes': len(response.data),
+        'content_encoding': response.headers.get('Content-Encoding'),
+        'requests_per_second': round(count / elapsed, 1),
+        'us_per_request': round(elapsed * 1e6 / count, 1),
+    }, response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    app, files = make_app()
+    client = app.test_client()
+    gzip = {'Accept-Encoding': 'gzip'}
+    report = {'benchmark': 'static_pages', 'page': PAGE, 'requests': args.requests, 'cases': {}}
+
+    for side in ('before', 'after'):
+        cases = {}
+        cases['index'], _ = rate(client, f'/{side}/index', args.requests)
+        cases['static'], _ = rate(client, f'/{side}/{PAGE}', args.requests)
+        cases['static_gzip'], full = rate(client, f'/{side}/{PAGE}', args.requests, gzip)
+        validators = {'If-None-Match': full.headers['ETag']} if full.headers.get('ETag') else {
+            'If-Modified-Since': full.headers['Last-Modified']
+        }
+        cases['static_revalidate'], _ = rate(client, f'/{side}/{PAGE}', args.requests, dict(gzip, **validators))
+        report['cases'][side] = cases
+
+    report['speedup'] = {
+        case: round(report['cases']['after'][case]['requests_per_second']
+                    / report['cases']['before'][case]['requests_per_second'], 2)
+        for case in report['cases']['before']
+    }
+    report['static_files'] = files.stats()
+    emit(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Token Verification Benchmark
+Verified tokens per second for one worker, with and without the claims cache
+
+Usage: python benchmarks/bench_token_cache.py --iterations 100000
+"""
+
+import time
+import argparse
+from datetime import datetime, timedelta
+
+import jwt
+
+from common import emit
+from token_cache import TokenCache
+
+SECRET_KEY = 'benchmark-secret-key'
+
+
+def make_tokens(count):
+    exp = datetime.utcnow() + timedelta(hours=24)
+    return [
+        jwt.encode({'user_id': i, 'username': f'teacher{i}', 'role': 'teacher', 'exp': exp},
+                   SECRET_KEY, algorithm='HS256')
+        for i in range(count)
+    ]
+
+
+def rate(iterations, fn, tokens):
+    started = time.perf_counter()
+    count = len(tokens)
+    for i in range(iterations):
+        fn(tokens[i % count])
+    elapsed = time.perf_counter() - started
+    return {
+        'verifications_per_second': round(iterations / elapsed, 1),
+        'us_per_verification': round(elapsed * 1e6 / iterations, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=100000)
+    parser.add_argument('--clients', type=int, default=200,
+                        help='distinct tokens presented in rotation, like open dashboards')
+    args = parser.parse_args()
+
+    tokens = make_tokens(args.clients)
+    cache = TokenCache(SECRET_KEY)
+
+    uncached = rate(args.iterations, lambda token: jwt.decode(token, SECRET_KEY, algorithms=['HS256']), tokens)
+    cached = rate(args.iterations, cache.verify, tokens)
+
+    emit({
+        'benchmark': 'token_verification',
+        'iterations': args.iterations,
+        'distinct_tokens': args.clients,
+        'uncached': uncached,
+        'cached': cached,
+        'speedup': round(cached['verifications_per_second'] / uncached['verifications_per_second'], 2),
+        'cache': cache.stats(),
+    })
+
+
+if __name__ == '__main__':
+    main()
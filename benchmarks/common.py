@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Benchmark Helpers
+Scratch-schema setup against a local PostgreSQL for the benchmark scripts
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+from contextlib import contextmanager
+
+import psycopg2
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_FILE = os.path.join(REPO_ROOT, 'enhanced_schema.sql')
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+# Benchmarks run against a local server, so SSL is off unless asked for
+BENCH_DB_CONFIG = {
+    'host': os.environ.get('BENCH_DB_HOST', 'localhost'),
+    'database': os.environ.get('BENCH_DB_NAME', 'attendance'),
+    'user': os.environ.get('BENCH_DB_USER', 'postgres'),
+    'password': os.environ.get('BENCH_DB_PASSWORD', 'password'),
+    'port': int(os.environ.get('BENCH_DB_PORT', 5432)),
+    'sslmode': os.environ.get('BENCH_DB_SSLMODE', 'disable'),
+}
+
+
+def connect(schema=None):
+    """Open a benchmark connection, optionally pinned to a scratch schema"""
+    options = f'-c search_path={schema},public' if schema else None
+    return psycopg2.connect(options=options, **BENCH_DB_CONFIG)
+
+
+@contextmanager
+def scratch_schema(keep=False, name=None):
+    """Create a schema loaded with enhanced_schema.sql and yield its name
+
+    Without a name the schema is a throwaway; a named schema replaces any
+    existing one of that name.
+    """
+    schema = name or f"bench_{uuid.uuid4().hex[:8]}"
+    conn = connect()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    if name:
+        cursor.execute(f'DROP SCHEMA IF EXISTS {schema} CASCADE')
+    cursor.execute(f'CREATE SCHEMA {schema}')
+    cursor.execute(f'SET search_path TO {schema}')
+    with open(SCHEMA_FILE) as f:
+        cursor.execute(f.read())
+    try:
+        yield schema
+    finally:
+        if not keep:
+            cursor.execute(f'DROP SCHEMA {schema} CASCADE')
+        cursor.close()
+        conn.close()
+
+
+def seed_students(cursor, count, section_id=1, prefix='BENCH'):
+    """Insert count active students enrolled in section_id; returns their RFID tags"""
+    cursor.execute("""
+        INSERT INTO persons (name, rfid_tag, role, id_number)
+        SELECT 'Student ' || g, %s || lpad(g::text, 7, '0'), 'student', %s || g
+        FROM generate_series(1, %s) g
+        RETURNING person_id, rfid_tag
+    """, (prefix, prefix, count))
+    rows = cursor.fetchall()
+    cursor.execute("""
+        INSERT INTO student_sections (person_id, section_id)
+        SELECT unnest(%s::int[]), %s
+    """, ([person_id for person_id, _ in rows], section_id))
+    return [rfid_tag for _, rfid_tag in rows]
+
+
+@contextmanager
+def timed(results, key):
+    """Record wall time in milliseconds for the with block under results[key]"""
+    started = time.perf_counter()
+    yield
+    results[key] = round((time.perf_counter() - started) * 1000, 3)
+
+
+def emit(report):
+    """Print a benchmark report as JSON"""
+    print(json.dumps(report, indent=2, default=str))
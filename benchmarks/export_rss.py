@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Export Memory Check
+Streams a million synthetic attendance rows through the export path and fails
+if the process grows past a fixed RSS budget
+
+Usage: BENCH_DB_HOST=localhost python benchmarks/export_rss.py --rows 1000000 --budget-mb 64
+"""
+
+import sys
+import time
+import resource
+import argparse
+
+from common import connect, scratch_schema, seed_students, emit
+
+import attendance_export
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def seed_attendance(cursor, rows, students):
+    """rows attendance rows spread over enough schedule slots to keep (schedule_id, person_id) unique"""
+    seed_students(cursor, students, prefix='EXP')
+    cursor.execute("""
+        INSERT INTO persons (name, rfid_tag, role, id_number)
+        VALUES ('Export Teacher', 'EXPTEACHER', 'teacher', 'ET1')
+        RETURNING person_id
+    """)
+    teacher_id = cursor.fetchone()[0]
+    cursor.execute("INSERT INTO classrooms (room_number) VALUES ('EXP-101') RETURNING classroom_id")
+    classroom_id = cursor.fetchone()[0]
+    slots = -(-rows // students)
+    cursor.execute("""
+        INSERT INTO schedule (section_id, teacher_id, classroom_id, subject_name, day_of_week, start_time, end_time)
+        SELECT 1, %s, %s, 'Subject ' || (g %% 8), 'Monday', '09:00', '10:00'
+        FROM generate_series(1, %s) g
+    """, (teacher_id, classroom_id, slots))
+    cursor.execute("""
+        INSERT INTO attendance (schedule_id, person_id, rfid_tag, status, method, confidence_score, location, timestamp)
+        SELECT sc.schedule_id, p.person_id, p.rfid_tag, 'present', 'rfid', 1.0, 'classroom',
+               timestamp '2024-08-01 09:00' + (sc.schedule_id || ' hours')::interval
+        FROM schedule sc
+        CROSS JOIN persons p
+        WHERE sc.teacher_id = %s AND p.rfid_tag LIKE 'EXP%%' AND p.role = 'student'
+        LIMIT %s
+    """, (teacher_id, rows))
+
+
+def run_export(conn, fmt, gzip, chunk_size):
+    sql, params = attendance_export.build_query(section_id=1)
+    rows = 0
+    size = 0
+    started = time.perf_counter()
+    for chunk in attendance_export.stream_export(conn, fmt, sql, params, chunk_size=chunk_size, gzip=gzip):
+        size += len(chunk)
+        if not gzip:
+            rows += chunk.count(b'\n')
+    conn.rollback()
+    elapsed = time.perf_counter() - started
+    return {
+        'format': fmt,
+        'gzip': gzip,
+        'lines': rows if not gzip else None,
+        'bytes': size,
+        'seconds': round(elapsed, 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    parser.add_argument('--budget-mb', type=float, default=64.0,
+                        help='allowed peak RSS growth over the pre-export baseline')
+    args = parser.parse_args()
+
+    report = {'benchmark': 'export_rss', 'rows': args.rows, 'budget_mb': args.budget_mb, 'runs': []}
+
+    with scratch_schema() as schema:
+        conn = connect(schema)
+        cursor = conn.cursor()
+        seed_attendance(cursor, args.rows, args.students)
+        conn.commit()
+        cursor.execute('ANALYZE')
+        sql, params = attendance_export.build_query(section_id=1)
+        cursor.execute(f'SELECT COUNT(*) FROM ({sql}) export', params)
+        expected = cursor.fetchone()[0]
+        conn.commit()
+        cursor.close()
+
+        baseline = peak_rss_mb()
+        report['baseline_rss_mb'] = round(baseline, 1)
+        for fmt, gzip in (('csv', False), ('ndjson', False), ('csv', True)):
+            report['runs'].append(run_export(conn, fmt, gzip, args.chunk_size))
+        conn.close()
+    report['exported_rows'] = expected
+
+    growth = max(run['peak_rss_mb'] for run in report['runs']) - baseline
+    report['rss_growth_mb'] = round(growth, 1)
+    report['within_budget'] = growth <= args.budget_mb
+    report['row_counts_match'] = all(
+        run['lines'] == expected + (run['format'] == 'csv') for run in report['runs'] if not run['gzip']
+    )
+    emit(report)
+    if not (report['within_budget'] and report['row_counts_match']):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - HTTP Load Test
+Drives /login, /faculty/schedules, /faculty/bulk-attendance and /analytics/sections
+against a running server seeded by seed_load.py, and reports latency percentiles
+and throughput per endpoint as JSON
+
+Usage: python benchmarks/load_test.py --base-url http://127.0.0.1:5000 --concurrency 32 --duration 30
+       python benchmarks/load_test.py --output after.json --baseline before.json --max-regression 0.15
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+import http.client
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from common import REPO_ROOT, emit
+from seed_load import DEFAULT_MANIFEST
+
+ENDPOINTS = ('login', 'schedules', 'bulk', 'sections')
+
+
+class Client:
+    """One keep-alive HTTP connection, as a reader or dashboard would hold"""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        connection = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connect = lambda: connection(parts.hostname, parts.port, timeout=timeout)
+        self.prefix = parts.path.rstrip('/')
+        self.conn = self.connect()
+        self.token = None
+
+    def request(self, method, path, body=None):
+        """Returns (status, parsed JSON or None); reconnects once if the server closed the connection"""
+        headers = {'Accept': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        for attempt in (1, 2):
+            try:
+                self.conn.request(method, self.prefix + path, payload, headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self.conn.close()
+                self.conn = self.connect()
+                if attempt == 2:
+                    raise
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, None
+
+    def login(self, user):
+        status, body = self.request('POST', '/login', user)
+        if status != 200 or not body or not body.get('token'):
+            raise RuntimeError(f"Login failed for {user['username']}: HTTP {status}")
+        self.token = body['token']
+        return status
+
+
+class Workload:
+    """Builds one request for each endpoint from the seed manifest"""
+
+    def __init__(self, manifest, scans, rng):
+        self.users = manifest['users']
+        self.live = manifest['live_sessions']
+        self.scans = scans
+        self.rng = rng
+
+    def login(self, client):
+        return client.request('POST', '/login', self.rng.choice(self.users))[0]
+
+    def schedules(self, client):
+        return client.request('GET', '/faculty/schedules')[0]
+
+    def sections(self, client):
+        return client.request('GET', '/analytics/sections')[0]
+
+    def bulk(self, client):
+        """A reader's batch for one live session: mostly enrolled tags, some repeats, a few unknown"""
+        session = self.rng.choice(self.live)
+        tags = session['rfid_tags']
+        picked = self.rng.sample(tags, min(self.scans, len(tags)))
+        picked += [f'LTUNKNOWN{self.rng.randrange(10 ** 6)}' for _ in range(max(1, self.scans // 20))]
+        now = datetime.now().isoformat()
+        return client.request('POST', '/faculty/bulk-attendance', {
+            'schedule_id': session['schedule_id'],
+            'attendance_data': [{'rfid_tag': tag, 'timestamp': now} for tag in picked],
+        })[0]
+
+
+def run_phase(args, manifest, mix, duration, record=True):
+    """Run concurrency workers for duration seconds; returns per-endpoint samples"""
+    samples = {name: [] for name in mix}
+    statuses = {name: {} for name in mix}
+    errors = {name: 0 for name in mix}
+    lock = threading.Lock()
+    deadline = [None]
+    start_gate = threading.Barrier(
+        args.concurrency + 1, action=lambda: deadline.__setitem__(0, time.perf_counter() + duration)
+    )
+    names, weights = zip(*mix.items())
+
+    def worker(index):
+        rng = random.Random(args.seed * 1000 + index)
+        workload = Workload(manifest, args.scans, rng)
+        client = Client(args.base_url, args.timeout)
+        try:
+            client.login(manifest['users'][index % len(manifest['users'])])
+        except Exception:
+            start_gate.abort()
+            raise
+        local = {name: [] for name in mix}
+        local_status = {name: {} for name in mix}
+        local_errors = {name: 0 for name in mix}
+        start_gate.wait()
+        while time.perf_counter() < deadline[0]:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = getattr(workload, name)(client)
+            except Exception:
+                local_errors[name] += 1
+                client.conn.close()
+                client.conn = client.connect()
+                continue
+            local[name].append(time.perf_counter() - started)
+            local_status[name][status] = local_status[name].get(status, 0) + 1
+        with lock:
+            for name in mix:
+                samples[name].extend(local[name])
+                errors[name] += local_errors[name]
+                for status, count in local_status[name].items():
+                    statuses[name][status] = statuses[name].get(status, 0) + count
+
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    try:
+        start_gate.wait()
+    except threading.BrokenBarrierError:
+        raise SystemExit('A worker could not log in; check the server and the seed manifest')
+    cpu_started = time.process_time()
+    started = deadline[0] - duration
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if not record:
+        return None
+    return {
+        'elapsed_seconds': round(elapsed, 3),
+        # Near 1.0 per core the load generator, not the server, is the bottleneck
+        'client_cpu_ratio': round((time.process_time() - cpu_started) / elapsed, 3),
+        'endpoints': {name: summarize(samples[name], statuses[name], errors[name], elapsed) for name in mix},
+    }
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(latencies, statuses, errors, elapsed):
+    ordered = sorted(latencies)
+    ok = sum(count for status, count in statuses.items() if 200 <= status < 300)
+    summary = {
+        'requests': len(ordered),
+        'ok': ok,
+        'non_2xx': len(ordered) - ok,
+        'errors': errors,
+        'status_counts': {str(status): count for status, count in sorted(statuses.items())},
+        'throughput_rps': round(len(ordered) / elapsed, 2),
+    }
+    if ordered:
+        summary.update({
+            'mean_ms': round(sum(ordered) * 1000 / len(ordered), 3),
+            'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+            'max_ms': round(ordered[-1] * 1000, 3),
+        })
+    return summary
+
+
+def compare(report, baseline, max_regression):
+    """p95 and throughput change per phase and endpoint against a baseline report"""
+    regressions = []
+    deltas = {}
+    for phase, result in report['phases'].items():
+        before_phase = baseline.get('phases', {}).get(phase)
+        if not before_phase:
+            continue
+        for name, after in result['endpoints'].items():
+            before = before_phase['endpoints'].get(name)
+            if not before or 'p95_ms' not in before or 'p95_ms' not in after:
+                continue
+            p95_change = (after['p95_ms'] - before['p95_ms']) / max(before['p95_ms'], 1e-6)
+            rps_change = (after['throughput_rps'] - before['throughput_rps']) / max(before['throughput_rps'], 1e-6)
+            deltas[f'{phase}.{name}'] = {
+                'p95_ms': [before['p95_ms'], after['p95_ms']],
+                'p95_change': round(p95_change, 3),
+                'throughput_rps': [before['throughput_rps'], after['throughput_rps']],
+                'throughput_change': round(rps_change, 3),
+            }
+            if p95_change > max_regression or -rps_change > max_regression:
+                regressions.append(f'{phase}.{name}')
+    return {'baseline_commit': baseline.get('commit'), 'deltas': deltas, 'regressions': regressions}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ENDPOINTS:
+            raise SystemExit(f'Unknown endpoint {name!r}; expected one of {", ".join(ENDPOINTS)}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default=os.environ.get('LOAD_BASE_URL', 'http://127.0.0.1:5000'))
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30, help='seconds per phase')
+    parser.add_argument('--warmup', type=float, default=5, help='unrecorded seconds before the first phase')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS),
+                        help='endpoints run one at a time, each in its own phase')
+    parser.add_argument('--mix', default='login=1,schedules=4,bulk=2,sections=3',
+                        help='weights for a final mixed phase; empty to skip it')
+    parser.add_argument('--scans', type=int, default=40, help='tags per bulk-attendance request')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='also write the report to this file')
+    parser.add_argument('--baseline', help='report from an earlier commit to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='fail when p95 grows or throughput drops by more than this fraction')
+    args = parser.parse_args()
+
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+
+    report = {
+        'benchmark': 'load_test',
+        'commit': git_commit(),
+        'started_at': datetime.now().isoformat(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'schema': manifest['schema'],
+        'phases': {},
+    }
+
+    phases = [(name, {name: 1.0}) for name in args.endpoints.split(',') if name]
+    for name, _ in phases:
+        parse_mix(name)
+    if args.mix:
+        phases.append(('mixed', parse_mix(args.mix)))
+
+    if args.warmup > 0:
+        run_phase(args, manifest, parse_mix(args.mix or args.endpoints), args.warmup, record=False)
+    for name, mix in phases:
+        report['phases'][name] = run_phase(args, manifest, mix, args.duration)
+
+    failed = False
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['comparison'] = compare(report, json.load(f), args.max_regression)
+        failed = bool(report['comparison']['regressions'])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    emit(report)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Load Test Seed
+Loads enhanced_schema.sql into a named schema with a semester of realistic data
+and writes the manifest load_test.py reads
+
+Usage: BENCH_DB_HOST=localhost python benchmarks/seed_load.py --students 5000 --sections 200 --weeks 16
+Then start the app against the schema it prints, e.g.
+       PGOPTIONS='-c search_path=loadtest,public' DB_HOST=localhost DB_SSLMODE=disable \\
+       DB_NAME=attendance ONLINE_SESSIONS_ENABLED=false gunicorn -w 4 -b 127.0.0.1:5000 updated_app_render_ready:app
+"""
+
+import os
+import json
+import random
+import argparse
+from datetime import date, datetime, time, timedelta
+
+from psycopg2.extras import execute_values
+
+from common import REPO_ROOT, BENCH_DB_CONFIG, connect, scratch_schema, timed, emit
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+
+DEFAULT_MANIFEST = os.path.join(REPO_ROOT, 'spool', 'loadtest-manifest.json')
+
+ATTENDANCE_SQL = """
+    INSERT INTO attendance (schedule_id, person_id, rfid_tag, status, method, location, timestamp)
+    SELECT o.schedule_id, ss.person_id, p.rfid_tag,
+           CASE WHEN random() < %s THEN 'late' ELSE 'present' END, 'rfid', 'classroom', o.at
+    FROM unnest(%s::int[], %s::int[], %s::timestamp[]) AS o(schedule_id, section_id, at)
+    JOIN student_sections ss ON ss.section_id = o.section_id
+    JOIN persons p ON p.person_id = ss.person_id
+    WHERE random() < %s
+"""
+
+
+def seed_people(cursor, args):
+    """Teachers with logins, classrooms, sections and students spread evenly across sections"""
+    cursor.execute("""
+        INSERT INTO persons (name, rfid_tag, role, id_number)
+        SELECT 'Load Teacher ' || g, 'LTT' || lpad(g::text, 5, '0'), 'teacher', 'LTT' || g
+        FROM generate_series(1, %s) g
+        RETURNING person_id
+    """, (args.teachers,))
+    teacher_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute("""
+        INSERT INTO users (username, password, role, person_id)
+        SELECT 'load-teacher-' || ord, %s, 'teacher', person_id
+        FROM unnest(%s::int[]) WITH ORDINALITY AS t(person_id, ord)
+    """, (args.password, teacher_ids))
+    cursor.execute("INSERT INTO users (username, password, role) VALUES ('load-admin', %s, 'admin')",
+                   (args.password,))
+
+    cursor.execute("""
+        INSERT INTO classrooms (room_number, building, capacity)
+        SELECT 'LT-' || lpad(g::text, 3, '0'), 'Load Block', 60
+        FROM generate_series(1, %s) g
+        RETURNING classroom_id
+    """, (args.classrooms,))
+    classroom_ids = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute("""
+        INSERT INTO sections (section_name)
+        SELECT 'LT' || lpad(g::text, 4, '0')
+        FROM generate_series(1, %s) g
+        RETURNING section_id
+    """, (args.sections,))
+    section_ids = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute("""
+        INSERT INTO persons (name, rfid_tag, role, id_number)
+        SELECT 'Load Student ' || g, 'LTS' || lpad(g::text, 7, '0'), 'student', 'LTS' || g
+        FROM generate_series(1, %s) g
+        RETURNING person_id, rfid_tag
+    """, (args.students,))
+    students = cursor.fetchall()
+    cursor.execute("""
+        INSERT INTO student_sections (person_id, section_id)
+        SELECT unnest(%s::int[]), unnest(%s::int[])
+    """, (
+        [person_id for person_id, _ in students],
+        [section_ids[index % len(section_ids)] for index in range(len(students))],
+    ))
+    cursor.execute("""
+        INSERT INTO teacher_sections (person_id, section_id)
+        SELECT unnest(%s::int[]), unnest(%s::int[])
+    """, (
+        [teacher_ids[index % len(teacher_ids)] for index in range(len(section_ids))],
+        section_ids,
+    ))
+
+    tags = {section_id: [] for section_id in section_ids}
+    for index, (_, rfid_tag) in enumerate(students):
+        tags[section_ids[index % len(section_ids)]].append(rfid_tag)
+    return teacher_ids, classroom_ids, section_ids, tags
+
+
+def seed_timetable(cursor, args, teacher_ids, classroom_ids, section_ids):
+    """A semester of past sessions plus one open session per section today
+
+    attendance is UNIQUE (schedule_id, person_id), so each weekly occurrence
+    of a subject gets its own schedule row. Returns the past sessions by
+    week and the schedule_id of each section's session today.
+    """
+    start = date.today() - timedelta(weeks=args.weeks)
+    start -= timedelta(days=start.weekday())
+    sessions = []
+    for section_index, section_id in enumerate(section_ids):
+        classroom_id = classroom_ids[section_index % len(classroom_ids)]
+        for subject in range(args.subjects):
+            teacher_id = teacher_ids[(section_index * args.subjects + subject) % len(teacher_ids)]
+            day = (section_index + subject) % len(DAYS)
+            begins = time(8 + subject % 8)
+            for week in range(args.weeks):
+                at = datetime.combine(start + timedelta(weeks=week, days=day), begins)
+                sessions.append((section_id, teacher_id, classroom_id, f'Subject {subject + 1}',
+                                 DAYS[day], begins, time(begins.hour + 1), at))
+
+    schedule_ids = execute_values(cursor, """
+        INSERT INTO schedule (section_id, teacher_id, classroom_id, subject_name, day_of_week, start_time, end_time)
+        VALUES %s RETURNING schedule_id
+    """, [session[:7] for session in sessions], page_size=1000, fetch=True)
+
+    by_week = {}
+    for (schedule_id,), session in zip(schedule_ids, sessions):
+        at = session[-1]
+        by_week.setdefault(at.isocalendar()[:2], []).append((schedule_id, session[0], at))
+
+    today = date.today().strftime('%A')
+    live = execute_values(cursor, """
+        INSERT INTO schedule (section_id, teacher_id, classroom_id, subject_name, day_of_week, start_time, end_time)
+        VALUES %s RETURNING schedule_id, section_id
+    """, [
+        (section_id, teacher_ids[index % len(teacher_ids)], classroom_ids[index % len(classroom_ids)],
+         'Live Session', today, time(0), time(23, 59))
+        for index, section_id in enumerate(section_ids)
+    ], page_size=1000, fetch=True)
+    return by_week, live
+
+
+def load_attendance(cursor, args, by_week):
+    """One INSERT per week, so the statement triggers see realistic batch sizes"""
+    for week in sorted(by_week):
+        schedule_ids, section_ids, timestamps = zip(*by_week[week])
+        cursor.execute(ATTENDANCE_SQL, (
+            args.late_rate, list(schedule_ids), list(section_ids), list(timestamps), args.present_rate
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--schema', default='loadtest', help='replaced if it exists')
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--sections', type=int, default=200)
+    parser.add_argument('--teachers', type=int, default=60)
+    parser.add_argument('--classrooms', type=int, default=40)
+    parser.add_argument('--subjects', type=int, default=6, help='weekly subjects per section')
+    parser.add_argument('--weeks', type=int, default=16, help='weeks of past attendance')
+    parser.add_argument('--present-rate', type=float, default=0.85)
+    parser.add_argument('--late-rate', type=float, default=0.1)
+    parser.add_argument('--password', default='loadtest')
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    report = {'benchmark': 'seed_load', 'config': vars(args)}
+
+    with scratch_schema(keep=True, name=args.schema) as schema:
+        conn = connect(schema)
+        cursor = conn.cursor()
+        cursor.execute("SELECT setseed(%s)", (args.seed / 1000.0,))
+
+        with timed(report, 'people_ms'):
+            teacher_ids, classroom_ids, section_ids, tags = seed_people(cursor, args)
+        with timed(report, 'timetable_ms'):
+            by_week, live = seed_timetable(cursor, args, teacher_ids, classroom_ids, section_ids)
+        with timed(report, 'attendance_ms'):
+            load_attendance(cursor, args, by_week)
+        conn.commit()
+
+        conn.autocommit = True
+        with timed(report, 'analyze_ms'):
+            cursor.execute('ANALYZE')
+        cursor.execute("""
+            SELECT (SELECT COUNT(*) FROM persons WHERE role = 'student'),
+                   (SELECT COUNT(*) FROM sections),
+                   (SELECT COUNT(*) FROM schedule),
+                   (SELECT COUNT(*) FROM attendance)
+        """)
+        students, sections, schedules, attendance = cursor.fetchone()
+        cursor.close()
+        conn.close()
+
+    manifest = {
+        'schema': schema,
+        'seeded_at': datetime.now().isoformat(),
+        'users': [
+            {'username': f'load-teacher-{index + 1}', 'password': args.password}
+            for index in range(len(teacher_ids))
+        ],
+        'admin': {'username': 'load-admin', 'password': args.password},
+        'live_sessions': [
+            {'schedule_id': schedule_id, 'section_id': section_id, 'rfid_tags': tags[section_id]}
+            for schedule_id, section_id in live
+        ],
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.manifest)), exist_ok=True)
+    with open(args.manifest, 'w') as f:
+        json.dump(manifest, f)
+
+    report.update({
+        'schema': schema,
+        'manifest': args.manifest,
+        'rows': {'students': students, 'sections': sections, 'schedule': schedules, 'attendance': attendance},
+        'server_env': {
+            'PGOPTIONS': f'-c search_path={schema},public',
+            'DB_HOST': BENCH_DB_CONFIG['host'],
+            'DB_PORT': BENCH_DB_CONFIG['port'],
+            'DB_NAME': BENCH_DB_CONFIG['database'],
+            'DB_SSLMODE': BENCH_DB_CONFIG['sslmode'],
+        },
+    })
+    emit(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Spool Failover Check
+Posts scans with the database unreachable, then restores it and replays the spool
+
+Usage: BENCH_DB_HOST=localhost python benchmarks/spool_failover.py
+"""
+
+import os
+import time
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+from common import BENCH_DB_CONFIG, connect, scratch_schema, seed_students, emit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scans', type=int, default=5000)
+    parser.add_argument('--batch', type=int, default=200)
+    args = parser.parse_args()
+
+    spool_dir = tempfile.mkdtemp(prefix='attendance_spool_')
+    # Nothing listens on port 1, so every connect attempt fails fast
+    os.environ.update({
+        'DB_HOST': '127.0.0.1',
+        'DB_PORT': '1',
+        'SPOOL_PATH': os.path.join(spool_dir, 'spool.db'),
+        'SPOOL_REPLAY_INTERVAL': '3600',
+        'RFID_INDEX_ENABLED': 'false',
+        'TIMETABLE_ENABLED': 'false',
+    })
+
+    import jwt
+    import db_pool
+    import updated_app_render_ready as attendance_app
+
+    app = attendance_app.app
+    spool = attendance_app.scan_spool_store
+    token = jwt.encode({
+        'username': 'admin',
+        'role': 'admin',
+        'exp': datetime.utcnow() + timedelta(hours=1)
+    }, app.config['SECRET_KEY'], algorithm='HS256')
+    headers = {'Authorization': f'Bearer {token}'}
+
+    report = {'benchmark': 'spool_failover', 'scans': args.scans}
+
+    with scratch_schema() as schema:
+        conn = connect(schema)
+        cursor = conn.cursor()
+        tags = seed_students(cursor, args.scans)
+        conn.commit()
+
+        client = app.test_client()
+        now = datetime.now().isoformat()
+        started = time.perf_counter()
+        statuses = set()
+        for offset in range(0, len(tags), args.batch):
+            batch = [{'rfid_tag': tag, 'timestamp': now} for tag in tags[offset:offset + args.batch]]
+            response = client.post('/faculty/bulk-attendance', headers=headers,
+                                   json={'schedule_id': 1, 'attendance_data': batch})
+            statuses.add(response.status_code)
+        spool_seconds = time.perf_counter() - started
+        report['outage'] = {
+            'http_statuses': sorted(statuses),
+            'spool_depth': spool.depth(),
+            'scans_per_second': round(args.scans / spool_seconds, 1),
+        }
+
+        # Database comes back: point the pool at the scratch schema and replay
+        db_pool.configure(dict(BENCH_DB_CONFIG, options=f'-c search_path={schema},public'))
+        started = time.perf_counter()
+        replayed = spool.replay_pending()
+        replay_seconds = time.perf_counter() - started
+        cursor.execute('SELECT COUNT(*) FROM attendance')
+        written = cursor.fetchone()[0]
+        report['recovery'] = {
+            'replayed': replayed,
+            'attendance_rows': written,
+            'spool_depth': spool.depth(),
+            'scans_per_second': round(replayed / max(replay_seconds, 1e-9), 1),
+        }
+
+        # Replaying the same scans again must not add rows
+        spool.append([(1, tag, datetime.now()) for tag in tags])
+        spool.replay_pending()
+        cursor.execute('SELECT COUNT(*) FROM attendance')
+        report['idempotent_replay'] = cursor.fetchone()[0] == written
+        report['ok'] = (
+            report['outage']['http_statuses'] == [202]
+            and written == args.scans
+            and report['idempotent_replay']
+        )
+
+        cursor.close()
+        conn.close()
+
+    emit(report)
+    raise SystemExit(0 if report['ok'] else 1)
+
+
+if __name__ == '__main__':
+    main()
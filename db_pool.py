@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Database Connection Pool
+Per-worker pooled PostgreSQL connections with health checks on checkout
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+try:
+    from gevent.socket import wait_read, wait_write
+except ImportError:
+    wait_read = wait_write = None
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No connection became available within the checkout timeout"""
+
+
+class ConnectionPool:
+    """Thread-safe bounded pool of psycopg2 connections"""
+
+    def __init__(self, db_config, minconn=1, maxconn=10, timeout=5.0,
+                 healthcheck_interval=30.0, retry_backoff=2.0):
+        self.db_config = dict(db_config)
+        self.minconn = max(0, minconn)
+        self.maxconn = max(1, maxconn, self.minconn)
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+        self.retry_backoff = retry_backoff
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, last_used) pairs, most recently used last
+        self._in_use = set()
+        self._opening = 0
+        self._waiting = 0
+        self._down_until = 0.0
+        self._pid = os.getpid()
+        self._orphaned = []
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._connect_errors = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _check_fork(self):
+        """Drop connections inherited from a parent process (caller holds the lock)"""
+        pid = os.getpid()
+        if pid == self._pid:
+            return
+        # Keep references so the inherited sockets are never closed from the child
+        self._orphaned.extend(conn for conn, _ in self._idle)
+        self._orphaned.extend(self._in_use)
+        self._idle.clear()
+        self._in_use.clear()
+        self._opening = 0
+        self._waiting = 0
+        self._pid = pid
+
+    def _connect(self):
+        """Open a new connection, remembering outages so callers fail fast"""
+        if time.monotonic() < self._down_until:
+            raise psycopg2.OperationalError('database unavailable, waiting before reconnect')
+        try:
+            return psycopg2.connect(**self.db_config)
+        except Exception:
+            with self._cond:
+                self._connect_errors += 1
+                self._down_until = time.monotonic() + self.retry_backoff
+            raise
+
+    def _is_healthy(self, conn, last_used):
+        """Check a connection taken from the idle list before handing it out"""
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.healthcheck_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Discarding stale pooled connection: {e}")
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def getconn(self, timeout=None):
+        """Borrow a connection, waiting up to timeout seconds for a free slot"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            with self._cond:
+                self._check_fork()
+                conn = last_used = None
+                while True:
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        self._in_use.add(conn)
+                        break
+                    if len(self._in_use) + self._opening < self.maxconn:
+                        self._opening += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(f'no pooled connection available after {timeout:.1f}s')
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+
+            if conn is not None:
+                if self._is_healthy(conn, last_used):
+                    break
+                self._close_quietly(conn)
+                with self._cond:
+                    self._in_use.discard(conn)
+                    self._discarded += 1
+                    self._cond.notify()
+                continue
+
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._opening -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._opening -= 1
+                self._in_use.add(conn)
+            break
+
+        waited = time.monotonic() - started
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """Return a borrowed connection, rolling back any open transaction"""
+        if not discard and not conn.closed:
+            status = conn.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                discard = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+
+        with self._cond:
+            if conn not in self._in_use:
+                # Borrowed before a fork or already returned
+                return
+            self._in_use.discard(conn)
+            if discard or conn.closed or len(self._idle) >= self.maxconn:
+                self._discarded += 1
+                keep = False
+            else:
+                self._idle.append((conn, time.monotonic()))
+                keep = True
+            self._cond.notify()
+        if not keep:
+            self._close_quietly(conn)
+
+    def warm(self):
+        """Open connections up to minconn, ignoring failures"""
+        opened = []
+        with self._cond:
+            self._check_fork()
+            missing = self.minconn - len(self._idle) - len(self._in_use) - self._opening
+        for _ in range(max(0, missing)):
+            try:
+                opened.append(self._connect())
+            except Exception as e:
+                logger.error(f"Database connection error: {e}")
+                break
+        with self._cond:
+            now = time.monotonic()
+            self._idle.extendleft((conn, now) for conn in opened)
+            self._cond.notify(len(opened))
+        return len(opened)
+
+    def closeall(self):
+        """Close idle connections; borrowed ones are closed when returned"""
+        with self._cond:
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+        for conn in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        """Snapshot of pool usage counters"""
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                'min_size': self.minconn,
+                'max_size': self.maxconn,
+                'size': len(self._idle) + len(self._in_use),
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'waiting': self._waiting,
+                'checkouts': checkouts,
+                'timeouts': self._timeouts,
+                'connect_errors': self._connect_errors,
+                'discarded': self._discarded,
+                'wait_time_total_ms': round(self._wait_total * 1000, 3),
+                'wait_time_avg_ms': round(self._wait_total * 1000 / checkouts, 3) if checkouts else 0.0,
+                'wait_time_max_ms': round(self._wait_max * 1000, 3),
+                'database_available': time.monotonic() >= self._down_until,
+                'green': green_waits(),
+            }
+
+
+_pool = None
+_pool_options = {}
+_pool_lock = threading.Lock()
+
+
+def configure(db_config, **options):
+    """Set the connection settings used when this worker's pool is created"""
+    global _pool
+    with _pool_lock:
+        _pool_options.clear()
+        _pool_options.update(options)
+        _pool_options['db_config'] = db_config
+        _pool = None
+
+
+def get_pool():
+    """Return this worker's pool, creating it lazily after any fork"""
+    global _pool
+    pool = _pool
+    if pool is not None:
+        return pool
+    with _pool_lock:
+        if _pool is None:
+            if 'db_config' not in _pool_options:
+                raise RuntimeError('db_pool.configure() has not been called')
+            _pool = ConnectionPool(**_pool_options)
+            _pool.warm()
+        return _pool
+
+
+def borrow():
+    """Borrow a connection or return None when the database is unreachable"""
+    try:
+        return get_pool().getconn()
+    except Exception as e:
+        logger.error(f"Database connection error: {e}")
+        return None
+
+
+def release(conn, discard=False):
+    """Return a connection obtained from borrow()"""
+    if conn is not None:
+        get_pool().putconn(conn, discard=discard)
+
+
+@contextmanager
+def db_connection():
+    """Borrow a connection for the duration of a with block (None if unavailable)"""
+    conn = borrow()
+    try:
+        yield conn
+    finally:
+        release(conn)
+
+
+# Set by enable_green_waits(); see run_blocking()
+_green_hub = None
+_native_thread_ident = None
+
+
+def gevent_wait_callback(conn, timeout=None):
+    """psycopg2 wait callback that parks the calling greenlet until the socket is ready"""
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            return
+        if state == extensions.POLL_READ:
+            wait_read(conn.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(conn.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError(f'Unexpected poll state {state!r}')
+
+
+def enable_green_waits():
+    """Make every psycopg2 call cooperative when gevent has patched this process; returns whether it did
+
+    Under gunicorn's gevent worker a query then suspends only its own
+    request, not the whole worker. COPY is unavailable while the callback is
+    installed; see green_waits(). Blocking calls outside psycopg2 go through
+    run_blocking().
+    """
+    if wait_read is None:
+        return False
+    from gevent import monkey, get_hub
+    if not monkey.is_module_patched('socket'):
+        return False
+    global _green_hub, _native_thread_ident
+    extensions.set_wait_callback(gevent_wait_callback)
+    _green_hub = get_hub()
+    _native_thread_ident = monkey.get_original('_thread', 'get_ident')
+    logger.info("gevent detected: psycopg2 waits yield to other greenlets")
+    return True
+
+
+def green_waits():
+    return extensions.get_wait_callback() is not None
+
+
+def run_blocking(fn, *args):
+    """fn(*args), in gevent's native threadpool when green waits are on
+
+    For blocking calls the psycopg2 wait callback does not cover, such as
+    SQLite: the calling greenlet parks while a real thread runs fn. Calls
+    made outside the hub's thread, or without gevent, run inline.
+    """
+    hub = _green_hub
+    if hub is None or hub.thread_ident != _native_thread_ident():
+        return fn(*args)
+    return hub.threadpool.apply(fn, args)
+
+
+def pool_stats():
+    """Pool counters, or None before the pool has been created"""
+    pool = _pool
+    return pool.stats() if pool is not None else None
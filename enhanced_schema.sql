@@ -3,8 +3,13 @@
 -- ================================
 
 -- Drop tables in reverse order of dependencies
+DROP TABLE IF EXISTS schema_migrations CASCADE;
+DROP TABLE IF EXISTS agg_student_subject CASCADE;
+DROP TABLE IF EXISTS agg_session_attendance CASCADE;
+DROP TABLE IF EXISTS agg_section_enrollment CASCADE;
 DROP TABLE IF EXISTS users CASCADE;
 DROP TABLE IF EXISTS attendance CASCADE;
+DROP TABLE IF EXISTS attendance_terms CASCADE;
 DROP TABLE IF EXISTS schedule CASCADE;
 DROP TABLE IF EXISTS teacher_sections CASCADE;
 DROP TABLE IF EXISTS student_sections CASCADE;
@@ -23,7 +28,8 @@ CREATE TABLE persons (
     id_number VARCHAR(20) UNIQUE,
     password VARCHAR(255),
     status VARCHAR(20) DEFAULT 'active' CHECK (status IN ('active', 'inactive', 'graduated')),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 -- ================================
@@ -100,9 +106,18 @@ CREATE TABLE schedule (
 -- ================================
 -- 8. Enhanced Attendance Logs
 -- ================================
+-- Range-partitioned by term on schedule_id: each term's timetable is loaded
+-- as new schedule rows, so a term is one contiguous schedule_id range, and
+-- UNIQUE (schedule_id, person_id) contains the partition key.
+CREATE TABLE attendance_terms (
+    term_name VARCHAR(40) PRIMARY KEY,
+    first_schedule_id INT UNIQUE NOT NULL,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 CREATE TABLE attendance (
-    attendance_id SERIAL PRIMARY KEY,
-    schedule_id INT REFERENCES schedule(schedule_id) ON DELETE CASCADE,
+    attendance_id SERIAL,
+    schedule_id INT NOT NULL REFERENCES schedule(schedule_id) ON DELETE CASCADE,
     person_id INT REFERENCES persons(person_id) ON DELETE CASCADE,
     rfid_tag VARCHAR(100),
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -111,16 +126,375 @@ CREATE TABLE attendance (
     confidence_score FLOAT,
     location VARCHAR(50),
     notes TEXT,
+    PRIMARY KEY (attendance_id, schedule_id),
     UNIQUE (schedule_id, person_id)
+) PARTITION BY RANGE (schedule_id);
+
+INSERT INTO attendance_terms (term_name, first_schedule_id) VALUES ('initial', 0);
+CREATE TABLE attendance_initial PARTITION OF attendance FOR VALUES FROM (0) TO (MAXVALUE);
+
+-- Close the open term at the highest schedule_id so far and open p_term after it
+CREATE OR REPLACE FUNCTION attendance_start_term(p_term TEXT) RETURNS TEXT AS $$
+DECLARE
+    v_current attendance_terms%ROWTYPE;
+    v_boundary INT;
+    v_closed TEXT;
+    v_opened TEXT;
+BEGIN
+    IF p_term !~ '^[a-z0-9_]{1,30}$' THEN
+        RAISE EXCEPTION 'Term name must be 1-30 lowercase letters, digits or underscores';
+    END IF;
+
+    -- No schedule rows may be added while the boundary is fixed
+    LOCK TABLE schedule IN SHARE ROW EXCLUSIVE MODE;
+    SELECT * INTO v_current FROM attendance_terms ORDER BY first_schedule_id DESC LIMIT 1;
+    SELECT COALESCE(MAX(schedule_id), 0) + 1 INTO v_boundary FROM schedule;
+    IF v_boundary <= v_current.first_schedule_id THEN
+        RAISE EXCEPTION 'Term % has no schedule rows yet', v_current.term_name;
+    END IF;
+
+    v_closed := 'attendance_' || v_current.term_name;
+    v_opened := 'attendance_' || p_term;
+
+    EXECUTE format('ALTER TABLE attendance DETACH PARTITION %I', v_closed);
+    -- The CHECK lets ATTACH skip its own validation scan
+    EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I CHECK (schedule_id >= %s AND schedule_id < %s)',
+                   v_closed, v_closed || '_range', v_current.first_schedule_id, v_boundary);
+    EXECUTE format('ALTER TABLE attendance ATTACH PARTITION %I FOR VALUES FROM (%s) TO (%s)',
+                   v_closed, v_current.first_schedule_id, v_boundary);
+    EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', v_closed, v_closed || '_range');
+
+    EXECUTE format('CREATE TABLE %I PARTITION OF attendance FOR VALUES FROM (%s) TO (MAXVALUE)',
+                   v_opened, v_boundary);
+    INSERT INTO attendance_terms (term_name, first_schedule_id) VALUES (p_term, v_boundary);
+    RETURN v_opened;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ================================
+-- 9. Attendance Aggregates (maintained by triggers)
+-- ================================
+-- Aggregate keys carry no foreign keys to sections or persons: their rows are
+-- maintained by triggers that also fire during cascading deletes.
+
+-- Enrolled students per section
+CREATE TABLE agg_section_enrollment (
+    section_id INT PRIMARY KEY,
+    student_count INT NOT NULL DEFAULT 0
 );
 
+-- One row per class session held (a schedule slot on a date with at least one attendee)
+CREATE TABLE agg_session_attendance (
+    schedule_id INT REFERENCES schedule(schedule_id) ON DELETE CASCADE,
+    session_date DATE NOT NULL,
+    section_id INT NOT NULL,
+    subject_name VARCHAR(100) NOT NULL DEFAULT '',
+    present_count INT NOT NULL DEFAULT 0,
+    late_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (schedule_id, session_date)
+);
+CREATE INDEX idx_agg_session_section_date ON agg_session_attendance(section_id, session_date);
+CREATE INDEX idx_agg_session_section_subject ON agg_session_attendance(section_id, subject_name);
+
+-- Sessions attended per student, section and subject
+CREATE TABLE agg_student_subject (
+    person_id INT NOT NULL,
+    section_id INT NOT NULL,
+    subject_name VARCHAR(100) NOT NULL DEFAULT '',
+    present_count INT NOT NULL DEFAULT 0,
+    late_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (person_id, section_id, subject_name)
+);
+CREATE INDEX idx_agg_student_subject_section ON agg_student_subject(section_id, subject_name);
+
+-- Apply a signed batch of attendance rows to the aggregates
+CREATE OR REPLACE FUNCTION attendance_aggregates_apply(
+    p_schedule_ids INT[], p_person_ids INT[], p_days DATE[], p_statuses TEXT[], p_sign INT
+) RETURNS void AS $$
+BEGIN
+    IF p_schedule_ids IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO agg_session_attendance AS s
+        (schedule_id, session_date, section_id, subject_name, present_count, late_count)
+    SELECT d.schedule_id, d.day, sc.section_id, COALESCE(sc.subject_name, ''),
+           p_sign * COUNT(*) FILTER (WHERE d.status = 'present'),
+           p_sign * COUNT(*) FILTER (WHERE d.status = 'late')
+    FROM unnest(p_schedule_ids, p_person_ids, p_days, p_statuses) AS d(schedule_id, person_id, day, status)
+    JOIN schedule sc ON sc.schedule_id = d.schedule_id
+    WHERE d.status IN ('present', 'late')
+    GROUP BY d.schedule_id, d.day, sc.section_id, COALESCE(sc.subject_name, '')
+    ON CONFLICT (schedule_id, session_date) DO UPDATE
+        SET present_count = s.present_count + EXCLUDED.present_count,
+            late_count = s.late_count + EXCLUDED.late_count;
+
+    INSERT INTO agg_student_subject AS a
+        (person_id, section_id, subject_name, present_count, late_count)
+    SELECT d.person_id, sc.section_id, COALESCE(sc.subject_name, ''),
+           p_sign * COUNT(*) FILTER (WHERE d.status = 'present'),
+           p_sign * COUNT(*) FILTER (WHERE d.status = 'late')
+    FROM unnest(p_schedule_ids, p_person_ids, p_days, p_statuses) AS d(schedule_id, person_id, day, status)
+    JOIN schedule sc ON sc.schedule_id = d.schedule_id
+    WHERE d.status IN ('present', 'late')
+    GROUP BY d.person_id, sc.section_id, COALESCE(sc.subject_name, '')
+    ON CONFLICT (person_id, section_id, subject_name) DO UPDATE
+        SET present_count = a.present_count + EXCLUDED.present_count,
+            late_count = a.late_count + EXCLUDED.late_count;
+
+    IF p_sign < 0 THEN
+        -- A session with nobody left in it was never held
+        DELETE FROM agg_session_attendance
+        WHERE (schedule_id, session_date) IN (
+            SELECT u.schedule_id, u.day FROM unnest(p_schedule_ids, p_days) AS u(schedule_id, day)
+        )
+          AND present_count + late_count <= 0;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION attendance_aggregates_insert() RETURNS trigger AS $$
+BEGIN
+    PERFORM attendance_aggregates_apply(
+        array_agg(schedule_id), array_agg(person_id), array_agg(timestamp::date), array_agg(status::text), 1)
+    FROM new_rows;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION attendance_aggregates_delete() RETURNS trigger AS $$
+BEGIN
+    PERFORM attendance_aggregates_apply(
+        array_agg(schedule_id), array_agg(person_id), array_agg(timestamp::date), array_agg(status::text), -1)
+    FROM old_rows;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION attendance_aggregates_update() RETURNS trigger AS $$
+BEGIN
+    PERFORM attendance_aggregates_apply(
+        array_agg(schedule_id), array_agg(person_id), array_agg(timestamp::date), array_agg(status::text), -1)
+    FROM old_rows;
+    PERFORM attendance_aggregates_apply(
+        array_agg(schedule_id), array_agg(person_id), array_agg(timestamp::date), array_agg(status::text), 1)
+    FROM new_rows;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER attendance_aggregates_insert
+    AFTER INSERT ON attendance REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_aggregates_insert();
+
+CREATE TRIGGER attendance_aggregates_delete
+    AFTER DELETE ON attendance REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_aggregates_delete();
+
+CREATE TRIGGER attendance_aggregates_update
+    AFTER UPDATE ON attendance REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_aggregates_update();
+
+-- Enrollment counts follow student_sections
+CREATE OR REPLACE FUNCTION section_enrollment_apply(p_section_ids INT[], p_sign INT) RETURNS void AS $$
+BEGIN
+    IF p_section_ids IS NULL THEN
+        RETURN;
+    END IF;
+    INSERT INTO agg_section_enrollment AS e (section_id, student_count)
+    SELECT u.section_id, p_sign * COUNT(*)
+    FROM unnest(p_section_ids) AS u(section_id)
+    GROUP BY u.section_id
+    ON CONFLICT (section_id) DO UPDATE
+        SET student_count = e.student_count + EXCLUDED.student_count;
+
+    IF p_sign < 0 THEN
+        DELETE FROM agg_section_enrollment
+        WHERE section_id = ANY(p_section_ids) AND student_count <= 0;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION section_enrollment_insert() RETURNS trigger AS $$
+BEGIN
+    PERFORM section_enrollment_apply(array_agg(section_id), 1) FROM new_rows;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION section_enrollment_delete() RETURNS trigger AS $$
+BEGIN
+    PERFORM section_enrollment_apply(array_agg(section_id), -1) FROM old_rows;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION section_enrollment_update() RETURNS trigger AS $$
+BEGIN
+    PERFORM section_enrollment_apply(array_agg(section_id), -1) FROM old_rows;
+    PERFORM section_enrollment_apply(array_agg(section_id), 1) FROM new_rows;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER section_enrollment_insert
+    AFTER INSERT ON student_sections REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION section_enrollment_insert();
+
+CREATE TRIGGER section_enrollment_delete
+    AFTER DELETE ON student_sections REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION section_enrollment_delete();
+
+CREATE TRIGGER section_enrollment_update
+    AFTER UPDATE ON student_sections REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION section_enrollment_update();
+
+-- Attendance aggregates are keyed by the schedule's section and subject, so
+-- a schedule row's attendance is removed while the row still exists, and
+-- moving a schedule row moves its counts with it
+CREATE OR REPLACE FUNCTION schedule_aggregates_delete() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM attendance WHERE schedule_id = OLD.schedule_id;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION schedule_aggregates_update() RETURNS trigger AS $$
+BEGIN
+    IF NEW.section_id IS NOT DISTINCT FROM OLD.section_id
+       AND COALESCE(NEW.subject_name, '') = COALESCE(OLD.subject_name, '') THEN
+        RETURN NULL;
+    END IF;
+
+    UPDATE agg_session_attendance
+    SET section_id = NEW.section_id, subject_name = COALESCE(NEW.subject_name, '')
+    WHERE schedule_id = NEW.schedule_id;
+
+    INSERT INTO agg_student_subject AS a (person_id, section_id, subject_name, present_count, late_count)
+    SELECT m.person_id, m.section_id, m.subject_name, m.sign * m.present_count, m.sign * m.late_count
+    FROM (
+        SELECT person_id,
+               COUNT(*) FILTER (WHERE status = 'present') AS present_count,
+               COUNT(*) FILTER (WHERE status = 'late') AS late_count
+        FROM attendance
+        WHERE schedule_id = NEW.schedule_id AND status IN ('present', 'late')
+        GROUP BY person_id
+    ) c
+    CROSS JOIN LATERAL (VALUES
+        (c.person_id, OLD.section_id, COALESCE(OLD.subject_name, ''), -1, c.present_count, c.late_count),
+        (c.person_id, NEW.section_id, COALESCE(NEW.subject_name, ''), 1, c.present_count, c.late_count)
+    ) AS m(person_id, section_id, subject_name, sign, present_count, late_count)
+    ON CONFLICT (person_id, section_id, subject_name) DO UPDATE
+        SET present_count = a.present_count + EXCLUDED.present_count,
+            late_count = a.late_count + EXCLUDED.late_count;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER schedule_aggregates_delete
+    BEFORE DELETE ON schedule
+    FOR EACH ROW EXECUTE FUNCTION schedule_aggregates_delete();
+
+CREATE TRIGGER schedule_aggregates_update
+    AFTER UPDATE OF section_id, subject_name ON schedule
+    FOR EACH ROW EXECUTE FUNCTION schedule_aggregates_update();
+
+-- Full recompute, for repairs and the consistency check
+CREATE OR REPLACE FUNCTION attendance_aggregates_rebuild() RETURNS void AS $$
+BEGIN
+    TRUNCATE agg_section_enrollment, agg_session_attendance, agg_student_subject;
+
+    INSERT INTO agg_section_enrollment (section_id, student_count)
+    SELECT section_id, COUNT(*) FROM student_sections GROUP BY section_id;
+
+    INSERT INTO agg_session_attendance
+        (schedule_id, session_date, section_id, subject_name, present_count, late_count)
+    SELECT a.schedule_id, a.timestamp::date, sc.section_id, COALESCE(sc.subject_name, ''),
+           COUNT(*) FILTER (WHERE a.status = 'present'),
+           COUNT(*) FILTER (WHERE a.status = 'late')
+    FROM attendance a
+    JOIN schedule sc ON sc.schedule_id = a.schedule_id
+    WHERE a.status IN ('present', 'late')
+    GROUP BY a.schedule_id, a.timestamp::date, sc.section_id, COALESCE(sc.subject_name, '');
+
+    INSERT INTO agg_student_subject (person_id, section_id, subject_name, present_count, late_count)
+    SELECT a.person_id, sc.section_id, COALESCE(sc.subject_name, ''),
+           COUNT(*) FILTER (WHERE a.status = 'present'),
+           COUNT(*) FILTER (WHERE a.status = 'late')
+    FROM attendance a
+    JOIN schedule sc ON sc.schedule_id = a.schedule_id
+    WHERE a.status IN ('present', 'late')
+    GROUP BY a.person_id, sc.section_id, COALESCE(sc.subject_name, '');
+END;
+$$ LANGUAGE plpgsql;
+
 -- ================================
 -- Add indexes for better performance
 -- ================================
-CREATE INDEX idx_attendance_schedule_id ON attendance(schedule_id);
-CREATE INDEX idx_attendance_person_id ON attendance(person_id);
+-- (schedule_id, person_id) lookups use the UNIQUE constraint's index
+CREATE INDEX idx_attendance_person_timestamp ON attendance(person_id, timestamp);
 CREATE INDEX idx_attendance_timestamp ON attendance(timestamp);
-CREATE INDEX idx_persons_rfid ON persons(rfid_tag);
+CREATE INDEX idx_persons_active_student_rfid ON persons(rfid_tag) INCLUDE (person_id, name, id_number)
+    WHERE status = 'active' AND role = 'student';
+CREATE INDEX idx_persons_updated_at ON persons(updated_at);
+
+-- ================================
+-- Change notifications for the in-process RFID index
+-- ================================
+CREATE OR REPLACE FUNCTION persons_notify_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('persons_changed', json_build_object(
+            'op', TG_OP, 'person_id', OLD.person_id, 'rfid_tag', OLD.rfid_tag)::text);
+        RETURN OLD;
+    END IF;
+    NEW.updated_at := clock_timestamp();
+    PERFORM pg_notify('persons_changed', json_build_object(
+        'op', TG_OP, 'person_id', NEW.person_id, 'rfid_tag', NEW.rfid_tag)::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER persons_notify_change
+    BEFORE INSERT OR UPDATE OR DELETE ON persons
+    FOR EACH ROW EXECUTE FUNCTION persons_notify_change();
+
+-- Timetable cache rebuilds on any change to schedule, sections or classrooms
+CREATE OR REPLACE FUNCTION schedule_notify_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('schedule_changed', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER schedule_notify_change
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON schedule
+    FOR EACH STATEMENT EXECUTE FUNCTION schedule_notify_change();
+
+CREATE TRIGGER sections_notify_change
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON sections
+    FOR EACH STATEMENT EXECUTE FUNCTION schedule_notify_change();
+
+CREATE TRIGGER classrooms_notify_change
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON classrooms
+    FOR EACH STATEMENT EXECUTE FUNCTION schedule_notify_change();
+
+-- ================================
+-- Schema version (see migrate.py)
+-- ================================
+-- This file already includes every migration listed here
+CREATE TABLE schema_migrations (
+    version INT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    checksum VARCHAR(64),
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO schema_migrations (version, name) VALUES
+(1, 'attendance_indexes'),
+(2, 'change_notifications'),
+(3, 'attendance_aggregates'),
+(4, 'partition_attendance');
 
 -- ================================
 -- Sample Data
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Live Attendance Events
+NOTIFY-backed fan-out of attendance events to Server-Sent Events subscribers
+"""
+
+import json
+import time
+import logging
+import threading
+from collections import deque
+from datetime import date
+
+from pg_listener import ChangeListener
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'attendance_events'
+
+# NOTIFY payloads must stay under 8000 bytes
+MAX_PAYLOAD_BYTES = 7500
+
+TODAY_SECTION_COUNTS_SQL = """
+    SELECT sc.section_id, COUNT(*)
+    FROM attendance a
+    JOIN schedule sc ON a.schedule_id = sc.schedule_id
+    WHERE a.timestamp >= CURRENT_DATE AND a.timestamp < CURRENT_DATE + 1
+    GROUP BY sc.section_id
+"""
+
+
+def notify_recorded(cursor, schedule_id, section_id, records):
+    """Queue NOTIFYs for newly written attendance; delivered when the transaction commits"""
+    if not records:
+        return
+    chunk = []
+    size = 0
+    for record in records:
+        item = {
+            'person_id': record.person_id,
+            'name': record.name,
+            'id_number': record.id_number,
+            'rfid_tag': record.rfid_tag,
+            'timestamp': record.timestamp.isoformat(),
+            'method': record.method,
+        }
+        item_size = len(json.dumps(item)) + 2
+        if chunk and size + item_size > MAX_PAYLOAD_BYTES:
+            _notify(cursor, schedule_id, section_id, chunk)
+            chunk = []
+            size = 0
+        chunk.append(item)
+        size += item_size
+    _notify(cursor, schedule_id, section_id, chunk)
+
+
+def _notify(cursor, schedule_id, section_id, records):
+    payload = json.dumps({'schedule_id': schedule_id, 'section_id': section_id, 'records': records})
+    cursor.execute('SELECT pg_notify(%s, %s)', (NOTIFY_CHANNEL, payload))
+
+
+class Subscriber:
+    """One connected client with a bounded event buffer"""
+
+    __slots__ = ('events', 'dropped', '_cond')
+
+    def __init__(self, max_buffer):
+        self.events = deque(maxlen=max_buffer)
+        self.dropped = 0
+        self._cond = threading.Condition()
+
+    def push(self, event):
+        with self._cond:
+            if len(self.events) == self.events.maxlen:
+                # Slow client: the oldest event falls off and it will be told to resync
+                self.dropped += 1
+            self.events.append(event)
+            self._cond.notify()
+
+    def drain(self, timeout):
+        """Wait up to timeout for events and return everything buffered"""
+        with self._cond:
+            if not self.events:
+                self._cond.wait(timeout)
+            events = list(self.events)
+            self.events.clear()
+            dropped, self.dropped = self.dropped, 0
+        return events, dropped
+
+
+class EventHub:
+    """Per-worker fan-out fed by one LISTEN connection"""
+
+    def __init__(self, db_config, max_subscribers=200, buffer_size=256,
+                 heartbeat_interval=15.0, recent_size=20):
+        self.max_subscribers = max_subscribers
+        self.buffer_size = buffer_size
+        self.heartbeat_interval = heartbeat_interval
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._recent = deque(maxlen=recent_size)
+        self._section_counts = {}
+        self._counts_date = None
+        self._next_id = 1
+
+        self.published = 0
+        self.notifications = 0
+        self.rejected_subscribers = 0
+
+        self._listener = ChangeListener(
+            'attendance-events', db_config, [NOTIFY_CHANNEL],
+            on_connect=self._load_counts,
+            on_notify=self._on_notify,
+            interval=3600.0,
+        )
+
+    def ensure_started(self):
+        self._listener.ensure_started()
+
+    def _load_counts(self, cursor):
+        """Today's per-section attendance, reloaded whenever the listener (re)connects"""
+        cursor.execute(TODAY_SECTION_COUNTS_SQL)
+        counts = {section_id: count for section_id, count in cursor.fetchall()}
+        with self._lock:
+            self._section_counts = counts
+            self._counts_date = date.today()
+        self._publish('section_counts', {'counts': counts, 'replace': True})
+
+    def _on_notify(self, cursor, notifies):
+        if self._counts_date != date.today():
+            self._load_counts(cursor)
+        for notify in notifies:
+            self.notifications += 1
+            try:
+                payload = json.loads(notify.payload)
+            except ValueError:
+                continue
+            section_id = payload.get('section_id')
+            records = payload.get('records', [])
+            with self._lock:
+                count = self._section_counts.get(section_id, 0) + len(records)
+                self._section_counts[section_id] = count
+            self._publish('attendance', payload, recent=True)
+            self._publish('section_counts', {'counts': {section_id: count}, 'replace': False})
+        return True
+
+    def _publish(self, event_type, data, recent=False):
+        with self._lock:
+            event = (self._next_id, event_type, json.dumps(data, default=str))
+            self._next_id += 1
+            if recent:
+                self._recent.append(event)
+            subscribers = list(self._subscribers)
+            self.published += 1
+        for subscriber in subscribers:
+            subscriber.push(event)
+
+    def subscribe(self):
+        """Register a client, or return None when this worker is at capacity"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self.rejected_subscribers += 1
+                return None
+            subscriber = Subscriber(self.buffer_size)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counts': dict(self._section_counts),
+                'date': self._counts_date,
+                'recent': [json.loads(data) for _, _, data in self._recent],
+            }
+
+    def stream(self, subscriber):
+        """Yield SSE frames for a subscriber until the client disconnects"""
+        try:
+            yield 'retry: 5000\n\n'
+            yield _frame(None, 'snapshot', json.dumps(self.snapshot(), default=str))
+            while True:
+                events, dropped = subscriber.drain(self.heartbeat_interval)
+                if dropped:
+                    yield _frame(None, 'snapshot', json.dumps(self.snapshot(), default=str))
+                    continue
+                if not events:
+                    yield f': heartbeat {int(time.time())}\n\n'
+                    continue
+                for event_id, event_type, data in events:
+                    yield _frame(event_id, event_type, data)
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'max_subscribers': self.max_subscribers,
+                'rejected_subscribers': self.rejected_subscribers,
+                'published': self.published,
+                'notifications': self.notifications,
+                'listening': self._listener.listening,
+            }
+
+
+def _frame(event_id, event_type, data):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event_type}')
+    lines.append(f'data: {data}')
+    return '\n'.join(lines) + '\n\n'
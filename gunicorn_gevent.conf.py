@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Gevent Worker Configuration
+Serves the unchanged Flask app with one greenlet per connection, for large reader fleets
+
+Usage: gunicorn -c gunicorn_gevent.conf.py updated_app_render_ready:app
+"""
+
+import os
+
+worker_class = 'gevent'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# Open client connections per worker; requests beyond DB_POOL_MAX wait in the pool, not in the kernel backlog
+worker_connections = int(os.environ.get('GEVENT_WORKER_CONNECTIONS', 1000))
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+backlog = int(os.environ.get('GUNICORN_BACKLOG', 2048))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 30))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+# Each worker must build its own pools, caches and background greenlets after the gevent patch
+preload_app = False
+
+
+def on_starting(server):
+    """Leave online-class sessions off unless this runs a single worker, since they live in one worker's memory"""
+    os.environ.setdefault('ONLINE_SESSIONS_ENABLED', 'true' if server.cfg.workers == 1 else 'false')
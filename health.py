@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Health Monitor
+Background database probe so /health answers from cached state
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+
+import db_pool
+
+logger = logging.getLogger(__name__)
+
+STUDENT_COUNT_SQL = "SELECT COUNT(*) FROM persons WHERE role = 'student'"
+
+
+class HealthMonitor:
+    """Checks the database every interval seconds, off the request path"""
+
+    def __init__(self, interval=10.0):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._state = {
+            'database': 'unknown',
+            'student_count': 0,
+            'checked_at': None,
+            'check_ms': None,
+        }
+        self._checked = None
+        self.checks = 0
+        self.failures = 0
+
+    def ensure_started(self):
+        """Start the probe thread once per worker process"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='health-monitor', daemon=True).start()
+
+    def _run(self):
+        while True:
+            self.check()
+            time.sleep(self.interval)
+
+    def check(self):
+        started = time.perf_counter()
+        database = 'disconnected'
+        student_count = self._state['student_count']
+        try:
+            with db_pool.db_connection() as conn:
+                if conn is not None:
+                    cursor = conn.cursor()
+                    cursor.execute(STUDENT_COUNT_SQL)
+                    student_count = cursor.fetchone()[0]
+                    cursor.close()
+                    database = 'connected'
+        except Exception as e:
+            logger.error(f"Health check error: {e}")
+
+        with self._lock:
+            self.checks += 1
+            if database != 'connected':
+                self.failures += 1
+            self._checked = time.monotonic()
+            self._state = {
+                'database': database,
+                'student_count': student_count,
+                'checked_at': datetime.utcnow().isoformat(),
+                'check_ms': round((time.perf_counter() - started) * 1000, 3),
+            }
+
+    def snapshot(self):
+        with self._lock:
+            state = dict(self._state)
+            age = time.monotonic() - self._checked if self._checked is not None else None
+        state['age_seconds'] = round(age, 3) if age is not None else None
+        state['stale'] = age is None or age > 3 * self.interval
+        return state
+
+    def stats(self):
+        with self._lock:
+            return {'checks': self.checks, 'failures': self.failures}
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Classroom Image Pipeline
+In-memory decode and NumPy preprocessing of uploaded images in a bounded process pool
+"""
+
+import io
+import os
+import json
+import math
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from PIL import Image
+
+import db_pool
+
+logger = logging.getLogger(__name__)
+
+# ITU-R BT.601 luma weights
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+JOBS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS image_jobs (
+        job_id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        result TEXT,
+        created_at REAL NOT NULL,
+        finished_at REAL
+    )
+"""
+
+
+class PoolBusy(Exception):
+    """Every pool slot is taken; the client should retry later"""
+
+
+class ImageError(ValueError):
+    """The upload is not a decodable image"""
+
+
+def _ms(started):
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+def preprocess(data, max_side=640, submitted_at=None):
+    """Decode image bytes and return grayscale, normalized frame statistics with per-stage timings
+
+    Runs in a pool process. Only summary values cross the process boundary;
+    the frame itself stays here.
+    """
+    timings = {}
+    if submitted_at is not None:
+        timings['queue_wait_ms'] = round(max(time.time() - submitted_at, 0.0) * 1000, 3)
+
+    started = time.perf_counter()
+    try:
+        image = Image.open(io.BytesIO(data))
+        original_size = image.size
+        # JPEG can decode at 1/2, 1/4 or 1/8 scale, far cheaper than decoding full size and shrinking
+        image.draft('RGB', (max_side, max_side))
+        frame = np.asarray(image.convert('RGB'))
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageError(f'Cannot decode image: {e}') from None
+    timings['decode_ms'] = _ms(started)
+
+    started = time.perf_counter()
+    factor = max(1, math.ceil(max(frame.shape[0], frame.shape[1]) / max_side))
+    if factor > 1:
+        # Area-average downscale: crop to a multiple of factor, then mean over factor x factor blocks
+        height = frame.shape[0] // factor * factor
+        width = frame.shape[1] // factor * factor
+        blocks = frame[:height, :width].reshape(height // factor, factor, width // factor, factor, 3)
+        frame = blocks.mean(axis=(1, 3), dtype=np.float32)
+    else:
+        frame = frame.astype(np.float32)
+    timings['resize_ms'] = _ms(started)
+
+    started = time.perf_counter()
+    gray = frame @ LUMA_WEIGHTS
+    timings['grayscale_ms'] = _ms(started)
+
+    started = time.perf_counter()
+    mean = float(gray.mean())
+    std = float(gray.std())
+    normalized = (gray - mean) / (std or 1.0)
+    # Variance of a 4-neighbour Laplacian: low values mean a blurred frame
+    laplacian = (normalized[1:-1, :-2] + normalized[1:-1, 2:] + normalized[:-2, 1:-1]
+                 + normalized[2:, 1:-1] - 4 * normalized[1:-1, 1:-1])
+    timings['normalize_ms'] = _ms(started)
+
+    return {
+        'original_size': list(original_size),
+        'decoded_size': [int(image.size[0]), int(image.size[1])],
+        'processed_size': [int(gray.shape[1]), int(gray.shape[0])],
+        'brightness': round(mean / 255.0, 4),
+        'contrast': round(std / 255.0, 4),
+        'sharpness': round(float(laplacian.var()), 4) if laplacian.size else 0.0,
+        'timings': timings,
+    }
+
+
+class JobStore:
+    """Async job results in a local SQLite file, so any worker on the host can answer a poll"""
+
+    def __init__(self, path, ttl=3600.0):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        # Job results are only for the clients that submitted them
+        os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+        db = self._connect()
+        db.execute(JOBS_SCHEMA)
+        db.close()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        return db
+
+    def _db(self):
+        """One SQLite connection per thread and process"""
+        db = getattr(self._local, 'db', None)
+        if db is None or getattr(self._local, 'pid', None) != os.getpid():
+            db = self._connect()
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def _execute(self, sql, params):
+        """Run one statement and fetch its first row, in gevent's threadpool under green waits"""
+        return db_pool.run_blocking(lambda: self._db().execute(sql, params).fetchone())
+
+    def create(self):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._execute('DELETE FROM image_jobs WHERE created_at < ?', (now - self.ttl,))
+        self._execute(
+            "INSERT INTO image_jobs (job_id, status, created_at) VALUES (?, 'pending', ?)",
+            (job_id, now)
+        )
+        return job_id
+
+    def finish(self, job_id, status, result):
+        self._execute(
+            'UPDATE image_jobs SET status = ?, result = ?, finished_at = ? WHERE job_id = ?',
+            (status, json.dumps(result), time.time(), job_id)
+        )
+
+    def discard(self, job_id):
+        self._execute('DELETE FROM image_jobs WHERE job_id = ?', (job_id,))
+
+    def get(self, job_id):
+        row = self._execute(
+            'SELECT status, result, created_at, finished_at FROM image_jobs WHERE job_id = ?', (job_id,)
+        )
+        if row is None:
+            return None
+        status, result, created_at, finished_at = row
+        return {
+            'job_id': job_id,
+            'status': status,
+            'result': json.loads(result) if result else None,
+            'age_seconds': round(time.time() - created_at, 3),
+            'finished_at': finished_at,
+        }
+
+
+class ImagePool:
+    """Bounded process pool for image work, created lazily in each worker process
+
+    At most max_pending images are queued or running at once; beyond that
+    submit raises PoolBusy instead of letting uploads pile up in memory.
+    """
+
+    def __init__(self, max_workers=2, max_pending=8, max_side=640, jobs=None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_side = max_side
+        self.jobs = jobs
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.stage_totals = {}
+
+    def _get_executor(self):
+        if self._pid != os.getpid():
+            # A pool inherited across fork belongs to the parent
+            self._pid = os.getpid()
+            self._executor = None
+            self._pending = 0
+        if self._executor is None:
+            # Forking from a threaded worker is unsafe, so pool processes come from a fork server
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        return self._executor
+
+    def _discard_executor(self, executor):
+        """Drop a broken pool so the next upload starts a fresh one"""
+        if self._executor is executor:
+            self._executor = None
+
+    def submit(self, data):
+        """Queue image bytes for preprocessing and return a Future"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PoolBusy()
+            executor = self._get_executor()
+            self._pending += 1
+            self.submitted += 1
+        try:
+            future = executor.submit(preprocess, data, self.max_side, time.time())
+        except BrokenProcessPool:
+            # A pool process died (e.g. OOM-killed)
+            with self._lock:
+                self._pending -= 1
+                self.failed += 1
+                self._discard_executor(executor)
+            raise
+        future.add_done_callback(lambda done: self._on_done(executor, done))
+        return future
+
+    def submit_job(self, data):
+        """Queue image bytes as an async job and return its id"""
+        job_id = self.jobs.create()
+        try:
+            future = self.submit(data)
+        except Exception:
+            self.jobs.discard(job_id)
+            raise
+        future.add_done_callback(lambda done: self._finish_job(job_id, done))
+        return job_id
+
+    def _finish_job(self, job_id, future):
+        try:
+            error = future.exception()
+            if error is None:
+                self.jobs.finish(job_id, 'done', future.result())
+            else:
+                self.jobs.finish(job_id, 'failed', {'error': str(error)})
+        except Exception as e:
+            logger.error(f"Image job store error: {e}")
+
+    def _on_done(self, executor, future):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                self.failed += 1
+                return
+            error = future.exception()
+            if error is not None:
+                self.failed += 1
+                if isinstance(error, BrokenProcessPool):
+                    self._discard_executor(executor)
+                return
+            self.completed += 1
+            for stage, value in future.result()['timings'].items():
+                self.stage_totals[stage] = self.stage_totals.get(stage, 0.0) + value
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'pending': self._pending,
+                'queue_depth': max(0, self._pending - self.max_workers),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'avg_stage_ms': {
+                    stage: round(total / self.completed, 3)
+                    for stage, total in self.stage_totals.items()
+                } if self.completed else {},
+            }
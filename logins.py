@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Login Path
+Password checks in a bounded thread pool, a short-lived cache of verified logins, and batched last_login writes
+"""
+
+import os
+import hmac
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+import psycopg2
+from psycopg2.extras import execute_values
+
+import db_pool
+
+logger = logging.getLogger(__name__)
+
+# One round trip: the stored hash is checked in Python, not compared in SQL
+CREDENTIALS_SQL = """
+    SELECT u.id, u.username, u.role, p.name, u.password
+    FROM users u
+    LEFT JOIN persons p ON u.person_id = p.person_id
+    WHERE u.username = %s
+"""
+
+# Never moves last_login backwards when an older batch lands after a newer one
+LAST_LOGIN_SQL = """
+    UPDATE users AS u SET last_login = v.at
+    FROM (VALUES %s) AS v(id, at)
+    WHERE u.id = v.id AND (u.last_login IS NULL OR u.last_login < v.at)
+"""
+
+BCRYPT_PREFIXES = ('$2a$', '$2b$', '$2y$')
+
+
+class PoolBusy(Exception):
+    """Every hashing slot is taken; the client should retry later"""
+
+
+def check_password(password, stored):
+    """Whether password matches the stored bcrypt hash (or, for legacy rows, the stored plaintext)"""
+    if not stored:
+        return False
+    if stored.startswith(BCRYPT_PREFIXES):
+        try:
+            return bcrypt.checkpw(password.encode('utf-8'), stored.encode('ascii'))
+        except (ValueError, UnicodeEncodeError):
+            # Malformed hash
+            return False
+    return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+
+
+def _thread_executor(max_workers):
+    """A pool of real OS threads, also when gevent has patched this process"""
+    # Patched threads are greenlets; hashing in one would stall every request on the worker
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched('threading'):
+            from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+            return NativeThreadPoolExecutor(max_workers=max_workers)
+    except ImportError:
+        pass
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='password-check')
+
+
+class PasswordPool:
+    """Bounded thread pool for bcrypt checks, created lazily in each worker process
+
+    bcrypt releases the GIL while hashing, so the request thread (or
+    greenlet) waits on the future while other requests keep running. At
+    most max_pending checks are queued or running; beyond that submit
+    raises PoolBusy rather than letting a login storm build a backlog.
+    """
+
+    def __init__(self, max_workers=4, max_pending=64):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+
+        self.submitted = 0
+        self.matched = 0
+        self.rejected = 0
+        self.check_ms_total = 0.0
+
+    def _get_executor(self):
+        if self._pid != os.getpid():
+            # A pool inherited across fork belongs to the parent
+            self._pid = os.getpid()
+            self._executor = None
+            self._pending = 0
+        if self._executor is None:
+            self._executor = _thread_executor(self.max_workers)
+        return self._executor
+
+    def submit(self, password, stored):
+        """Queue a password check and return a Future resolving to True or False"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PoolBusy()
+            executor = self._get_executor()
+            self._pending += 1
+            self.submitted += 1
+        future = executor.submit(self._check, password, stored)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _check(self, password, stored):
+        started = time.perf_counter()
+        matched = check_password(password, stored)
+        return matched, (time.perf_counter() - started) * 1000
+
+    def _on_done(self, future):
+        with self._lock:
+            self._pending -= 1
+            if not future.cancelled() and future.exception() is None:
+                matched, elapsed = future.result()
+                self.matched += int(matched)
+                self.check_ms_total += elapsed
+
+    def check(self, password, stored, timeout=None):
+        """Run a check in the pool and wait for it; raises PoolBusy or concurrent.futures.TimeoutError"""
+        return self.submit(password, stored).result(timeout=timeout)[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'pending': self._pending,
+                'submitted': self.submitted,
+                'matched': self.matched,
+                'rejected': self.rejected,
+                'check_ms_avg': round(self.check_ms_total / self.submitted, 3) if self.submitted else 0.0,
+            }
+
+
+class CredentialCache:
+    """Recently verified logins, so a repeat login skips the database and the hash check
+
+    Entries hold the user row and an HMAC of the password under a key that
+    exists only in this process, never the password itself. A password
+    change or a disabled account takes effect for cached users when the
+    entry expires (ttl seconds) unless forget() is called.
+    """
+
+    def __init__(self, ttl=900.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._key = os.urandom(32)
+        self._entries = OrderedDict()  # username -> (digest, user, expires_at)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _digest(self, password):
+        return hmac.new(self._key, password.encode('utf-8'), hashlib.sha256).digest()
+
+    def get(self, username, password):
+        """The cached user row for a login with this exact password, or None"""
+        if self.ttl <= 0:
+            return None
+        digest = self._digest(password)
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry[2] > time.monotonic() and hmac.compare_digest(entry[0], digest):
+                self._entries.move_to_end(username)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        return None
+
+    def put(self, username, password, user):
+        if self.ttl <= 0:
+            return
+        entry = (self._digest(password), user, time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[username] = entry
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def forget(self, username):
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class LastLoginWriter:
+    """Coalesces last_login per user in memory and writes them in one UPDATE every flush_interval seconds
+
+    A user who logs in many times between flushes costs one row update. Up
+    to flush_interval seconds of last_login values are lost if the worker
+    is killed.
+    """
+
+    def __init__(self, batch_size=1000, flush_interval=10.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = {}  # user_id -> latest login datetime
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+
+        self.logins = 0
+        self.written = 0
+        self.flushes = 0
+        self.write_errors = 0
+
+    def ensure_started(self):
+        """Start the writer thread once per worker process"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='last-login', daemon=True)
+            self._thread.start()
+
+    def touch(self, user_id, at=None):
+        """Record a login; only the latest per user is written"""
+        at = at or datetime.utcnow()
+        with self._lock:
+            self.logins += 1
+            last = self._pending.get(user_id)
+            if last is None or at > last:
+                self._pending[user_id] = at
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                while self.flush() >= self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"last_login writer error: {e}")
+
+    def flush(self):
+        """Write up to batch_size pending logins in one statement; returns the number taken"""
+        with self._lock:
+            batch = []
+            for user_id in list(self._pending)[:self.batch_size]:
+                batch.append((user_id, self._pending.pop(user_id)))
+        if not batch:
+            return 0
+
+        with db_pool.db_connection() as conn:
+            if conn is None:
+                self._requeue(batch, 'Database connection failed')
+                return 0
+            try:
+                cursor = conn.cursor()
+                execute_values(cursor, LAST_LOGIN_SQL, batch, template='(%s, %s::timestamp)')
+                conn.commit()
+                cursor.close()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                self._requeue(batch, str(e))
+                return 0
+            except Exception as e:
+                conn.rollback()
+                with self._lock:
+                    self.write_errors += 1
+                logger.error(f"last_login write error, dropped {len(batch)} updates: {e}")
+                return 0
+
+        with self._lock:
+            self.written += len(batch)
+            self.flushes += 1
+        return len(batch)
+
+    def _requeue(self, batch, error):
+        """Put updates back for the next flush unless a newer login arrived meanwhile"""
+        with self._lock:
+            for user_id, at in batch:
+                last = self._pending.get(user_id)
+                if last is None or at > last:
+                    self._pending[user_id] = at
+            self.write_errors += 1
+        logger.error(f"last_login write error: {error}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'logins': self.logins,
+                'written': self.written,
+                'flushes': self.flushes,
+                'write_errors': self.write_errors,
+            }
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Request Metrics
+Per-endpoint latency histograms, DB time accounting and Prometheus text exposition
+"""
+
+import os
+import json
+import time
+import glob
+import logging
+import threading
+
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DESCRIPTIONS = {
+    'http_request_duration_seconds': ('histogram', 'Request latency by endpoint, method and status'),
+    'http_request_db_seconds': ('histogram', 'Time spent in database calls per request'),
+    'http_request_python_seconds_total': ('counter', 'Request time spent outside database calls'),
+    'attendance_bulk_rows_total': ('counter', 'Scans processed by bulk attendance, by outcome'),
+}
+
+_local = threading.local()
+
+
+def start_request():
+    """Reset this thread's database time at the start of a request"""
+    _local.db_time = 0.0
+
+
+def add_db_time(seconds):
+    _local.db_time = getattr(_local, 'db_time', 0.0) + seconds
+
+
+def request_db_time():
+    return getattr(_local, 'db_time', 0.0)
+
+
+class TimedCursor(extensions.cursor):
+    """Cursor that charges time spent in database calls to the current thread"""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            add_db_time(time.perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            add_db_time(time.perf_counter() - started)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            add_db_time(time.perf_counter() - started)
+
+
+class Registry:
+    """Counters and fixed-bucket histograms for one worker process"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, labels=(), value=1.0):
+        key = (name, tuple(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # One count per bucket (non-cumulative) plus +Inf, then sum
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    break
+            else:
+                index = len(self.buckets)
+            histogram[index] += 1
+            histogram[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'buckets': list(self.buckets),
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), list(values)]
+                               for (name, labels), values in self._histograms.items()],
+            }
+
+
+class MetricsExporter:
+    """Merges every worker's registry into one Prometheus scrape
+
+    Each worker writes its snapshot and gauges to a file in `directory`,
+    so whichever worker answers /metrics reports the whole host. Counters
+    and histograms are summed; gauges keep a worker label.
+    """
+
+    def __init__(self, registry, directory, interval=5.0, gauges=None):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self.gauges = gauges
+        self._lock = threading.Lock()
+        self._pid = None
+        os.makedirs(directory, exist_ok=True)
+
+    def ensure_started(self):
+        """Start the snapshot thread once per worker process"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='metrics-dump', daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                self.dump()
+            except Exception as e:
+                logger.error(f"Metrics dump error: {e}")
+            time.sleep(self.interval)
+
+    def dump(self):
+        """Atomically write this worker's snapshot"""
+        snapshot = self.registry.snapshot()
+        snapshot['pid'] = os.getpid()
+        snapshot['gauges'] = _flatten_gauges(self.gauges() if self.gauges else {})
+        path = os.path.join(self.directory, f'worker-{os.getpid()}.json')
+        temp = f'{path}.tmp'
+        with open(temp, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(temp, path)
+
+    def _load_snapshots(self):
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, 'worker-*.json')):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not _alive(snapshot.get('pid')):
+                # Exited worker: its counters leave the sum, which Prometheus treats as a reset
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            snapshots.append(snapshot)
+        return snapshots
+
+    def render(self):
+        """Prometheus text exposition for every live worker on this host"""
+        self.dump()
+        counters = {}
+        histograms = {}
+        gauges = []
+        buckets = list(self.registry.buckets)
+        for snapshot in self._load_snapshots():
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0.0) + value
+            if snapshot.get('buckets') == buckets:
+                for name, labels, values in snapshot['histograms']:
+                    key = (name, tuple(map(tuple, labels)))
+                    merged = histograms.setdefault(key, [0] * len(values))
+                    for index, value in enumerate(values):
+                        merged[index] += value
+            worker = str(snapshot['pid'])
+            for name, value in snapshot.get('gauges', []):
+                gauges.append((name, (('worker', worker),), value))
+
+        lines = []
+        described = set()
+
+        def header(name, kind, text):
+            if name not in described:
+                described.add(name)
+                lines.append(f'# HELP {name} {text}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in sorted(counters.items()):
+            kind, text = DESCRIPTIONS.get(name, ('counter', name))
+            header(name, kind, text)
+            lines.append(f'{name}{_labels(labels)} {_number(value)}')
+
+        for (name, labels), values in sorted(histograms.items()):
+            kind, text = DESCRIPTIONS.get(name, ('histogram', name))
+            header(name, kind, text)
+            cumulative = 0
+            for bound, count in zip(buckets + ['+Inf'], values[:-1]):
+                cumulative += count
+                le = bound if bound == '+Inf' else _number(bound)
+                lines.append(f'{name}_bucket{_labels(labels + (("le", le),))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(values[-1])}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+
+        for name, labels, value in sorted(gauges):
+            header(name, 'gauge', name.replace('_', ' '))
+            lines.append(f'{name}{_labels(labels)} {_number(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _flatten_gauges(components):
+    """Numeric and boolean stats as (attendance_<component>_<key>, value) pairs"""
+    gauges = []
+    for component, stats in components.items():
+        for key, value in (stats or {}).items():
+            if isinstance(value, bool):
+                value = int(value)
+            if isinstance(value, (int, float)):
+                gauges.append((f'attendance_{component}_{key}', value))
+    return gauges
+
+
+def _alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
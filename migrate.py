@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Schema Migrations
+Upgrades an existing database in place by applying migrations/NNN_name.sql once each, in order
+
+Usage: python migrate.py status
+       python migrate.py up [--target 2] [--dry-run]
+"""
+
+import os
+import re
+import sys
+import hashlib
+import logging
+import argparse
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+FILENAME = re.compile(r'^(\d+)_([a-z0-9_]+)\.sql$')
+
+# First line of a migration that must run outside a transaction (CREATE INDEX CONCURRENTLY)
+NO_TRANSACTION = '-- migrate: no-transaction'
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        checksum VARCHAR(64),
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# One runner per schema at a time
+LOCK_SQL = "SELECT pg_advisory_lock(hashtext(current_schema() || '.schema_migrations'))"
+UNLOCK_SQL = "SELECT pg_advisory_unlock(hashtext(current_schema() || '.schema_migrations'))"
+
+RECORD_SQL = "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)"
+
+
+class Migration:
+    """One numbered SQL file"""
+
+    __slots__ = ('version', 'name', 'sql', 'checksum', 'transactional')
+
+    def __init__(self, version, name, sql):
+        self.version = version
+        self.name = name
+        self.sql = sql
+        self.checksum = hashlib.sha256(sql.encode()).hexdigest()
+        self.transactional = not sql.lstrip().startswith(NO_TRANSACTION)
+
+    def statements(self):
+        """Statements of a no-transaction migration, split at semicolons that end a line"""
+        return [
+            statement.strip() for statement in re.split(r';[ \t]*(?:\n|$)', self.sql)
+            if re.sub(r'--[^\n]*', '', statement).strip()
+        ]
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """Migrations in directory, ordered by version"""
+    migrations = {}
+    for filename in os.listdir(directory):
+        match = FILENAME.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f'Duplicate migration version {version}: {filename}')
+        with open(os.path.join(directory, filename)) as f:
+            migrations[version] = Migration(version, match.group(2), f.read())
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def applied_versions(cursor):
+    """version -> checksum for every applied migration (checksum is None for versions the schema file records)"""
+    cursor.execute(CREATE_TABLE_SQL)
+    cursor.execute('SELECT version, checksum FROM schema_migrations')
+    return dict(cursor.fetchall())
+
+
+def status(conn, directory=MIGRATIONS_DIR):
+    cursor = conn.cursor()
+    applied = applied_versions(cursor)
+    conn.commit()
+    cursor.close()
+    rows = []
+    for migration in discover(directory):
+        checksum = applied.get(migration.version)
+        rows.append({
+            'version': migration.version,
+            'name': migration.name,
+            'applied': migration.version in applied,
+            'modified': checksum is not None and checksum != migration.checksum,
+        })
+    return rows
+
+
+def migrate(conn, directory=MIGRATIONS_DIR, target=None, dry_run=False):
+    """Apply pending migrations up to target; returns the versions applied
+
+    Transactional migrations commit together with their schema_migrations
+    row. A no-transaction migration runs statement by statement and is
+    recorded once all of them succeed, so it must be safe to re-run.
+    """
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute(LOCK_SQL)
+    done = []
+    try:
+        applied = applied_versions(cursor)
+        for migration in discover(directory):
+            if target is not None and migration.version > target:
+                break
+            if migration.version in applied:
+                checksum = applied[migration.version]
+                if checksum is not None and checksum != migration.checksum:
+                    logger.warning(f"Migration {migration.version} ({migration.name}) changed since it was applied")
+                continue
+            if dry_run:
+                done.append(migration.version)
+                continue
+
+            logger.info(f"Applying migration {migration.version} ({migration.name})")
+            if migration.transactional:
+                conn.autocommit = False
+                try:
+                    cursor.execute(migration.sql)
+                    cursor.execute(RECORD_SQL, (migration.version, migration.name, migration.checksum))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.autocommit = True
+            else:
+                for statement in migration.statements():
+                    cursor.execute(statement)
+                cursor.execute(RECORD_SQL, (migration.version, migration.name, migration.checksum))
+            done.append(migration.version)
+    finally:
+        cursor.execute(UNLOCK_SQL)
+        cursor.close()
+    return done
+
+
+def connect():
+    """Connect with the same environment variables as the app"""
+    return psycopg2.connect(
+        host=os.environ.get('DB_HOST') or os.environ.get('DATABASE_HOST', 'localhost'),
+        database=os.environ.get('DB_NAME') or os.environ.get('DATABASE_NAME', 'attendance'),
+        user=os.environ.get('DB_USER') or os.environ.get('DATABASE_USER', 'postgres'),
+        password=os.environ.get('DB_PASSWORD') or os.environ.get('DATABASE_PASSWORD', 'password'),
+        port=int(os.environ.get('DB_PORT') or os.environ.get('DATABASE_PORT', 5432)),
+        sslmode=os.environ.get('DB_SSLMODE', 'require'),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('status', 'up'))
+    parser.add_argument('--target', type=int, help='highest version to apply')
+    parser.add_argument('--dry-run', action='store_true', help='list what up would apply')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    conn = connect()
+    try:
+        if args.command == 'status':
+            for row in status(conn):
+                state = 'applied' if row['applied'] else 'pending'
+                if row['modified']:
+                    state += ' (file changed since applied)'
+                print(f"{row['version']:>4}  {row['name']:<32} {state}")
+        else:
+            versions = migrate(conn, target=args.target, dry_run=args.dry_run)
+            verb = 'Would apply' if args.dry_run else 'Applied'
+            print(f"{verb} {len(versions)} migration(s){': ' + ', '.join(map(str, versions)) if versions else ''}")
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
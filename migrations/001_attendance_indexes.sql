@@ -0,0 +1,24 @@
+-- migrate: no-transaction
+-- ================================
+-- Indexes shaped like the real queries, built without blocking writes
+-- ================================
+-- Each statement runs on its own and is safe to re-run. If a concurrent build
+-- fails it leaves an INVALID index behind: drop it and run the migration again.
+
+-- persons(rfid_tag) is already indexed by its UNIQUE constraint
+DROP INDEX CONCURRENTLY IF EXISTS idx_persons_rfid;
+
+-- Scan batches and the RFID index resolve active students by tag; the
+-- INCLUDE columns let those lookups run as index-only scans
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_persons_active_student_rfid
+    ON persons (rfid_tag) INCLUDE (person_id, name, id_number)
+    WHERE status = 'active' AND role = 'student';
+
+-- Per-student history is read by person and time range
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_attendance_person_timestamp
+    ON attendance (person_id, timestamp);
+
+-- Both are leading prefixes of other indexes: (schedule_id) of the
+-- UNIQUE (schedule_id, person_id) index, (person_id) of the one above
+DROP INDEX CONCURRENTLY IF EXISTS idx_attendance_schedule_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_attendance_person_id;
@@ -0,0 +1,50 @@
+-- ================================
+-- Change notifications for the in-process RFID index and timetable cache
+-- ================================
+-- persons.updated_at lets the RFID index catch up on changes it missed while
+-- its LISTEN connection was down. Safe to re-run.
+
+ALTER TABLE persons ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+CREATE INDEX IF NOT EXISTS idx_persons_updated_at ON persons(updated_at);
+
+CREATE OR REPLACE FUNCTION persons_notify_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('persons_changed', json_build_object(
+            'op', TG_OP, 'person_id', OLD.person_id, 'rfid_tag', OLD.rfid_tag)::text);
+        RETURN OLD;
+    END IF;
+    NEW.updated_at := clock_timestamp();
+    PERFORM pg_notify('persons_changed', json_build_object(
+        'op', TG_OP, 'person_id', NEW.person_id, 'rfid_tag', NEW.rfid_tag)::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS persons_notify_change ON persons;
+CREATE TRIGGER persons_notify_change
+    BEFORE INSERT OR UPDATE OR DELETE ON persons
+    FOR EACH ROW EXECUTE FUNCTION persons_notify_change();
+
+-- Timetable cache rebuilds on any change to schedule, sections or classrooms
+CREATE OR REPLACE FUNCTION schedule_notify_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('schedule_changed', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS schedule_notify_change ON schedule;
+CREATE TRIGGER schedule_notify_change
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON schedule
+    FOR EACH STATEMENT EXECUTE FUNCTION schedule_notify_change();
+
+DROP TRIGGER IF EXISTS sections_notify_change ON sections;
+CREATE TRIGGER sections_notify_change
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON sections
+    FOR EACH STATEMENT EXECUTE FUNCTION schedule_notify_change();
+
+DROP TRIGGER IF EXISTS classrooms_notify_change ON classrooms;
+CREATE TRIGGER classrooms_notify_change
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON classrooms
+    FOR EACH STATEMENT EXECUTE FUNCTION schedule_notify_change();
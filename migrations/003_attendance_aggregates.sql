@@ -0,0 +1,270 @@
+-- ================================
+-- Attendance aggregates, maintained by triggers
+-- ================================
+-- Creates the aggregate tables and their triggers, then fills the tables from
+-- the existing rows. The triggers lock attendance, student_sections and
+-- schedule against writes until the backfill commits. Safe to re-run.
+--
+-- Aggregate keys carry no foreign keys to sections or persons: their rows are
+-- maintained by triggers that also fire during cascading deletes.
+
+-- Enrolled students per section
+CREATE TABLE IF NOT EXISTS agg_section_enrollment (
+    section_id INT PRIMARY KEY,
+    student_count INT NOT NULL DEFAULT 0
+);
+
+-- One row per class session held (a schedule slot on a date with at least one attendee)
+CREATE TABLE IF NOT EXISTS agg_session_attendance (
+    schedule_id INT REFERENCES schedule(schedule_id) ON DELETE CASCADE,
+    session_date DATE NOT NULL,
+    section_id INT NOT NULL,
+    subject_name VARCHAR(100) NOT NULL DEFAULT '',
+    present_count INT NOT NULL DEFAULT 0,
+    late_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (schedule_id, session_date)
+);
+CREATE INDEX IF NOT EXISTS idx_agg_session_section_date ON agg_session_attendance(section_id, session_date);
+CREATE INDEX IF NOT EXISTS idx_agg_session_section_subject ON agg_session_attendance(section_id, subject_name);
+
+-- Sessions attended per student, section and subject
+CREATE TABLE IF NOT EXISTS agg_student_subject (
+    person_id INT NOT NULL,
+    section_id INT NOT NULL,
+    subject_name VARCHAR(100) NOT NULL DEFAULT '',
+    present_count INT NOT NULL DEFAULT 0,
+    late_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (person_id, section_id, subject_name)
+);
+CREATE INDEX IF NOT EXISTS idx_agg_student_subject_section ON agg_student_subject(section_id, subject_name);
+
+-- Apply a signed batch of attendance rows to the aggregates
+CREATE OR REPLACE FUNCTION attendance_aggregates_apply(
+    p_schedule_ids INT[], p_person_ids INT[], p_days DATE[], p_statuses TEXT[], p_sign INT
+) RETURNS void AS $$
+BEGIN
+    IF p_schedule_ids IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO agg_session_attendance AS s
+        (schedule_id, session_date, section_id, subject_name, present_count, late_count)
+    SELECT d.schedule_id, d.day, sc.section_id, COALESCE(sc.subject_name, ''),
+           p_sign * COUNT(*) FILTER (WHERE d.status = 'present'),
+           p_sign * COUNT(*) FILTER (WHERE d.status = 'late')
+    FROM unnest(p_schedule_ids, p_person_ids, p_days, p_statuses) AS d(schedule_id, person_id, day, status)
+    JOIN schedule sc ON sc.schedule_id = d.schedule_id
+    WHERE d.status IN ('present', 'late')
+    GROUP BY d.schedule_id, d.day, sc.section_id, COALESCE(sc.subject_name, '')
+    ON CONFLICT (schedule_id, session_date) DO UPDATE
+        SET present_count = s.present_count + EXCLUDED.present_count,
+            late_count = s.late_count + EXCLUDED.late_count;
+
+    INSERT INTO agg_student_subject AS a
+        (person_id, section_id, subject_name, present_count, late_count)
+    SELECT d.person_id, sc.section_id, COALESCE(sc.subject_name, ''),
+           p_sign * COUNT(*) FILTER (WHERE d.status = 'present'),
+           p_sign * COUNT(*) FILTER (WHERE d.status = 'late')
+    FROM unnest(p_schedule_ids, p_person_ids, p_days, p_statuses) AS d(schedule_id, person_id, day, status)
+    JOIN schedule sc ON sc.schedule_id = d.schedule_id
+    WHERE d.status IN ('present', 'late')
+    GROUP BY d.person_id, sc.section_id, COALESCE(sc.subject_name, '')
+    ON CONFLICT (person_id, section_id, subject_name) DO UPDATE
+        SET present_count = a.present_count + EXCLUDED.present_count,
+            late_count = a.late_count + EXCLUDED.late_count;
+
+    IF p_sign < 0 THEN
+        -- A session with nobody left in it was never held
+        DELETE FROM agg_session_attendance
+        WHERE (schedule_id, session_date) IN (
+            SELECT u.schedule_id, u.day FROM unnest(p_schedule_ids, p_days) AS u(schedule_id, day)
+        )
+          AND present_count + late_count <= 0;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION attendance_aggregates_insert() RETURNS trigger AS $$
+BEGIN
+    PERFORM attendance_aggregates_apply(
+        array_agg(schedule_id), array_agg(person_id), array_agg(timestamp::date), array_agg(status::text), 1)
+    FROM new_rows;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION attendance_aggregates_delete() RETURNS trigger AS $$
+BEGIN
+    PERFORM attendance_aggregates_apply(
+        array_agg(schedule_id), array_agg(person_id), array_agg(timestamp::date), array_agg(status::text), -1)
+    FROM old_rows;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION attendance_aggregates_update() RETURNS trigger AS $$
+BEGIN
+    PERFORM attendance_aggregates_apply(
+        array_agg(schedule_id), array_agg(person_id), array_agg(timestamp::date), array_agg(status::text), -1)
+    FROM old_rows;
+    PERFORM attendance_aggregates_apply(
+        array_agg(schedule_id), array_agg(person_id), array_agg(timestamp::date), array_agg(status::text), 1)
+    FROM new_rows;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS attendance_aggregates_insert ON attendance;
+CREATE TRIGGER attendance_aggregates_insert
+    AFTER INSERT ON attendance REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_aggregates_insert();
+
+DROP TRIGGER IF EXISTS attendance_aggregates_delete ON attendance;
+CREATE TRIGGER attendance_aggregates_delete
+    AFTER DELETE ON attendance REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_aggregates_delete();
+
+DROP TRIGGER IF EXISTS attendance_aggregates_update ON attendance;
+CREATE TRIGGER attendance_aggregates_update
+    AFTER UPDATE ON attendance REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_aggregates_update();
+
+-- Enrollment counts follow student_sections
+CREATE OR REPLACE FUNCTION section_enrollment_apply(p_section_ids INT[], p_sign INT) RETURNS void AS $$
+BEGIN
+    IF p_section_ids IS NULL THEN
+        RETURN;
+    END IF;
+    INSERT INTO agg_section_enrollment AS e (section_id, student_count)
+    SELECT u.section_id, p_sign * COUNT(*)
+    FROM unnest(p_section_ids) AS u(section_id)
+    GROUP BY u.section_id
+    ON CONFLICT (section_id) DO UPDATE
+        SET student_count = e.student_count + EXCLUDED.student_count;
+
+    IF p_sign < 0 THEN
+        DELETE FROM agg_section_enrollment
+        WHERE section_id = ANY(p_section_ids) AND student_count <= 0;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION section_enrollment_insert() RETURNS trigger AS $$
+BEGIN
+    PERFORM section_enrollment_apply(array_agg(section_id), 1) FROM new_rows;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION section_enrollment_delete() RETURNS trigger AS $$
+BEGIN
+    PERFORM section_enrollment_apply(array_agg(section_id), -1) FROM old_rows;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION section_enrollment_update() RETURNS trigger AS $$
+BEGIN
+    PERFORM section_enrollment_apply(array_agg(section_id), -1) FROM old_rows;
+    PERFORM section_enrollment_apply(array_agg(section_id), 1) FROM new_rows;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS section_enrollment_insert ON student_sections;
+CREATE TRIGGER section_enrollment_insert
+    AFTER INSERT ON student_sections REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION section_enrollment_insert();
+
+DROP TRIGGER IF EXISTS section_enrollment_delete ON student_sections;
+CREATE TRIGGER section_enrollment_delete
+    AFTER DELETE ON student_sections REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION section_enrollment_delete();
+
+DROP TRIGGER IF EXISTS section_enrollment_update ON student_sections;
+CREATE TRIGGER section_enrollment_update
+    AFTER UPDATE ON student_sections REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION section_enrollment_update();
+
+-- Attendance aggregates are keyed by the schedule's section and subject, so
+-- a schedule row's attendance is removed while the row still exists, and
+-- moving a schedule row moves its counts with it
+CREATE OR REPLACE FUNCTION schedule_aggregates_delete() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM attendance WHERE schedule_id = OLD.schedule_id;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION schedule_aggregates_update() RETURNS trigger AS $$
+BEGIN
+    IF NEW.section_id IS NOT DISTINCT FROM OLD.section_id
+       AND COALESCE(NEW.subject_name, '') = COALESCE(OLD.subject_name, '') THEN
+        RETURN NULL;
+    END IF;
+
+    UPDATE agg_session_attendance
+    SET section_id = NEW.section_id, subject_name = COALESCE(NEW.subject_name, '')
+    WHERE schedule_id = NEW.schedule_id;
+
+    INSERT INTO agg_student_subject AS a (person_id, section_id, subject_name, present_count, late_count)
+    SELECT m.person_id, m.section_id, m.subject_name, m.sign * m.present_count, m.sign * m.late_count
+    FROM (
+        SELECT person_id,
+               COUNT(*) FILTER (WHERE status = 'present') AS present_count,
+               COUNT(*) FILTER (WHERE status = 'late') AS late_count
+        FROM attendance
+        WHERE schedule_id = NEW.schedule_id AND status IN ('present', 'late')
+        GROUP BY person_id
+    ) c
+    CROSS JOIN LATERAL (VALUES
+        (c.person_id, OLD.section_id, COALESCE(OLD.subject_name, ''), -1, c.present_count, c.late_count),
+        (c.person_id, NEW.section_id, COALESCE(NEW.subject_name, ''), 1, c.present_count, c.late_count)
+    ) AS m(person_id, section_id, subject_name, sign, present_count, late_count)
+    ON CONFLICT (person_id, section_id, subject_name) DO UPDATE
+        SET present_count = a.present_count + EXCLUDED.present_count,
+            late_count = a.late_count + EXCLUDED.late_count;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS schedule_aggregates_delete ON schedule;
+CREATE TRIGGER schedule_aggregates_delete
+    BEFORE DELETE ON schedule
+    FOR EACH ROW EXECUTE FUNCTION schedule_aggregates_delete();
+
+DROP TRIGGER IF EXISTS schedule_aggregates_update ON schedule;
+CREATE TRIGGER schedule_aggregates_update
+    AFTER UPDATE OF section_id, subject_name ON schedule
+    FOR EACH ROW EXECUTE FUNCTION schedule_aggregates_update();
+
+-- Full recompute, for repairs and the consistency check
+CREATE OR REPLACE FUNCTION attendance_aggregates_rebuild() RETURNS void AS $$
+BEGIN
+    TRUNCATE agg_section_enrollment, agg_session_attendance, agg_student_subject;
+
+    INSERT INTO agg_section_enrollment (section_id, student_count)
+    SELECT section_id, COUNT(*) FROM student_sections GROUP BY section_id;
+
+    INSERT INTO agg_session_attendance
+        (schedule_id, session_date, section_id, subject_name, present_count, late_count)
+    SELECT a.schedule_id, a.timestamp::date, sc.section_id, COALESCE(sc.subject_name, ''),
+           COUNT(*) FILTER (WHERE a.status = 'present'),
+           COUNT(*) FILTER (WHERE a.status = 'late')
+    FROM attendance a
+    JOIN schedule sc ON sc.schedule_id = a.schedule_id
+    WHERE a.status IN ('present', 'late')
+    GROUP BY a.schedule_id, a.timestamp::date, sc.section_id, COALESCE(sc.subject_name, '');
+
+    INSERT INTO agg_student_subject (person_id, section_id, subject_name, present_count, late_count)
+    SELECT a.person_id, sc.section_id, COALESCE(sc.subject_name, ''),
+           COUNT(*) FILTER (WHERE a.status = 'present'),
+           COUNT(*) FILTER (WHERE a.status = 'late')
+    FROM attendance a
+    JOIN schedule sc ON sc.schedule_id = a.schedule_id
+    WHERE a.status IN ('present', 'late')
+    GROUP BY a.person_id, sc.section_id, COALESCE(sc.subject_name, '');
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT attendance_aggregates_rebuild();
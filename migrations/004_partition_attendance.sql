@@ -0,0 +1,123 @@
+-- ================================
+-- Range-partition attendance by term
+-- ================================
+-- The partition key is schedule_id. Each term's timetable is loaded as new
+-- schedule rows, so one term's schedule_ids form one contiguous range.
+-- UNIQUE (schedule_id, person_id) includes the key, so the existing
+-- ON CONFLICT (schedule_id, person_id) duplicate checks keep working, and
+-- each check only touches one term's partition.
+--
+-- Existing rows all go into a single partition, attendance_initial.
+-- attendance_start_term() closes the open partition at the current highest
+-- schedule_id and opens a new one for the next term.
+--
+-- The data is copied while attendance is exclusively locked: run this in a
+-- maintenance window.
+
+LOCK TABLE attendance IN ACCESS EXCLUSIVE MODE;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM attendance WHERE schedule_id IS NULL) THEN
+        RAISE EXCEPTION 'attendance has rows without a schedule_id; fix or remove them before partitioning';
+    END IF;
+END;
+$$;
+
+-- Move the unpartitioned table aside and free its index names
+ALTER TABLE attendance RENAME TO attendance_unpartitioned;
+ALTER INDEX attendance_pkey RENAME TO attendance_unpartitioned_pkey;
+ALTER INDEX attendance_schedule_id_person_id_key RENAME TO attendance_unpartitioned_schedule_person_key;
+DROP INDEX IF EXISTS idx_attendance_timestamp, idx_attendance_person_timestamp,
+    idx_attendance_schedule_id, idx_attendance_person_id;
+
+CREATE TABLE attendance_terms (
+    term_name VARCHAR(40) PRIMARY KEY,
+    first_schedule_id INT UNIQUE NOT NULL,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE attendance (
+    attendance_id INT NOT NULL DEFAULT nextval('attendance_attendance_id_seq'),
+    schedule_id INT NOT NULL REFERENCES schedule(schedule_id) ON DELETE CASCADE,
+    person_id INT REFERENCES persons(person_id) ON DELETE CASCADE,
+    rfid_tag VARCHAR(100),
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    status VARCHAR(10) CHECK (status IN ('present', 'absent', 'late')) DEFAULT 'present',
+    method VARCHAR(20) DEFAULT 'rfid' CHECK (method IN ('rfid', 'face', 'manual', 'zoom')),
+    confidence_score FLOAT,
+    location VARCHAR(50),
+    notes TEXT,
+    PRIMARY KEY (attendance_id, schedule_id),
+    UNIQUE (schedule_id, person_id)
+) PARTITION BY RANGE (schedule_id);
+
+ALTER SEQUENCE attendance_attendance_id_seq OWNED BY attendance.attendance_id;
+
+CREATE INDEX idx_attendance_person_timestamp ON attendance (person_id, timestamp);
+CREATE INDEX idx_attendance_timestamp ON attendance (timestamp);
+
+INSERT INTO attendance_terms (term_name, first_schedule_id) VALUES ('initial', 0);
+CREATE TABLE attendance_initial PARTITION OF attendance FOR VALUES FROM (0) TO (MAXVALUE);
+
+-- Copied before the aggregate triggers exist: the aggregates already count these rows
+INSERT INTO attendance
+    (attendance_id, schedule_id, person_id, rfid_tag, timestamp, status, method,
+     confidence_score, location, notes)
+SELECT attendance_id, schedule_id, person_id, rfid_tag, timestamp, status, method,
+       confidence_score, location, notes
+FROM attendance_unpartitioned;
+
+DROP TABLE attendance_unpartitioned;
+
+CREATE TRIGGER attendance_aggregates_insert
+    AFTER INSERT ON attendance REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_aggregates_insert();
+
+CREATE TRIGGER attendance_aggregates_delete
+    AFTER DELETE ON attendance REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_aggregates_delete();
+
+CREATE TRIGGER attendance_aggregates_update
+    AFTER UPDATE ON attendance REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_aggregates_update();
+
+-- Close the open term at the highest schedule_id so far and open p_term after it
+CREATE OR REPLACE FUNCTION attendance_start_term(p_term TEXT) RETURNS TEXT AS $$
+DECLARE
+    v_current attendance_terms%ROWTYPE;
+    v_boundary INT;
+    v_closed TEXT;
+    v_opened TEXT;
+BEGIN
+    IF p_term !~ '^[a-z0-9_]{1,30}$' THEN
+        RAISE EXCEPTION 'Term name must be 1-30 lowercase letters, digits or underscores';
+    END IF;
+
+    -- No schedule rows may be added while the boundary is fixed
+    LOCK TABLE schedule IN SHARE ROW EXCLUSIVE MODE;
+    SELECT * INTO v_current FROM attendance_terms ORDER BY first_schedule_id DESC LIMIT 1;
+    SELECT COALESCE(MAX(schedule_id), 0) + 1 INTO v_boundary FROM schedule;
+    IF v_boundary <= v_current.first_schedule_id THEN
+        RAISE EXCEPTION 'Term % has no schedule rows yet', v_current.term_name;
+    END IF;
+
+    v_closed := 'attendance_' || v_current.term_name;
+    v_opened := 'attendance_' || p_term;
+
+    EXECUTE format('ALTER TABLE attendance DETACH PARTITION %I', v_closed);
+    -- The CHECK lets ATTACH skip its own validation scan
+    EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I CHECK (schedule_id >= %s AND schedule_id < %s)',
+                   v_closed, v_closed || '_range', v_current.first_schedule_id, v_boundary);
+    EXECUTE format('ALTER TABLE attendance ATTACH PARTITION %I FOR VALUES FROM (%s) TO (%s)',
+                   v_closed, v_current.first_schedule_id, v_boundary);
+    EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', v_closed, v_closed || '_range');
+
+    EXECUTE format('CREATE TABLE %I PARTITION OF attendance FOR VALUES FROM (%s) TO (MAXVALUE)',
+                   v_opened, v_boundary);
+    INSERT INTO attendance_terms (term_name, first_schedule_id) VALUES (p_term, v_boundary);
+    RETURN v_opened;
+END;
+$$ LANGUAGE plpgsql;
+
+ANALYZE attendance;
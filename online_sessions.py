@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Online Class Sessions
+Per-student face confirmation tracking for concurrent Zoom sessions, with batched attendance writes
+"""
+
+import os
+import time
+import logging
+import threading
+from array import array
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+
+import psycopg2
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import db_pool
+import attendance_batch
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerConflict(RuntimeError):
+    """Another process on this host already serves online sessions"""
+
+
+class FaceTrack:
+    """Confirmation history for one student in one session
+
+    The last `required` confirmations live in fixed-size ring buffers of
+    timestamps and confidences, so a track costs the same however long the
+    class runs and however many frames arrive.
+    """
+
+    __slots__ = ('times', 'scores', 'head', 'count', 'last_confirmed', 'marked')
+
+    def __init__(self, required):
+        self.times = array('d', bytes(8 * required))
+        self.scores = array('f', bytes(4 * required))
+        self.head = 0
+        self.count = 0
+        self.last_confirmed = float('-inf')
+        self.marked = False
+
+    def confirm(self, timestamp, confidence, interval, window):
+        """Record a detection: None if too soon to count, else True when it completes the threshold"""
+        if timestamp - self.last_confirmed < interval:
+            return None
+        required = len(self.times)
+        self.times[self.head] = timestamp
+        self.scores[self.head] = confidence
+        self.head = (self.head + 1) % required
+        self.count = min(self.count + 1, required)
+        self.last_confirmed = timestamp
+        # With the ring full, head points at the oldest confirmation
+        if self.marked or self.count < required or timestamp - self.times[self.head] > window:
+            return False
+        self.marked = True
+        return True
+
+    def average_confidence(self):
+        return round(sum(self.scores) / len(self.scores), 4)
+
+
+class OnlineSession:
+    """One Zoom meeting attached to a schedule slot"""
+
+    __slots__ = ('meeting_id', 'schedule_id', 'started_at', 'last_seen', 'tracks', 'lock',
+                 'frames', 'detections', 'marked')
+
+    def __init__(self, meeting_id, schedule_id):
+        self.meeting_id = meeting_id
+        self.schedule_id = schedule_id
+        self.started_at = time.time()
+        self.last_seen = self.started_at
+        self.tracks = {}
+        self.lock = threading.Lock()
+        self.frames = 0
+        self.detections = 0
+        self.marked = 0
+
+    def summary(self):
+        return {
+            'zoom_meeting_id': self.meeting_id,
+            'schedule_id': self.schedule_id,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(),
+            'frames': self.frames,
+            'detections': self.detections,
+            'students_seen': len(self.tracks),
+            'students_marked': self.marked,
+        }
+
+
+class SessionEngine:
+    """In-memory confirmation state for this worker's online sessions
+
+    A detection at or above min_confidence counts as a confirmation at most
+    once per confirm_interval seconds; a student is marked present once
+    `required` confirmations fall within `window` seconds. Marks are queued
+    and written in batches with method 'zoom' and the mean confidence of
+    the confirmations that met the threshold.
+    """
+
+    def __init__(self, required=5, window=360.0, confirm_interval=45.0, min_confidence=0.8,
+                 batch_size=500, flush_interval=1.0, idle_timeout=900.0, max_sessions=1000):
+        self.required = required
+        self.window = window
+        self.confirm_interval = confirm_interval
+        self.min_confidence = min_confidence
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self._sessions = {}
+        self._pending = []
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._host_lock = None
+
+        self.detections = 0
+        self.confirmations = 0
+        self.marked = 0
+        self.written = 0
+        self.write_errors = 0
+        self.dropped = 0
+        self.expired_sessions = 0
+
+    def claim_host(self, lock_path, wait=0):
+        """Hold lock_path for the life of this process, or raise WorkerConflict if another process does
+
+        Sessions and face tracks live in one process's memory; a frame or end
+        request answered by any other worker on the host would not find them.
+        wait covers a graceful reload, where the old worker still holds the
+        lock while it drains.
+        """
+        if fcntl is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(lock_path)), mode=0o700, exist_ok=True)
+        lock_file = open(lock_path, 'a+')
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() < deadline:
+                    time.sleep(0.5)
+                    continue
+            lock_file.seek(0)
+            holder = lock_file.read().strip() or 'another process'
+            lock_file.close()
+            raise WorkerConflict(
+                f'Online sessions are already served by {holder} on this host; they need a single worker '
+                f'(WEB_CONCURRENCY=1), or set ONLINE_SESSIONS_ENABLED=false'
+            )
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f'worker {os.getpid()}')
+        lock_file.flush()
+        self._host_lock = lock_file
+
+    def ensure_started(self):
+        """Start the writer thread once per worker process"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='online-sessions', daemon=True)
+            self._thread.start()
+
+    def start_session(self, meeting_id, schedule_id):
+        """Open (or return the already open) session for a meeting"""
+        with self._lock:
+            session = self._sessions.get(meeting_id)
+            if session is not None:
+                if session.schedule_id != schedule_id:
+                    raise ValueError(f'Meeting {meeting_id} is already tracking schedule {session.schedule_id}')
+                return session
+            if len(self._sessions) >= self.max_sessions:
+                raise OverflowError('Too many online sessions on this worker')
+            session = OnlineSession(meeting_id, schedule_id)
+            self._sessions[meeting_id] = session
+            return session
+
+    def get_session(self, meeting_id):
+        return self._sessions.get(meeting_id)
+
+    def end_session(self, meeting_id):
+        with self._lock:
+            return self._sessions.pop(meeting_id, None)
+
+    def ingest(self, meeting_id, detections, now=None):
+        """Apply (person_id, confidence, timestamp) detections; returns person_ids marked by them
+
+        timestamp may be None for "now". Raises KeyError for an unknown meeting.
+        """
+        session = self._sessions[meeting_id]
+        now = now or time.time()
+        interval = self.confirm_interval
+        window = self.window
+        min_confidence = self.min_confidence
+        marked = []
+        confirmed = 0
+
+        with session.lock:
+            tracks = session.tracks
+            session.frames += 1
+            session.detections += len(detections)
+            session.last_seen = now
+            for person_id, confidence, timestamp in detections:
+                if confidence < min_confidence:
+                    continue
+                track = tracks.get(person_id)
+                if track is None:
+                    track = tracks[person_id] = FaceTrack(self.required)
+                elif track.marked:
+                    continue
+                timestamp = timestamp or now
+                result = track.confirm(timestamp, confidence, interval, window)
+                if result is None:
+                    continue
+                confirmed += 1
+                if result:
+                    marked.append((person_id, track.average_confidence(), timestamp))
+            session.marked += len(marked)
+
+        with self._lock:
+            self.detections += len(detections)
+            self.confirmations += confirmed
+            if marked:
+                self.marked += len(marked)
+                self._pending.extend(
+                    (session.schedule_id, person_id, 'zoom', confidence, datetime.fromtimestamp(timestamp))
+                    for person_id, confidence, timestamp in marked
+                )
+        return [person_id for person_id, _, _ in marked]
+
+    def progress(self, meeting_id):
+        """Per-student confirmation progress for a session"""
+        session = self._sessions[meeting_id]
+        with session.lock:
+            students = [
+                {
+                    'person_id': person_id,
+                    'confirmations': track.count,
+                    'required': self.required,
+                    'marked': track.marked,
+                }
+                for person_id, track in session.tracks.items()
+            ]
+        return dict(session.summary(), students=students)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                while self.flush() >= self.batch_size:
+                    pass
+                self._expire_idle()
+            except Exception as e:
+                logger.error(f"Online session writer error: {e}")
+
+    def flush(self):
+        """Write up to batch_size queued marks in one transaction; returns the number taken
+
+        Each schedule's marks go under their own savepoint, so a schedule the
+        database rejects drops only its own marks.
+        """
+        with self._lock:
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+        if not batch:
+            return 0
+
+        with db_pool.db_connection() as conn:
+            if conn is None:
+                self._requeue(batch, 'Database connection failed')
+                return 0
+            try:
+                cursor = conn.cursor()
+                written = []
+                rejected = 0
+                for schedule_id, rows in groupby(sorted(batch, key=itemgetter(0)), key=itemgetter(0)):
+                    rows = list(rows)
+                    cursor.execute('SAVEPOINT online_group')
+                    try:
+                        written.extend(attendance_batch.record_confirmed_batch(cursor, rows))
+                    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                        raise
+                    except psycopg2.Error as e:
+                        cursor.execute('ROLLBACK TO SAVEPOINT online_group')
+                        rejected += len(rows)
+                        logger.error(f"Online attendance write error for schedule {schedule_id}, "
+                                     f"dropped {len(rows)} marks: {str(e).strip()}")
+                        continue
+                    cursor.execute('RELEASE SAVEPOINT online_group')
+                conn.commit()
+                cursor.close()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                self._requeue(batch, str(e))
+                return 0
+            except Exception as e:
+                conn.rollback()
+                with self._lock:
+                    self.write_errors += 1
+                    self.dropped += len(batch)
+                logger.error(f"Online attendance write error, dropped {len(batch)} marks: {e}")
+                return 0
+
+        with self._lock:
+            self.written += len(written)
+            if rejected:
+                self.write_errors += 1
+                self.dropped += rejected
+        return len(batch)
+
+    def _requeue(self, batch, error):
+        """Put marks back for the next flush; each student is queued once per session"""
+        with self._lock:
+            self._pending[:0] = batch
+            self.write_errors += 1
+        logger.error(f"Online attendance write error: {error}")
+
+    def _expire_idle(self):
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            idle = [meeting_id for meeting_id, session in self._sessions.items() if session.last_seen < cutoff]
+            for meeting_id in idle:
+                del self._sessions[meeting_id]
+            self.expired_sessions += len(idle)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'tracked_students': sum(len(session.tracks) for session in self._sessions.values()),
+                'detections': self.detections,
+                'confirmations': self.confirmations,
+                'marked': self.marked,
+                'pending_writes': len(self._pending),
+                'written': self.written,
+                'write_errors': self.write_errors,
+                'dropped': self.dropped,
+                'expired_sessions': self.expired_sessions,
+            }
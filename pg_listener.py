@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Change Listener
+Background LISTEN/NOTIFY thread that keeps per-worker caches fresh
+"""
+
+import os
+import time
+import select
+import logging
+import threading
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeListener:
+    """Runs cache callbacks on connect, on NOTIFY and on a fixed interval
+
+    on_connect(cursor) is called after every (re)connect, since notifications
+    may have been missed while disconnected. on_notify(cursor, notifies) gets
+    all notifications that arrived together; on_interval(cursor) runs when
+    nothing has been refreshed for interval seconds.
+    """
+
+    def __init__(self, name, db_config, channels, on_connect, on_notify=None,
+                 on_interval=None, interval=60.0, retry_interval=5.0):
+        self.name = name
+        self.db_config = dict(db_config)
+        self.channels = list(channels)
+        self.on_connect = on_connect
+        self.on_notify = on_notify
+        self.on_interval = on_interval or on_connect
+        self.interval = interval
+        self.retry_interval = retry_interval
+
+        self.listening = False
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def ensure_started(self):
+        """Start the thread once per worker process"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        stop = self._stop
+        while not stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.db_config)
+                conn.autocommit = True
+                cursor = conn.cursor()
+                try:
+                    for channel in self.channels:
+                        cursor.execute(f'LISTEN {channel}')
+                    self.listening = True
+                except Exception as e:
+                    logger.warning(f"{self.name} LISTEN failed, polling instead: {e}")
+                    self.listening = False
+
+                self.on_connect(cursor)
+                last_refresh = time.monotonic()
+
+                while not stop.is_set():
+                    remaining = self.interval - (time.monotonic() - last_refresh)
+                    if remaining <= 0:
+                        self.on_interval(cursor)
+                        last_refresh = time.monotonic()
+                        continue
+                    readable, _, _ = select.select([conn], [], [], min(remaining, 1.0))
+                    if not readable:
+                        continue
+                    conn.poll()
+                    if conn.notifies and self.on_notify is not None:
+                        notifies = list(conn.notifies)
+                        del conn.notifies[:]
+                        if self.on_notify(cursor, notifies):
+                            last_refresh = time.monotonic()
+            except Exception as e:
+                logger.error(f"{self.name} listener error: {e}")
+                self.listening = False
+                stop.wait(self.retry_interval)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
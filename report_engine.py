@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Term Report Engine
+Per-student, per-subject attendance percentages and defaulter lists computed with NumPy over bulk-fetched columns
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Index matches date.weekday()
+DAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+TERMS_SQL = "SELECT term_name, started_at::date FROM attendance_terms ORDER BY first_schedule_id"
+
+# Weekly slots that ran during the term. Timetables that store one schedule row
+# per session collapse to one slot per (section, subject, weekday, start time).
+SLOTS_SQL = """
+    SELECT DISTINCT sc.section_id, sa.subject_name, sc.day_of_week, sc.start_time
+    FROM agg_session_attendance sa
+    JOIN schedule sc ON sc.schedule_id = sa.schedule_id
+    WHERE sa.session_date BETWEEN %s AND %s
+      AND sc.section_id IS NOT NULL AND sc.day_of_week IS NOT NULL
+"""
+
+ENROLLMENT_SQL = """
+    SELECT ss.person_id, ss.section_id, p.name, p.id_number
+    FROM student_sections ss
+    JOIN persons p ON p.person_id = ss.person_id
+    WHERE p.role = 'student' AND p.status = 'active'
+    ORDER BY ss.section_id, p.name, ss.person_id
+"""
+
+STUDENT_COUNTS_SQL = """
+    SELECT a.person_id, sc.section_id, COALESCE(sc.subject_name, ''),
+           COUNT(*) FILTER (WHERE a.status = 'present'),
+           COUNT(*) FILTER (WHERE a.status = 'late')
+    FROM attendance a
+    JOIN schedule sc ON sc.schedule_id = a.schedule_id
+    WHERE a.timestamp >= %s AND a.timestamp < %s AND a.status IN ('present', 'late')
+    GROUP BY a.person_id, sc.section_id, COALESCE(sc.subject_name, '')
+"""
+
+
+def term_range(cursor, term=None, today=None):
+    """(term_name, first_day, last_day) for a term in attendance_terms, the latest when term is None
+
+    A term runs until the day before the next one starts; the open term ends today.
+    """
+    today = today or date.today()
+    cursor.execute(TERMS_SQL)
+    terms = cursor.fetchall()
+    if not terms:
+        raise LookupError('No terms recorded; pass from and to dates')
+    names = [name for name, _ in terms]
+    if term is None:
+        index = len(terms) - 1
+    elif term in names:
+        index = names.index(term)
+    else:
+        raise LookupError(f'Unknown term {term!r}')
+    name, first_day = terms[index]
+    last_day = terms[index + 1][1] - timedelta(days=1) if index + 1 < len(terms) else today
+    return name, first_day, last_day
+
+
+def weekday_counts(first_day, last_day):
+    """How many times each weekday (Monday first) falls between the two dates inclusive"""
+    if last_day < first_day:
+        return np.zeros(7, dtype=np.int64)
+    days = np.arange(np.datetime64(first_day, 'D'), np.datetime64(last_day, 'D') + 1)
+    # 1970-01-01 was a Thursday
+    return np.bincount((days.astype(np.int64) + 3) % 7, minlength=7)
+
+
+def _pct(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, np.round(100.0 * numerator / denominator, 2), np.nan)
+
+
+def _values(array):
+    """Python floats for JSON, with NaN (no sessions) as None"""
+    return [None if value != value else value for value in array.tolist()]
+
+
+STUDENT_FIELDS = ('person_id', 'name', 'id_number', 'section_id', 'expected', 'attended',
+                  'attendance_percentage', 'late_ratio')
+
+SUBJECT_FIELDS = ('subject_name', 'expected', 'present', 'late', 'attendance_percentage', 'late_ratio')
+
+
+class TermReport:
+    """Every enrolled student x subject of their section over one term, as parallel NumPy arrays
+
+    Rows are grouped by enrollment (section, then student name); each
+    enrollment's rows are its section's subjects in name order.
+    """
+
+    def __init__(self, first_day, last_day, slots, enrollment, counts, now=None):
+        self.first_day = first_day
+        self.last_day = last_day
+        # Sessions count through yesterday; today's only once they have started
+        now = now or datetime.now()
+        today = now.date()
+        per_weekday = weekday_counts(first_day, min(last_day, today - timedelta(days=1)))
+
+        # Subject groups (section_id, subject_name), sorted so each section's groups are contiguous
+        groups = sorted({(section_id, subject) for section_id, subject, _, _ in slots})
+        group_index = {group: index for index, group in enumerate(groups)}
+        self.group_section = np.array([section_id for section_id, _ in groups], dtype=np.int64)
+        self.group_subject = [subject for _, subject in groups]
+        slot_group = np.array([group_index[(s, subject)] for s, subject, _, _ in slots], dtype=np.int64)
+        slot_day = np.array([DAY_NAMES.index(day) for _, _, day, _ in slots], dtype=np.int64)
+        slot_sessions = per_weekday[slot_day]
+        if first_day <= today <= last_day:
+            started = np.array([start is None or start <= now.time() for _, _, _, start in slots], dtype=bool)
+            slot_sessions = slot_sessions + ((slot_day == today.weekday()) & started)
+        self.group_expected = np.bincount(
+            slot_group, weights=slot_sessions, minlength=len(groups)
+        ).astype(np.int64) if len(slots) else np.zeros(len(groups), dtype=np.int64)
+
+        # Enrollments, then one row per enrollment x subject group of its section
+        self.enr_person = np.array([row[0] for row in enrollment], dtype=np.int64)
+        self.enr_section = np.array([row[1] for row in enrollment], dtype=np.int64)
+        self.enr_name = [row[2] for row in enrollment]
+        self.enr_id_number = [row[3] for row in enrollment]
+        first = np.searchsorted(self.group_section, self.enr_section, side='left')
+        self.enr_row_count = np.searchsorted(self.group_section, self.enr_section, side='right') - first
+        self.enr_row_start = np.cumsum(self.enr_row_count) - self.enr_row_count
+        total = int(self.enr_row_count.sum())
+        self.row_enr = np.repeat(np.arange(len(enrollment)), self.enr_row_count)
+        self.row_group = (np.repeat(first, self.enr_row_count)
+                          + np.arange(total) - np.repeat(self.enr_row_start, self.enr_row_count))
+        self.expected = self.group_expected[self.row_group]
+
+        # Scatter the per-student counts onto their rows; students no longer enrolled drop out
+        self.present = np.zeros(total, dtype=np.int64)
+        self.late = np.zeros(total, dtype=np.int64)
+        enrollment_index = {(person, section): index for index, (person, section, _, _) in enumerate(enrollment)}
+        rows, present, late = [], [], []
+        for person_id, section_id, subject, present_count, late_count in counts:
+            enr = enrollment_index.get((person_id, section_id))
+            group = group_index.get((section_id, subject))
+            if enr is None or group is None:
+                continue
+            rows.append(self.enr_row_start[enr] + group - first[enr])
+            present.append(present_count)
+            late.append(late_count)
+        if rows:
+            rows = np.array(rows, dtype=np.int64)
+            self.present[rows] = present
+            self.late[rows] = late
+
+        self.attended = self.present + self.late
+        self.percentage = _pct(self.attended, self.expected)
+        self.late_ratio = _pct(self.late, self.attended)
+
+        # Per enrollment totals across subjects
+        count = len(enrollment)
+        self.enr_expected = np.bincount(self.row_enr, weights=self.expected, minlength=count)
+        self.enr_attended = np.bincount(self.row_enr, weights=self.attended, minlength=count)
+        self.enr_late = np.bincount(self.row_enr, weights=self.late, minlength=count)
+        self.enr_percentage = _pct(self.enr_attended, self.enr_expected)
+        self.enr_late_ratio = _pct(self.enr_late, self.enr_attended)
+
+        # Output rows converted once, so slicing a section or a defaulter list is plain list indexing
+        self._subject_rows = list(zip(
+            [self.group_subject[group] for group in self.row_group.tolist()],
+            self.expected.tolist(), self.present.tolist(), self.late.tolist(),
+            _values(self.percentage), _values(self.late_ratio),
+        ))
+        self._student_rows = list(zip(
+            self.enr_person.tolist(), self.enr_name, self.enr_id_number, self.enr_section.tolist(),
+            self.enr_expected.astype(np.int64).tolist(), self.enr_attended.astype(np.int64).tolist(),
+            _values(self.enr_percentage), _values(self.enr_late_ratio),
+        ))
+
+    @property
+    def rows(self):
+        return len(self.row_enr)
+
+    def _student(self, enr, subjects=True):
+        student = dict(zip(STUDENT_FIELDS, self._student_rows[enr]))
+        if subjects:
+            student['subjects'] = [self._subject(row) for row in self._rows_of(enr)]
+        return student
+
+    def _rows_of(self, enr):
+        start = int(self.enr_row_start[enr])
+        return range(start, start + int(self.enr_row_count[enr]))
+
+    def _subject(self, row):
+        return dict(zip(SUBJECT_FIELDS, self._subject_rows[row]))
+
+    def section(self, section_id):
+        """Summary per subject and every student's per-subject figures for one section"""
+        enrollments = np.flatnonzero(self.enr_section == section_id)
+        in_section = np.isin(self.row_enr, enrollments)
+        subjects = []
+        for group in np.flatnonzero(self.group_section == section_id):
+            mask = in_section & (self.row_group == group)
+            expected = int(self.group_expected[group])
+            average = round(float(self.percentage[mask].mean()), 2) if expected and mask.any() else None
+            subjects.append({
+                'subject_name': self.group_subject[group],
+                'expected_per_student': expected,
+                'average_percentage': average,
+            })
+        return {
+            'section_id': section_id,
+            'students': [self._student(enr) for enr in enrollments.tolist()],
+            'subjects': subjects,
+        }
+
+    def defaulters(self, threshold, section_id=None, by_subject=False):
+        """Students whose overall percentage (or, by_subject, any subject's) is below threshold, lowest first"""
+        scope = np.ones(len(self.enr_person), dtype=bool) if section_id is None else self.enr_section == section_id
+        below_rows = self.percentage < threshold
+        if by_subject:
+            below = scope & (np.bincount(self.row_enr, weights=below_rows, minlength=len(scope)) > 0)
+        else:
+            below = scope & (self.enr_percentage < threshold)
+        found = np.flatnonzero(below)
+        found = found[np.argsort(self.enr_percentage[found], kind='stable')]
+        below_rows = below_rows.tolist()
+        results = []
+        for enr in found.tolist():
+            student = self._student(enr, subjects=False)
+            student['subjects_below'] = [self._subject(row) for row in self._rows_of(enr) if below_rows[row]]
+            results.append(student)
+        return results
+
+
+def build_report(cursor, first_day, last_day, now=None):
+    """Fetch the term's slots, enrollment and per-student counts in three queries and build a TermReport"""
+    cursor.execute(SLOTS_SQL, (first_day, last_day))
+    slots = cursor.fetchall()
+    cursor.execute(ENROLLMENT_SQL)
+    enrollment = cursor.fetchall()
+    cursor.execute(STUDENT_COUNTS_SQL, (first_day, last_day + timedelta(days=1)))
+    counts = cursor.fetchall()
+    return TermReport(first_day, last_day, slots, enrollment, counts, now=now)
+
+
+class ReportCache:
+    """Built TermReports keyed by (first_day, last_day), each kept for ttl seconds"""
+
+    def __init__(self, ttl=300.0, max_entries=8):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (first_day, last_day) -> (report, built_at)
+        self._lock = threading.Lock()
+        self._building = {}  # key -> Lock, so concurrent requests for one term build it once
+
+        self.hits = 0
+        self.builds = 0
+        self.build_ms_last = 0.0
+        self.build_ms_max = 0.0
+
+    def get(self, cursor, first_day, last_day):
+        """Cached report for the date range, building it with cursor if missing or stale"""
+        key = (first_day, last_day)
+        report = self._fresh(key)
+        if report is not None:
+            return report
+        with self._lock:
+            build_lock = self._building.setdefault(key, threading.Lock())
+        with build_lock:
+            report = self._fresh(key)
+            if report is not None:
+                return report
+            started = time.perf_counter()
+            report = build_report(cursor, first_day, last_day)
+            elapsed = round((time.perf_counter() - started) * 1000, 3)
+            with self._lock:
+                self._entries[key] = (report, time.monotonic())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                self._building.pop(key, None)
+                self.builds += 1
+                self.build_ms_last = elapsed
+                self.build_ms_max = max(self.build_ms_max, elapsed)
+            logger.info(f"Built term report {first_day}..{last_day}: {report.rows} rows in {elapsed} ms")
+            return report
+
+    def _fresh(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'builds': self.builds,
+                'build_ms_last': self.build_ms_last,
+                'build_ms_max': self.build_ms_max,
+            }
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Resident RFID Index
+In-process map of active student RFID tags kept fresh via LISTEN/NOTIFY
+"""
+
+import json
+import time
+import logging
+import threading
+from datetime import timedelta
+
+from psycopg2 import errors
+
+from pg_listener import ChangeListener
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'persons_changed'
+
+# Rows committed slightly out of timestamp order are re-read on the next refresh
+REFRESH_OVERLAP_SECONDS = 5
+
+FULL_LOAD_SQL = """
+    SELECT p.rfid_tag, p.person_id, p.name, p.id_number, p.updated_at
+    FROM persons p
+    WHERE p.status = 'active' AND p.role = 'student'
+"""
+
+FULL_LOAD_NO_MARKER_SQL = """
+    SELECT p.rfid_tag, p.person_id, p.name, p.id_number, NULL
+    FROM persons p
+    WHERE p.status = 'active' AND p.role = 'student'
+"""
+
+CHANGED_SINCE_SQL = """
+    SELECT p.rfid_tag, p.person_id, p.name, p.id_number, p.status, p.role, p.updated_at
+    FROM persons p
+    WHERE p.updated_at > %s
+"""
+
+
+class RFIDIndex:
+    """Tag -> (person_id, name, id_number) for active students in this worker"""
+
+    def __init__(self, db_config, refresh_interval=60.0, retry_interval=5.0):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._tag_by_person = {}
+        self._marker = None
+        self._has_marker = True
+        self._ready = False
+        self._last_refresh = None
+
+        self._listener = ChangeListener(
+            'rfid-index', db_config, [NOTIFY_CHANNEL],
+            on_connect=self.load_full,
+            on_notify=self._on_notify,
+            on_interval=self.refresh,
+            interval=refresh_interval,
+            retry_interval=retry_interval,
+        )
+
+        self.hits = 0
+        self.misses = 0
+        self.full_loads = 0
+        self.incremental_refreshes = 0
+        self.notifications = 0
+
+    @property
+    def ready(self):
+        return self._ready
+
+    def ensure_started(self):
+        """Start the loader/listener thread once per worker process"""
+        self._listener.ensure_started()
+
+    def stop(self):
+        self._listener.stop()
+
+    def resolve(self, rfid_tags):
+        """Look up tags in memory, returning {tag: (person_id, name, id_number)} for known ones"""
+        entries = self._entries
+        people = {}
+        hits = misses = 0
+        for rfid_tag in rfid_tags:
+            person = entries.get(rfid_tag)
+            if person is None:
+                misses += 1
+            else:
+                hits += 1
+                people[rfid_tag] = person
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+        return people
+
+    def lookup(self, rfid_tag):
+        return self.resolve((rfid_tag,)).get(rfid_tag)
+
+    def load_full(self, cursor):
+        """Rebuild the whole index from persons"""
+        if self._has_marker:
+            try:
+                cursor.execute(FULL_LOAD_SQL)
+            except errors.UndefinedColumn:
+                logger.warning("persons.updated_at missing; RFID index will reload in full on changes")
+                self._has_marker = False
+        if not self._has_marker:
+            cursor.execute(FULL_LOAD_NO_MARKER_SQL)
+
+        entries = {}
+        tag_by_person = {}
+        marker = None
+        for rfid_tag, person_id, name, id_number, updated_at in cursor.fetchall():
+            entries[rfid_tag] = (person_id, name, id_number)
+            tag_by_person[person_id] = rfid_tag
+            if updated_at is not None and (marker is None or updated_at > marker):
+                marker = updated_at
+
+        with self._lock:
+            self._entries = entries
+            self._tag_by_person = tag_by_person
+            self._marker = marker
+            self._ready = True
+            self._last_refresh = time.time()
+            self.full_loads += 1
+        logger.info(f"RFID index loaded {len(entries)} active students")
+
+    def refresh(self, cursor):
+        """Apply persons rows changed since the last marker"""
+        if not self._has_marker or self._marker is None:
+            self.load_full(cursor)
+            return
+
+        cursor.execute(CHANGED_SINCE_SQL, (self._marker - timedelta(seconds=REFRESH_OVERLAP_SECONDS),))
+        rows = cursor.fetchall()
+
+        with self._lock:
+            for rfid_tag, person_id, name, id_number, status, role, updated_at in rows:
+                self._remove_person(person_id)
+                if status == 'active' and role == 'student':
+                    self._entries[rfid_tag] = (person_id, name, id_number)
+                    self._tag_by_person[person_id] = rfid_tag
+                if updated_at is not None and updated_at > self._marker:
+                    self._marker = updated_at
+            self._last_refresh = time.time()
+            self.incremental_refreshes += 1
+
+    def _remove_person(self, person_id, rfid_tag=None):
+        """Drop a person's entry (caller holds the lock)"""
+        old_tag = self._tag_by_person.pop(person_id, None)
+        for tag in (old_tag, rfid_tag):
+            if tag is not None:
+                entry = self._entries.get(tag)
+                if entry is not None and entry[0] == person_id:
+                    del self._entries[tag]
+
+    def _on_notify(self, cursor, notifies):
+        """Apply deletes from the payload; refresh for anything else"""
+        needs_refresh = False
+        for notify in notifies:
+            self.notifications += 1
+            try:
+                payload = json.loads(notify.payload) if notify.payload else {}
+            except ValueError:
+                payload = {}
+            if payload.get('op') == 'DELETE' and payload.get('person_id') is not None:
+                with self._lock:
+                    self._remove_person(payload['person_id'], payload.get('rfid_tag'))
+            else:
+                needs_refresh = True
+        if needs_refresh:
+            self.refresh(cursor)
+        return needs_refresh
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'ready': self._ready,
+                'listening': self._listener.listening,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'full_loads': self.full_loads,
+                'incremental_refreshes': self.incremental_refreshes,
+                'notifications': self.notifications,
+                'last_refresh': self._last_refresh,
+            }
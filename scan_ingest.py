@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Streaming Scan Ingest
+Bounded in-memory scan queue drained by a micro-batching background writer
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from itertools import groupby
+
+import psycopg2
+
+import db_pool
+import attendance_batch
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """The ingest queue is at capacity; the client should back off and retry"""
+
+
+class ScanTicket:
+    """One queued scan and, once flushed, its outcome"""
+
+    __slots__ = ('schedule_id', 'rfid_tag', 'timestamp', 'enqueued_at',
+                 'status', 'person_id', 'name', 'error', '_done')
+
+    def __init__(self, schedule_id, rfid_tag, timestamp):
+        self.schedule_id = int(schedule_id)
+        self.rfid_tag = rfid_tag
+        self.timestamp = timestamp
+        self.enqueued_at = time.monotonic()
+        self.status = 'pending'
+        self.person_id = None
+        self.name = None
+        self.error = None
+        self._done = threading.Event()
+
+    def resolve(self, status, person=None, error=None):
+        self.status = status
+        if person:
+            self.person_id, self.name = person[0], person[1]
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout):
+        return self._done.wait(timeout)
+
+    def to_ack(self):
+        ack = {
+            'schedule_id': self.schedule_id,
+            'rfid_tag': self.rfid_tag,
+            'timestamp': self.timestamp.isoformat(),
+            'status': self.status,
+        }
+        if self.person_id is not None:
+            ack['person_id'] = self.person_id
+            ack['name'] = self.name
+        if self.error:
+            ack['error'] = self.error
+        return ack
+
+
+class ScanWriter:
+    """Queues scans and writes them in batches on size or time thresholds
+
+    Batches go through attendance_batch.record_rfid_batch, so tag lookup and
+    duplicate handling match /faculty/bulk-attendance. resolve_people, when
+    given, maps a list of tags to known students (or returns None to fall
+    back to SQL), mirroring the in-memory RFID index path. With a spool,
+    batches that cannot reach the database are spooled instead of failed.
+    With a seen_scans.SeenScans, students already recorded for a class are
+    answered as duplicates without an insert attempt.
+    """
+
+    def __init__(self, max_queue=10000, batch_size=500, flush_interval=0.25,
+                 resolve_people=None, spool=None, seen=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.resolve_people = resolve_people
+        self.spool = spool
+        self.seen = seen
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._started_at = time.time()
+
+        self.accepted = 0
+        self.rejected = 0
+        self.recorded = 0
+        self.duplicates = 0
+        self.unknown = 0
+        self.errors = 0
+        self.spooled = 0
+        self.batches = 0
+        self.flush_time_total = 0.0
+        self.ack_latency_total = 0.0
+        self.ack_latency_max = 0.0
+
+    def ensure_started(self):
+        """Start the writer thread once per worker process"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='scan-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, schedule_id, rfid_tag, timestamp, block_timeout=0):
+        """Queue one scan, raising QueueFull when there is no room"""
+        ticket = ScanTicket(schedule_id, rfid_tag, timestamp)
+        try:
+            if block_timeout:
+                self._queue.put(ticket, timeout=block_timeout)
+            else:
+                self._queue.put_nowait(ticket)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise QueueFull()
+        with self._lock:
+            self.accepted += 1
+        return ticket
+
+    def _next_batch(self):
+        """Block for the first scan, then gather until the batch is full or the window closes"""
+        try:
+            first = self._queue.get(timeout=1.0)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                try:
+                    self.flush(batch)
+                except Exception as e:
+                    logger.error(f"Scan writer error: {e}")
+
+    def flush(self, batch):
+        """Write a batch of tickets in one transaction and resolve them
+
+        Each schedule's scans run under their own savepoint, so a schedule
+        that cannot be written (deleted mid-class, say) fails only its own
+        tickets.
+        """
+        started = time.monotonic()
+        batch.sort(key=lambda ticket: ticket.schedule_id)
+        groups = [
+            (schedule_id, list(tickets))
+            for schedule_id, tickets in groupby(batch, key=lambda ticket: ticket.schedule_id)
+        ]
+
+        outcomes = []
+        present = []
+        failed = []
+        with db_pool.db_connection() as conn:
+            if conn is None:
+                self._spool_or_fail(batch, 'Database connection failed')
+                return
+            try:
+                cursor = conn.cursor()
+                for schedule_id, tickets in groups:
+                    cursor.execute('SAVEPOINT scan_group')
+                    try:
+                        scans = [(ticket.rfid_tag, ticket.timestamp) for ticket in tickets]
+                        tags = [rfid_tag for rfid_tag, _ in scans]
+                        people = self.resolve_people(tags) if self.resolve_people else None
+                        if people is None:
+                            people = attendance_batch.resolve_rfid_tags(cursor, tags)
+                        known = self.seen.warm(cursor, schedule_id) if self.seen else None
+                        results = attendance_batch.record_rfid_batch(cursor, schedule_id, scans, people, known)
+                    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                        raise
+                    except psycopg2.Error as e:
+                        cursor.execute('ROLLBACK TO SAVEPOINT scan_group')
+                        logger.error(f"Scan write error for schedule {schedule_id}: {e}")
+                        failed.append((tickets, str(e).strip()))
+                        continue
+                    cursor.execute('RELEASE SAVEPOINT scan_group')
+                    outcomes.append((tickets, results['outcomes'], people))
+                    present.append((schedule_id, results['present_person_ids'], results['known_duplicates']))
+                conn.commit()
+                cursor.close()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                logger.error(f"Scan batch write error: {e}")
+                self._spool_or_fail(batch, str(e))
+                return
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Scan batch write error: {e}")
+                self._fail(batch, str(e))
+                return
+
+        for tickets, error in failed:
+            self._fail(tickets, error)
+
+        if self.seen:
+            for schedule_id, person_ids, known_duplicates in present:
+                self.seen.add(schedule_id, person_ids)
+                self.seen.count(known_duplicates)
+
+        now = time.monotonic()
+        counts = {'recorded': 0, 'duplicate': 0, 'unknown': 0}
+        latency_total = latency_max = 0.0
+        for tickets, statuses, people in outcomes:
+            for ticket, status in zip(tickets, statuses):
+                ticket.resolve(status, people.get(ticket.rfid_tag))
+                counts[status] += 1
+                latency = now - ticket.enqueued_at
+                latency_total += latency
+                latency_max = max(latency_max, latency)
+
+        with self._lock:
+            self.batches += 1
+            self.recorded += counts['recorded']
+            self.duplicates += counts['duplicate']
+            self.unknown += counts['unknown']
+            self.flush_time_total += now - started
+            self.ack_latency_total += latency_total
+            self.ack_latency_max = max(self.ack_latency_max, latency_max)
+
+    def _spool_or_fail(self, batch, error):
+        """Hand an unwritable batch to the spool, failing it only if that is impossible"""
+        if self.spool is not None:
+            try:
+                self.spool.append([(ticket.schedule_id, ticket.rfid_tag, ticket.timestamp) for ticket in batch])
+            except Exception as e:
+                logger.error(f"Scan spool error: {e}")
+            else:
+                for ticket in batch:
+                    ticket.resolve('spooled')
+                with self._lock:
+                    self.spooled += len(batch)
+                return
+        self._fail(batch, error)
+
+    def _fail(self, batch, error):
+        for ticket in batch:
+            ticket.resolve('error', error=error)
+        with self._lock:
+            self.errors += len(batch)
+
+    def stats(self):
+        with self._lock:
+            acked = self.recorded + self.duplicates + self.unknown
+            uptime = max(time.time() - self._started_at, 1e-9)
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'recorded': self.recorded,
+                'duplicates': self.duplicates,
+                'unknown': self.unknown,
+                'errors': self.errors,
+                'spooled': self.spooled,
+                'batches': self.batches,
+                'avg_batch_size': round(acked / self.batches, 2) if self.batches else 0.0,
+                'avg_flush_ms': round(self.flush_time_total * 1000 / self.batches, 3) if self.batches else 0.0,
+                'avg_ack_latency_ms': round(self.ack_latency_total * 1000 / acked, 3) if acked else 0.0,
+                'max_ack_latency_ms': round(self.ack_latency_max * 1000, 3),
+                'scans_per_second': round(acked / uptime, 3),
+            }
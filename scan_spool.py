@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Local Scan Spool
+Append-only SQLite (WAL) spool for scans taken while PostgreSQL is unreachable
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+import psycopg2
+
+import db_pool
+import attendance_batch
+
+logger = logging.getLogger(__name__)
+
+SPOOL_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS spooled_scans (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        schedule_id,
+        rfid_tag TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        spooled_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS dead_scans (
+        id INTEGER PRIMARY KEY,
+        schedule_id,
+        rfid_tag TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        spooled_at REAL NOT NULL,
+        failed_at REAL NOT NULL,
+        error TEXT
+    );
+    CREATE TABLE IF NOT EXISTS replay_lease (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        holder INTEGER,
+        expires_at REAL NOT NULL
+    );
+    INSERT OR IGNORE INTO replay_lease (id, holder, expires_at) VALUES (1, NULL, 0);
+"""
+
+
+class ScanSpool:
+    """Durable FIFO of (schedule_id, rfid_tag, timestamp) shared by the workers on one host
+
+    One worker at a time replays, holding a lease row for lease_seconds
+    rather than a SQLite write lock, so appends from other workers never
+    wait on a PostgreSQL write. Rows are deleted only after the PostgreSQL
+    commit; a crash in between (or an expired lease) replays them again and
+    the attendance UNIQUE (schedule_id, person_id) constraint turns the
+    second write into duplicates. Scans that PostgreSQL rejects, such as
+    those for a schedule deleted during the outage, move to dead_scans so
+    they cannot hold up the rest of the spool.
+    """
+
+    def __init__(self, path, replay_batch=5000, replay_interval=2.0, lease_seconds=60.0, stats_interval=10.0):
+        self.path = path
+        self.replay_batch = replay_batch
+        self.replay_interval = replay_interval
+        self.lease_seconds = lease_seconds
+        self.stats_interval = stats_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._counted = None  # (monotonic time, depth, oldest spooled_at, dead depth)
+
+        self.appended = 0
+        self.replayed = 0
+        self.replay_batches = 0
+        self.replay_failed_tags = 0
+        self.replay_errors = 0
+        self.dead_lettered = 0
+        self.last_replay_rate = 0.0
+        self.last_replay_at = None
+
+        directory = os.path.dirname(os.path.abspath(path))
+        # The spool holds RFID tags; keep it private to this user
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        db = self._connect()
+        db.executescript(SPOOL_SCHEMA)
+        db.close()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        return db
+
+    def _db(self):
+        """One SQLite connection per thread and process"""
+        db = getattr(self._local, 'db', None)
+        if db is None or getattr(self._local, 'pid', None) != os.getpid():
+            db = self._connect()
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def _sqlite(self, fn, *args):
+        """fn(db, *args) on a SQLite connection, in gevent's threadpool under green waits"""
+        # sqlite3 blocks the whole thread, and under gevent that is every request on the worker
+        return db_pool.run_blocking(lambda: fn(self._db(), *args))
+
+    def append(self, scans):
+        """Durably spool (schedule_id, rfid_tag, timestamp) scans"""
+        now = time.time()
+        rows = [(schedule_id, rfid_tag, timestamp.isoformat(), now) for schedule_id, rfid_tag, timestamp in scans]
+        self._sqlite(self._insert, rows)
+        with self._lock:
+            self.appended += len(rows)
+        return len(rows)
+
+    def _insert(self, db, rows):
+        db.execute('BEGIN')
+        db.executemany(
+            'INSERT INTO spooled_scans (schedule_id, rfid_tag, timestamp, spooled_at) VALUES (?, ?, ?, ?)',
+            rows
+        )
+        db.execute('COMMIT')
+
+    def depth(self):
+        return self._sqlite(lambda db: db.execute('SELECT COUNT(*) FROM spooled_scans').fetchone()[0])
+
+    def _claim(self):
+        """Take or renew the replay lease; False while another worker holds it"""
+        now = time.time()
+        claimed = self._sqlite(lambda db: db.execute(
+            'UPDATE replay_lease SET holder = ?, expires_at = ? WHERE id = 1 AND (expires_at < ? OR holder = ?)',
+            (os.getpid(), now + self.lease_seconds, now, os.getpid())
+        ).rowcount)
+        return claimed == 1
+
+    def _release(self):
+        self._sqlite(lambda db: db.execute(
+            'UPDATE replay_lease SET holder = NULL, expires_at = 0 WHERE id = 1 AND holder = ?', (os.getpid(),)
+        ))
+
+    def replay_once(self, conn, resolve_people=None):
+        """Write one batch of spooled scans to PostgreSQL; returns the number taken off the spool
+
+        The caller holds the replay lease. Each schedule is written under its
+        own savepoint; a schedule PostgreSQL rejects sends its scans to
+        dead_scans instead of failing the batch.
+        """
+        started = time.monotonic()
+        rows = self._sqlite(lambda db: db.execute(
+            'SELECT id, schedule_id, rfid_tag, timestamp, spooled_at FROM spooled_scans ORDER BY id LIMIT ?',
+            (self.replay_batch,)
+        ).fetchall())
+        if not rows:
+            return 0
+
+        dead = []
+        groups = {}
+        for row in rows:
+            try:
+                scan = (row[2], datetime.fromisoformat(row[3]))
+                groups.setdefault(int(row[1]), []).append((row, scan))
+            except (TypeError, ValueError) as e:
+                dead.append((row, f'Invalid scan: {e}'))
+
+        failed = 0
+        cursor = conn.cursor()
+        try:
+            for schedule_id in sorted(groups):
+                group = groups[schedule_id]
+                scans = [scan for _, scan in group]
+                cursor.execute('SAVEPOINT spool_group')
+                try:
+                    people = resolve_people([rfid_tag for rfid_tag, _ in scans]) if resolve_people else None
+                    results = attendance_batch.record_rfid_batch(cursor, schedule_id, scans, people)
+                except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                    raise
+                except psycopg2.Error as e:
+                    cursor.execute('ROLLBACK TO SAVEPOINT spool_group')
+                    dead.extend((row, str(e).strip()) for row, _ in group)
+                    continue
+                cursor.execute('RELEASE SAVEPOINT spool_group')
+                failed += results['failed']
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        # Rows up to the last id read are ours under the lease; later appends have higher ids
+        failed_at = time.time()
+        self._sqlite(self._retire, rows[-1][0], [(*row, failed_at, error) for row, error in dead])
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        with self._lock:
+            self.replayed += len(rows) - len(dead)
+            self.replay_batches += 1
+            self.replay_failed_tags += failed
+            self.dead_lettered += len(dead)
+            self.last_replay_rate = round(len(rows) / elapsed, 1)
+            self.last_replay_at = time.time()
+        if dead:
+            logger.error(f"Moved {len(dead)} unwritable spooled scans to dead_scans: {dead[0][1]}")
+        logger.info(f"Replayed {len(rows) - len(dead)} spooled scans ({failed} unknown tags)")
+        return len(rows)
+
+    def _retire(self, db, last_id, dead_rows):
+        """Move dead rows to dead_scans and delete everything up to last_id in one short transaction"""
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany(
+                'INSERT OR REPLACE INTO dead_scans (id, schedule_id, rfid_tag, timestamp, spooled_at, failed_at, error) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                dead_rows
+            )
+            db.execute('DELETE FROM spooled_scans WHERE id <= ?', (last_id,))
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+
+    def replay_pending(self, resolve_people=None):
+        """Replay batches until the spool is empty, the database goes away or another worker has the lease"""
+        total = 0
+        try:
+            while self.depth() and self._claim():
+                with db_pool.db_connection() as conn:
+                    if conn is None:
+                        break
+                    try:
+                        replayed = self.replay_once(conn, resolve_people)
+                    except Exception as e:
+                        with self._lock:
+                            self.replay_errors += 1
+                        logger.error(f"Spool replay error: {e}")
+                        break
+                if not replayed:
+                    break
+                total += replayed
+        finally:
+            self._release()
+        return total
+
+    def ensure_started(self, resolve_people=None):
+        """Start the replay thread once per worker process"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, args=(resolve_people,), name='scan-spool', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, resolve_people):
+        while True:
+            time.sleep(self.replay_interval)
+            try:
+                self.replay_pending(resolve_people)
+            except Exception as e:
+                logger.error(f"Spool replay error: {e}")
+
+    def _counts(self, db):
+        depth, oldest = db.execute('SELECT COUNT(*), MIN(spooled_at) FROM spooled_scans').fetchone()
+        dead = db.execute('SELECT COUNT(*) FROM dead_scans').fetchone()[0]
+        return depth, oldest, dead
+
+    def stats(self):
+        """Counters, with the spool and dead-letter depths counted at most every stats_interval seconds"""
+        counted = self._counted
+        if counted is None or time.monotonic() - counted[0] >= self.stats_interval:
+            counted = (time.monotonic(), *self._sqlite(self._counts))
+            self._counted = counted
+        _, depth, oldest, dead = counted
+        with self._lock:
+            return {
+                'path': self.path,
+                'depth': depth,
+                'oldest_age_seconds': round(time.time() - oldest, 1) if oldest else 0.0,
+                'appended': self.appended,
+                'replayed': self.replayed,
+                'replay_batches': self.replay_batches,
+                'replay_failed_tags': self.replay_failed_tags,
+                'replay_errors': self.replay_errors,
+                'dead_lettered': self.dead_lettered,
+                'dead_depth': dead,
+                'last_replay_rate': self.last_replay_rate,
+                'last_replay_at': self.last_replay_at,
+            }
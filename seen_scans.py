@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Seen Scans
+Per-schedule sets of students already recorded, and per-reader debounce, to keep repeat scans off the database
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+WARM_SQL = "SELECT person_id FROM attendance WHERE schedule_id = %s"
+
+
+class _Schedule:
+    """Students known to be recorded for one schedule, until expires_at (epoch seconds)"""
+
+    __slots__ = ('person_ids', 'expires_at')
+
+    def __init__(self, person_ids, expires_at):
+        self.person_ids = person_ids
+        self.expires_at = expires_at
+
+
+class SeenScans:
+    """This worker's view of who is already marked present, per active class
+
+    A schedule's set is loaded from attendance on first use and kept until
+    its class ends (class_end(schedule_id) returns a datetime, or None when
+    unknown, in which case default_ttl applies). Students are added only
+    after their write or conflict has committed, so the set never holds a
+    student the table does not; the UNIQUE constraint still decides for
+    everyone else. Rows deleted by hand mid-class are not noticed until the
+    set expires.
+    """
+
+    def __init__(self, class_end=None, grace=900.0, default_ttl=4 * 3600.0, max_schedules=2000,
+                 debounce_window=5.0, max_debounce_entries=100000):
+        self.class_end = class_end
+        self.grace = grace
+        self.default_ttl = default_ttl
+        self.max_schedules = max_schedules
+        self.debounce_window = debounce_window
+        self.max_debounce_entries = max_debounce_entries
+        self._schedules = {}  # schedule_id -> _Schedule
+        self._recent = OrderedDict()  # (reader, schedule_id, rfid_tag) -> timestamp of the last accepted scan
+        self._lock = threading.Lock()
+
+        self.warm_loads = 0
+        self.warm_rows = 0
+        self.evictions = 0
+        self.known_duplicates = 0
+        self.debounced = 0
+        self.requests_without_db = 0
+
+    def known(self, schedule_id):
+        """Person ids recorded for schedule_id, or None until this worker has loaded them
+
+        The set is live: callers may test membership but must not iterate it.
+        """
+        entry = self._schedules.get(int(schedule_id))
+        if entry is None or entry.expires_at <= time.time():
+            return None
+        return entry.person_ids
+
+    def warm(self, cursor, schedule_id):
+        """known(), loading the schedule's existing attendance first if needed"""
+        person_ids = self.known(schedule_id)
+        if person_ids is not None:
+            return person_ids
+        cursor.execute(WARM_SQL, (schedule_id,))
+        person_ids = {row[0] for row in cursor.fetchall()}
+        now = time.time()
+        expires_at = now + self.default_ttl
+        ends = self.class_end(schedule_id) if self.class_end else None
+        if ends is not None and ends.timestamp() + self.grace > now:
+            expires_at = ends.timestamp() + self.grace
+        with self._lock:
+            self._evict(now)
+            entry = self._schedules.setdefault(int(schedule_id), _Schedule(person_ids, expires_at))
+            if entry.person_ids is not person_ids:
+                # Another request loaded it first; keep its set and merge ours in
+                entry.person_ids.update(person_ids)
+            self.warm_loads += 1
+            self.warm_rows += len(person_ids)
+        return entry.person_ids
+
+    def _evict(self, now):
+        """Drop ended classes, then the soonest-ending ones beyond max_schedules (caller holds the lock)"""
+        ended = [schedule_id for schedule_id, entry in self._schedules.items() if entry.expires_at <= now]
+        overflow = len(self._schedules) - len(ended) - self.max_schedules + 1
+        if overflow > 0:
+            live = sorted((entry.expires_at, schedule_id) for schedule_id, entry in self._schedules.items()
+                          if entry.expires_at > now)
+            ended.extend(schedule_id for _, schedule_id in live[:overflow])
+        for schedule_id in ended:
+            del self._schedules[schedule_id]
+        self.evictions += len(ended)
+
+    def add(self, schedule_id, person_ids):
+        """Record committed attendance (written or already present) for a loaded schedule"""
+        entry = self._schedules.get(int(schedule_id))
+        if entry is not None:
+            with self._lock:
+                entry.person_ids.update(person_ids)
+
+    def forget(self, schedule_id):
+        with self._lock:
+            self._schedules.pop(int(schedule_id), None)
+
+    def debounce(self, reader, schedule_id, scans):
+        """Split scans into (kept, repeated) by whether reader sent the same tag for schedule_id within the window"""
+        if not reader or self.debounce_window <= 0:
+            return scans, []
+        schedule_id = int(schedule_id)
+        kept, repeated = [], []
+        with self._lock:
+            for scan in scans:
+                last = self._recent.get((reader, schedule_id, scan[0]))
+                if last is not None and 0 <= (scan[1] - last).total_seconds() < self.debounce_window:
+                    repeated.append(scan)
+                else:
+                    kept.append(scan)
+            self.debounced += len(repeated)
+        return kept, repeated
+
+    def remember(self, reader, schedule_id, scans):
+        """Start the debounce window for scans that were processed successfully for schedule_id"""
+        if not reader or self.debounce_window <= 0:
+            return
+        schedule_id = int(schedule_id)
+        with self._lock:
+            for rfid_tag, timestamp in scans:
+                # A reader that moves to the next class must not have that class's first scans debounced
+                key = (reader, schedule_id, rfid_tag)
+                last = self._recent.get(key)
+                if last is None or timestamp > last:
+                    self._recent[key] = timestamp
+                self._recent.move_to_end(key)
+            while len(self._recent) > self.max_debounce_entries:
+                self._recent.popitem(last=False)
+
+    def count(self, known_duplicates, without_db=False):
+        with self._lock:
+            self.known_duplicates += known_duplicates
+            self.requests_without_db += int(without_db)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'schedules': len(self._schedules),
+                'students': sum(len(entry.person_ids) for entry in self._schedules.values()),
+                'warm_loads': self.warm_loads,
+                'warm_rows': self.warm_rows,
+                'evictions': self.evictions,
+                'known_duplicates': self.known_duplicates,
+                'debounced': self.debounced,
+                # Scans answered without an insert attempt, and requests that borrowed no connection
+                'db_rows_saved': self.known_duplicates + self.debounced,
+                'requests_without_db': self.requests_without_db,
+                'debounce_entries': len(self._recent),
+            }
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Response Serialization
+orjson-backed JSON provider with a stdlib fallback, and gzip/brotli negotiation for large responses
+"""
+
+import json
+import gzip
+import uuid
+import decimal
+import dataclasses
+from datetime import date
+
+from flask.json.provider import JSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json',)
+
+
+def _default(o):
+    """Types JSON has no form for, rendered the way Flask's default provider renders them"""
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    # Dates go through _default so they keep Flask's HTTP-date form
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj):
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    def loads(s):
+        return orjson.loads(s)
+else:
+    _encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(',', ':'))
+
+    def dumps_bytes(obj):
+        return _encoder.encode(obj).encode('utf-8')
+
+    def loads(s):
+        return json.loads(s)
+
+
+class FastJSONProvider(JSONProvider):
+    """jsonify and request.json through orjson when it is installed
+
+    Keys keep insertion order rather than being sorted, and responses are
+    compact in every mode.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj) + b'\n', mimetype='application/json')
+
+
+def bulk_results(records):
+    """Per-scan entries of a bulk attendance response, straight from AttendanceRecord tuples"""
+    return [
+        {
+            'success': True,
+            'person_id': person_id,
+            'name': name,
+            'student': {'name': name, 'section': 'N/A'},
+            'rfid_tag': rfid_tag,
+            'timestamp': timestamp.isoformat(),
+            'method': method,
+            'isDuplicate': False,
+        }
+        for person_id, name, _, rfid_tag, timestamp, method in records
+    ]
+
+
+def choose_encoding(accept_encodings):
+    """Best of br and gzip the client accepts, or None"""
+    offered = ('br', 'gzip') if brotli is not None else ('gzip',)
+    return accept_encodings.best_match(offered)
+
+
+def compress(data, encoding, gzip_level=5, brotli_quality=4):
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def compress_response(response, accept_encodings, min_size=1024, gzip_level=5, brotli_quality=4):
+    """Compress a buffered JSON response in place when it is large enough and the client accepts it"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.content_length or 0) < min_size:
+        return response
+    encoding = choose_encoding(accept_encodings)
+    if not encoding:
+        return response
+    response.set_data(compress(response.get_data(), encoding, gzip_level, brotli_quality))
+    response.headers['Content-Encoding'] = encoding
+    return response
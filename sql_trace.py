@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - SQL Tracing
+Per-request statement accounting, repeated-statement warnings and a slow-query log with plan capture
+"""
+
+import re
+import time
+import logging
+import threading
+from functools import lru_cache
+
+from psycopg2 import extensions
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+_settings = {
+    'enabled': True,
+    'slow_ms': 200.0,
+    'explain': False,
+    'explain_interval': 60.0,
+    'repeat_threshold': 10,
+}
+
+_local = threading.local()
+_lock = threading.Lock()
+# fingerprint -> [calls, seconds, rows, max_seconds]
+_statements = {}
+_last_explain = {}
+_counts = {'statements': 0, 'slow': 0, 'explains': 0, 'explain_errors': 0, 'repeated': 0}
+
+# Bound on distinct fingerprints kept process-wide
+MAX_FINGERPRINTS = 500
+
+EXPLAINABLE = ('select', 'insert', 'update', 'delete', 'with')
+
+# Plain and E'' (backslash-escaped) string literals, and $tag$...$tag$ dollar-quoted strings
+_STRING = re.compile(
+    r"(?<!\w)[Ee]'(?:[^'\\]|\\.|'')*'"
+    r"|'(?:[^']|'')*'"
+    r"|(?<![\w$])\$(?P<tag>(?:[A-Za-z_]\w*)?)\$.*?\$(?P=tag)\$",
+    re.DOTALL,
+)
+# What is left of a literal cut off by truncation
+_OPEN_LITERAL = re.compile(r"'|(?<![\w$])\$(?:[A-Za-z_]\w*)?\$")
+_VALUES_KEYWORD = re.compile(r'\bVALUES\b', re.IGNORECASE)
+_NUMBER = re.compile(r'(?<![\w$])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b', re.IGNORECASE)
+# A VALUES element after literal replacement: ?, ? with casts (mogrified datetimes, %s::int templates), NULL, true or false
+_VALUE = r'(?:\?(?:::\w+(?:\[\])?)*|NULL|true|false)'
+_ROW = r'\(\s*' + _VALUE + r'(?:\s*,\s*' + _VALUE + r')*\s*\)'
+_VALUES_LIST = re.compile(_ROW + r'(?:\s*,\s*' + _ROW + r')+', re.IGNORECASE)
+_ARRAY = re.compile(r'ARRAY\[[^\]]*\]', re.IGNORECASE)
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s')
+_SPACE = re.compile(r'\s+')
+
+
+def configure(**settings):
+    """Set tracing options: enabled, slow_ms, explain, explain_interval, repeat_threshold"""
+    _settings.update(settings)
+
+
+# Longer statements are mostly execute_values batches: rarely repeated verbatim, and costly to scan in full
+MAX_CACHED_SQL = 4096
+
+
+def fingerprint(sql):
+    """Statement text with literals replaced by ? and multi-row VALUES collapsed
+
+    Doubles as the redacted form written to the slow-query log, so literal
+    values inlined by execute_values or mogrify never reach the logs.
+    Statements longer than MAX_CACHED_SQL are fingerprinted by their start
+    only, up to VALUES when it appears there, and end in '...'.
+    """
+    if len(sql) > MAX_CACHED_SQL:
+        return _cached_fingerprint(_head(sql)) + ' ...'
+    return _cached_fingerprint(sql)
+
+
+def _head(sql):
+    """The start of an oversized statement, through VALUES if present, minus any literal cut in half"""
+    head = sql[:MAX_CACHED_SQL]
+    values = _VALUES_KEYWORD.search(head)
+    if values:
+        head = head[:values.end()]
+    head = _STRING.sub('?', head)
+    unterminated = _OPEN_LITERAL.search(head)
+    return head[:unterminated.start()] if unterminated else head
+
+
+@lru_cache(maxsize=2048)
+def _cached_fingerprint(sql):
+    return _fingerprint(sql)
+
+
+def _fingerprint(sql):
+    text = _STRING.sub('?', sql)
+    text = _ARRAY.sub('ARRAY[?]', text)
+    text = _PLACEHOLDER.sub('?', text)
+    text = _NUMBER.sub('?', text)
+    text = _VALUES_LIST.sub('(...)', text)
+    return _SPACE.sub(' ', text).strip()
+
+
+def _sql_text(cursor, query):
+    if isinstance(query, bytes):
+        return query.decode('utf-8', 'replace')
+    if isinstance(query, str):
+        return query
+    # psycopg2.sql.Composable
+    return query.as_string(cursor.connection)
+
+
+def _describe_params(vars):
+    """Parameter shapes only; values are never logged"""
+    if vars is None:
+        return 'none'
+    if isinstance(vars, dict):
+        return ', '.join(f'{key}:{type(value).__name__}' for key, value in vars.items())
+    return ', '.join(type(value).__name__ for value in vars)
+
+
+class RequestTrace:
+    """Statements run while serving one request"""
+
+    __slots__ = ('statements',)
+
+    def __init__(self):
+        self.statements = {}
+
+    def add(self, key, seconds, rows):
+        entry = self.statements.get(key)
+        if entry is None:
+            self.statements[key] = [1, seconds, rows]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += rows
+
+
+def start_request():
+    _local.trace = RequestTrace() if _settings['enabled'] else None
+
+
+def finish_request(endpoint):
+    """Close the current request's trace; returns its summary or None when tracing is off"""
+    trace = getattr(_local, 'trace', None)
+    _local.trace = None
+    if trace is None:
+        return None
+
+    repeated = [
+        (key, entry) for key, entry in trace.statements.items()
+        if entry[0] >= _settings['repeat_threshold']
+    ]
+    for key, (calls, seconds, rows) in repeated:
+        logger.warning(
+            f"Repeated statement in {endpoint}: {calls} calls, {seconds * 1000:.1f} ms, "
+            f"{rows} rows: {key[:300]}"
+        )
+    if repeated:
+        with _lock:
+            _counts['repeated'] += len(repeated)
+
+    calls = sum(entry[0] for entry in trace.statements.values())
+    return {
+        'queries': calls,
+        'distinct': len(trace.statements),
+        'rows': sum(entry[2] for entry in trace.statements.values()),
+        'db_ms': round(sum(entry[1] for entry in trace.statements.values()) * 1000, 3),
+        'repeated': len(repeated),
+    }
+
+
+def summary_headers(summary):
+    """Response headers for a request summary (debug mode only)"""
+    return {
+        'X-SQL-Summary': (
+            f"queries={summary['queries']} distinct={summary['distinct']} rows={summary['rows']} "
+            f"db_ms={summary['db_ms']} repeated={summary['repeated']}"
+        ),
+        'Server-Timing': f"db;dur={summary['db_ms']};desc=\"{summary['queries']} queries\"",
+    }
+
+
+def _record(cursor, query, vars, seconds, explain):
+    if not _settings['enabled']:
+        return
+    sql = _sql_text(cursor, query)
+    key = fingerprint(sql)
+    rows = max(cursor.rowcount, 0)
+
+    trace = getattr(_local, 'trace', None)
+    if trace is not None:
+        trace.add(key, seconds, rows)
+
+    with _lock:
+        _counts['statements'] += 1
+        entry = _statements.get(key)
+        if entry is None and len(_statements) < MAX_FINGERPRINTS:
+            entry = _statements[key] = [0, 0.0, 0, 0.0]
+        if entry is not None:
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += rows
+            entry[3] = max(entry[3], seconds)
+
+    if seconds * 1000 < _settings['slow_ms']:
+        return
+    with _lock:
+        _counts['slow'] += 1
+    plan = _explain(cursor, sql, vars, key) if explain else None
+    message = (
+        f"Slow query {seconds * 1000:.1f} ms, {rows} rows, params [{_describe_params(vars)}]: {key[:1000]}"
+    )
+    if plan:
+        message += f"\n{plan}"
+    logger.warning(message)
+
+
+def _explain(cursor, sql, vars, key):
+    """EXPLAIN (ANALYZE, BUFFERS) inside a savepoint that is always rolled back
+
+    ANALYZE executes the statement again; the savepoint undoes its writes
+    and drops any NOTIFY it queued. At most one plan per statement shape
+    is captured every explain_interval seconds.
+    """
+    if not _settings['explain'] or cursor.name or cursor.connection.autocommit:
+        return None
+    if not sql.lstrip().lower().startswith(EXPLAINABLE):
+        return None
+    now = time.monotonic()
+    with _lock:
+        if now - _last_explain.get(key, float('-inf')) < _settings['explain_interval']:
+            return None
+        _last_explain[key] = now
+
+    # A plain cursor, so the EXPLAIN itself is not traced
+    plain = cursor.connection.cursor(cursor_factory=extensions.cursor)
+    try:
+        plain.execute('SAVEPOINT sql_trace_explain')
+        try:
+            plain.execute('EXPLAIN (ANALYZE, BUFFERS) ' + sql, vars)
+            plan = '\n'.join(row[0] for row in plain.fetchall())
+        finally:
+            plain.execute('ROLLBACK TO SAVEPOINT sql_trace_explain')
+            plain.execute('RELEASE SAVEPOINT sql_trace_explain')
+        with _lock:
+            _counts['explains'] += 1
+        return plan
+    except Exception as e:
+        with _lock:
+            _counts['explain_errors'] += 1
+        logger.error(f"EXPLAIN capture failed: {e}")
+        return None
+    finally:
+        plain.close()
+
+
+class TracingCursor(metrics.TimedCursor):
+    """Cursor that records every statement for the current request and the slow-query log"""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        result = super().execute(query, vars)
+        _record(self, query, vars, time.perf_counter() - started, explain=True)
+        return result
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        result = super().executemany(query, vars_list)
+        _record(self, query, None, time.perf_counter() - started, explain=False)
+        return result
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        result = super().copy_expert(sql, file, size)
+        _record(self, sql, None, time.perf_counter() - started, explain=False)
+        return result
+
+
+def top_statements(limit=20, order='seconds'):
+    """Process-wide statement totals, heaviest first"""
+    index = {'calls': 0, 'seconds': 1, 'rows': 2, 'max': 3}[order]
+    with _lock:
+        items = sorted(_statements.items(), key=lambda item: item[1][index], reverse=True)[:limit]
+    return [
+        {
+            'statement': key,
+            'calls': calls,
+            'total_ms': round(seconds * 1000, 3),
+            'avg_ms': round(seconds * 1000 / calls, 3) if calls else 0.0,
+            'max_ms': round(max_seconds * 1000, 3),
+            'rows': rows,
+        }
+        for key, (calls, seconds, rows, max_seconds) in items
+    ]
+
+
+def stats():
+    with _lock:
+        return dict(_counts, fingerprints=len(_statements))
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Static Asset Cache
+Pages and static files held in memory with strong ETags and precompressed variants
+"""
+
+import os
+import stat
+import time
+import hashlib
+import logging
+import mimetypes
+import threading
+from datetime import datetime, timezone
+
+from flask import Response
+from werkzeug.security import safe_join
+
+import serialization
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_PREFIXES = ('text/',)
+COMPRESSIBLE_TYPES = (
+    'application/javascript', 'application/json', 'application/xml',
+    'image/svg+xml', 'application/manifest+json',
+)
+
+# SQLite files and their WAL, shared-memory and journal files hold local state and are never served
+PRIVATE_SUFFIXES = ('.db', '.sqlite', '.sqlite3', '-wal', '-shm', '-journal')
+
+
+def compressible(mimetype):
+    return mimetype.startswith(COMPRESSIBLE_PREFIXES) or mimetype in COMPRESSIBLE_TYPES
+
+
+class Asset:
+    """One cached body, with an encoding -> (body, etag) entry per variant ('identity' always present)"""
+
+    __slots__ = ('mimetype', 'variants', 'last_modified', 'mtime', 'size', 'checked_at')
+
+    def __init__(self, body, mimetype, mtime=None, size=None):
+        self.mimetype = mimetype
+        self.mtime = mtime
+        self.size = size
+        self.checked_at = time.monotonic()
+        modified = mtime if mtime is not None else time.time()
+        self.last_modified = datetime.fromtimestamp(int(modified), timezone.utc)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {'identity': (body, digest)}
+
+    @property
+    def nbytes(self):
+        return sum(len(body) for body, _ in self.variants.values())
+
+
+class StaticAssets:
+    """Serves files under root from memory, revalidating each against the disk at most every recheck_interval
+
+    Files larger than max_file_bytes, or that would push the cache past
+    max_total_bytes, are not cached; lookup() returns None for them and the
+    caller streams them from disk as before. Paths under private_dirs and
+    SQLite files are refused: lookup() returns None and refuses() is True.
+    """
+
+    def __init__(self, root, max_file_bytes=2 * 1024 * 1024, max_total_bytes=32 * 1024 * 1024,
+                 recheck_interval=30.0, max_age=0, min_compress_bytes=256, gzip_level=9, brotli_quality=9,
+                 private_dirs=()):
+        self.root = root
+        self.private_dirs = tuple(os.path.join(os.path.realpath(path), '') for path in private_dirs)
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.recheck_interval = recheck_interval
+        self.min_compress_bytes = min_compress_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        # Assets are not fingerprinted, so by default clients revalidate every time and get a 304
+        self.cache_control = f'public, max-age={max_age}' if max_age > 0 else 'no-cache'
+        self._entries = {}  # absolute path -> Asset
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.loads = 0
+        self.reloads = 0
+        self.not_modified = 0
+        self.uncached = 0
+
+    def page(self, body, mimetype='text/html'):
+        """An in-memory asset for content rendered once at startup"""
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        return self._build(body, mimetype)
+
+    def _build(self, body, mimetype, mtime=None, size=None):
+        asset = Asset(body, mimetype, mtime, size)
+        if compressible(mimetype) and len(body) >= self.min_compress_bytes:
+            digest = asset.variants['identity'][1]
+            encodings = ('br', 'gzip') if serialization.brotli is not None else ('gzip',)
+            for encoding in encodings:
+                encoded = serialization.compress(body, encoding, self.gzip_level, self.brotli_quality)
+                if len(encoded) < len(body):
+                    asset.variants[encoding] = (encoded, f'{digest}-{encoding}')
+        return asset
+
+    def refuses(self, path):
+        """Whether path must not be served: outside root, under a private directory, or a SQLite file"""
+        full_path = safe_join(self.root, path)
+        if full_path is None:
+            return True
+        full_path = os.path.realpath(full_path)
+        return (full_path.lower().endswith(PRIVATE_SUFFIXES)
+                or os.path.join(full_path, '').startswith(self.private_dirs))
+
+    def lookup(self, path):
+        """Cached Asset for path under root, or None when it is missing, refused or not cacheable"""
+        full_path = safe_join(self.root, path)
+        if full_path is None or self.refuses(path):
+            return None
+        now = time.monotonic()
+        with self._lock:
+            asset = self._entries.get(full_path)
+            if asset is not None and now - asset.checked_at < self.recheck_interval:
+                self.hits += 1
+                return asset
+
+        try:
+            info = os.stat(full_path)
+        except OSError:
+            info = None
+        if info is None or not stat.S_ISREG(info.st_mode):
+            self._forget(full_path)
+            return None
+        if asset is not None and (asset.mtime, asset.size) == (info.st_mtime, info.st_size):
+            asset.checked_at = now
+            with self._lock:
+                self.hits += 1
+            return asset
+        if info.st_size > self.max_file_bytes:
+            self._forget(full_path, uncached=True)
+            return None
+
+        try:
+            with open(full_path, 'rb') as f:
+                body = f.read()
+        except OSError as e:
+            logger.warning(f"Static asset {path} unreadable: {e}")
+            self._forget(full_path)
+            return None
+        mimetype = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        loaded = self._build(body, mimetype, info.st_mtime, info.st_size)
+
+        with self._lock:
+            previous = self._entries.pop(full_path, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+                self.reloads += 1
+            if self._bytes + loaded.nbytes > self.max_total_bytes:
+                self.uncached += 1
+                return None
+            self._entries[full_path] = loaded
+            self._bytes += loaded.nbytes
+            self.loads += 1
+        return loaded
+
+    def _forget(self, full_path, uncached=False):
+        with self._lock:
+            previous = self._entries.pop(full_path, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            if uncached:
+                self.uncached += 1
+
+    def respond(self, asset, request):
+        """200 with the best variant the client accepts, or 304 when its validators still match"""
+        offered = [encoding for encoding in ('br', 'gzip') if encoding in asset.variants]
+        encoding = request.accept_encodings.best_match(offered) if offered else None
+        body, etag = asset.variants[encoding or 'identity']
+
+        if request.if_none_match:
+            fresh = request.if_none_match.contains_weak(etag)
+        else:
+            fresh = request.if_modified_since is not None and asset.last_modified <= request.if_modified_since
+
+        if fresh:
+            response = Response(status=304)
+            with self._lock:
+                self.not_modified += 1
+        else:
+            response = Response(body, mimetype=asset.mimetype)
+            response.last_modified = asset.last_modified
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = self.cache_control
+        if offered:
+            response.vary.add('Accept-Encoding')
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_total_bytes,
+                'hits': self.hits,
+                'loads': self.loads,
+                'reloads': self.reloads,
+                'not_modified': self.not_modified,
+                'uncached': self.uncached,
+            }
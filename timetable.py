@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Timetable Cache
+Weekly schedule held in memory with per-room and per-teacher interval lookups
+"""
+
+import json
+import time
+import logging
+import threading
+from bisect import bisect_right
+from datetime import datetime
+
+from pg_listener import ChangeListener
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNELS = ['schedule_changed', 'persons_changed']
+
+_TIMETABLE_SELECT = """
+    SELECT
+        sc.schedule_id,
+        sc.section_id,
+        sc.subject_name,
+        sc.class_type,
+        s.section_name,
+        c.room_number,
+        p.name as teacher_name,
+        sc.start_time,
+        sc.end_time,
+        sc.day_of_week,
+        sc.classroom_id,
+        sc.teacher_id
+    FROM schedule sc
+    JOIN sections s ON sc.section_id = s.section_id
+    JOIN classrooms c ON sc.classroom_id = c.classroom_id
+    JOIN persons p ON sc.teacher_id = p.person_id
+"""
+
+TIMETABLE_SQL = _TIMETABLE_SELECT + """
+    ORDER BY sc.start_time
+"""
+
+# Candidates for Timetable.query_active_in_room; the choice among them is made by _Slots.active
+ROOM_CANDIDATES_SQL = _TIMETABLE_SELECT + """
+    WHERE sc.day_of_week = %s
+      AND (sc.classroom_id = %s OR c.room_number = %s)
+      AND sc.start_time <= %s::time + make_interval(secs => %s)
+      AND sc.end_time > %s::time
+    ORDER BY sc.start_time
+"""
+
+
+def _seconds(value):
+    """Seconds since midnight for a time or datetime"""
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def _entry(row):
+    """TimetableEntry for a row selected by _TIMETABLE_SELECT"""
+    return TimetableEntry(
+        schedule_id=row[0],
+        day=row[9],
+        classroom_id=row[10],
+        teacher_id=row[11],
+        start=_seconds(row[7]),
+        end=_seconds(row[8]),
+        row={
+            'schedule_id': row[0],
+            'section_id': row[1],
+            'subject_name': row[2],
+            'class_type': row[3],
+            'class_name': row[4],
+            'room_number': row[5],
+            'teacher_name': row[6],
+            'start_time': str(row[7]),
+            'end_time': str(row[8]),
+        },
+    )
+
+
+class TimetableEntry:
+    """One weekly class slot"""
+
+    __slots__ = ('schedule_id', 'day', 'classroom_id', 'teacher_id', 'start', 'end', 'row')
+
+    def __init__(self, schedule_id, day, classroom_id, teacher_id, start, end, row):
+        self.schedule_id = schedule_id
+        self.day = day
+        self.classroom_id = classroom_id
+        self.teacher_id = teacher_id
+        self.start = start
+        self.end = end
+        self.row = row
+
+
+class _Slots:
+    """Entries for one key sorted by start time, with a parallel list for bisect"""
+
+    __slots__ = ('starts', 'entries')
+
+    def __init__(self):
+        self.starts = []
+        self.entries = []
+
+    def add(self, entry):
+        index = bisect_right(self.starts, entry.start)
+        self.starts.insert(index, entry.start)
+        self.entries.insert(index, entry)
+
+    def active(self, seconds, early):
+        """Entry running at seconds, else the next one starting within early seconds
+
+        This is the one definition of the active class: among overlapping
+        running classes the latest started wins, and among upcoming ones the
+        soonest to start.
+        """
+        index = bisect_right(self.starts, seconds + early)
+        upcoming = None
+        for entry in reversed(self.entries[:index]):
+            if seconds >= entry.end:
+                continue
+            if entry.start <= seconds:
+                return entry
+            upcoming = entry
+        return upcoming
+
+
+class _Snapshot:
+    """Immutable view of the timetable swapped in whole on rebuild"""
+
+    __slots__ = ('by_day', 'by_room', 'by_teacher', 'room_ids', 'by_id', 'teacher_ids')
+
+    def __init__(self, entries):
+        self.by_day = {}
+        self.by_room = {}
+        self.by_teacher = {}
+        self.room_ids = {}
+        self.by_id = {}
+        self.teacher_ids = set()
+        for entry in entries:
+            self.by_day.setdefault(entry.day, []).append(entry)
+            self.by_room.setdefault((entry.day, entry.classroom_id), _Slots()).add(entry)
+            self.by_teacher.setdefault((entry.day, entry.teacher_id), _Slots()).add(entry)
+            self.room_ids[entry.row['room_number']] = entry.classroom_id
+            self.by_id[entry.schedule_id] = entry
+            self.teacher_ids.add(entry.teacher_id)
+
+
+class Timetable:
+    """Weekly timetable for this worker, rebuilt when schedule data changes"""
+
+    def __init__(self, db_config, refresh_interval=300.0, early_minutes=10, retry_interval=5.0):
+        self.early_seconds = int(early_minutes * 60)
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._last_rebuild = None
+        self.rebuilds = 0
+        self.notifications = 0
+
+        self._listener = ChangeListener(
+            'timetable', db_config, NOTIFY_CHANNELS,
+            on_connect=self.rebuild,
+            on_notify=self._on_notify,
+            interval=refresh_interval,
+            retry_interval=retry_interval,
+        )
+
+    @property
+    def ready(self):
+        return self._snapshot is not None
+
+    def ensure_started(self):
+        self._listener.ensure_started()
+
+    def stop(self):
+        self._listener.stop()
+
+    def rebuild(self, cursor):
+        """Reload every schedule row and swap in a fresh index"""
+        cursor.execute(TIMETABLE_SQL)
+        entries = [_entry(row) for row in cursor.fetchall()]
+        snapshot = _Snapshot(entries)
+        with self._lock:
+            self._snapshot = snapshot
+            self._last_rebuild = time.time()
+            self.rebuilds += 1
+        logger.info(f"Timetable loaded {len(entries)} schedule entries")
+
+    def _on_notify(self, cursor, notifies):
+        """Rebuild on schedule changes or edits to a teacher on the timetable"""
+        self.notifications += len(notifies)
+        snapshot = self._snapshot
+        for notify in notifies:
+            if notify.channel != 'persons_changed' or snapshot is None:
+                break
+            try:
+                person_id = json.loads(notify.payload).get('person_id')
+            except (TypeError, ValueError):
+                break
+            if person_id in snapshot.teacher_ids:
+                break
+        else:
+            # Only student roster changes, which the timetable does not show
+            return False
+        self.rebuild(cursor)
+        return True
+
+    def for_day(self, day):
+        """Schedule rows for a weekday name, ordered by start time"""
+        return [entry.row for entry in self._snapshot.by_day.get(day, [])]
+
+    def get(self, schedule_id):
+        entry = self._snapshot.by_id.get(schedule_id)
+        return entry.row if entry else None
+
+    def classroom_id_for(self, room_number):
+        return self._snapshot.room_ids.get(room_number)
+
+    def active_in_room(self, classroom_id, at=None):
+        """Class running (or about to start) in a classroom at the given time"""
+        at = at or datetime.now()
+        slots = self._snapshot.by_room.get((at.strftime('%A'), classroom_id))
+        entry = slots.active(_seconds(at), self.early_seconds) if slots else None
+        return entry.row if entry else None
+
+    def query_active_in_room(self, cursor, classroom_id=None, room_number=None, at=None):
+        """Same answer as active_in_room, read from the database for when the cache is not loaded"""
+        at = at or datetime.now()
+        cursor.execute(ROOM_CANDIDATES_SQL, (at.strftime('%A'), classroom_id, room_number,
+                                             at.time(), self.early_seconds, at.time()))
+        slots = _Slots()
+        for row in cursor.fetchall():
+            slots.add(_entry(row))
+        entry = slots.active(_seconds(at), self.early_seconds)
+        return entry.row if entry else None
+
+    def active_for_teacher(self, teacher_id, at=None):
+        """Class a teacher is running (or about to start) at the given time"""
+        at = at or datetime.now()
+        slots = self._snapshot.by_teacher.get((at.strftime('%A'), teacher_id))
+        entry = slots.active(_seconds(at), self.early_seconds) if slots else None
+        return entry.row if entry else None
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'ready': snapshot is not None,
+            'listening': self._listener.listening,
+            'entries': len(snapshot.by_id) if snapshot else 0,
+            'rebuilds': self.rebuilds,
+            'notifications': self.notifications,
+            'last_rebuild': self._last_rebuild,
+        }
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Enhanced Attendance System - Verified Token Cache
+Bounded LRU of verified JWT claims, each entry dropped when its token expires
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+import jwt
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCache:
+    """Verifies HS256 tokens once and serves repeat presentations from memory"""
+
+    def __init__(self, secret_key, max_entries=10000, max_ttl=900.0, algorithms=('HS256',)):
+        self.secret_key = secret_key
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self.algorithms = list(algorithms)
+        self._entries = OrderedDict()  # token -> (claims, expires_at)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalid = 0
+        self.evictions = 0
+
+    def verify(self, token):
+        """Return the token's claims, raising jwt.InvalidTokenError subclasses on failure"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                claims, expires_at = entry
+                if now < expires_at:
+                    self._entries.move_to_end(token)
+                    self.hits += 1
+                    return claims
+                del self._entries[token]
+            self.misses += 1
+
+        try:
+            claims = jwt.decode(
+                token, self.secret_key, algorithms=self.algorithms,
+                options={'require': ['exp']}
+            )
+        except jwt.ExpiredSignatureError:
+            with self._lock:
+                self.expired += 1
+            raise
+        except jwt.InvalidTokenError:
+            with self._lock:
+                self.invalid += 1
+            raise
+
+        # Cached claims never outlive the token; max_ttl bounds how long a key change can lag
+        expires_at = min(float(claims['exp']), now + self.max_ttl)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._purge_expired(now)
+            self._entries[token] = (claims, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return claims
+
+    def purge_expired(self):
+        """Drop entries whose tokens have expired"""
+        with self._lock:
+            return self._purge_expired(time.time())
+
+    def _purge_expired(self, now):
+        stale = [token for token, (_, expires_at) in self._entries.items() if expires_at <= now]
+        for token in stale:
+            del self._entries[token]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'expired': self.expired,
+                'invalid': self.invalid,
+                'evictions': self.evictions,
+            }
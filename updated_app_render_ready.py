@@ -4,30 +4,158 @@ Enhanced Attendance System - Production Ready
 Fixed for Render deployment with proper error handling
 """
 
-from flask import Flask, request, jsonify, send_from_directory, render_template_string
+from flask import Flask, Request, Response, request, jsonify, send_from_directory, g
 from flask_cors import CORS
 import os
 import psycopg2
-from werkzeug.utils import secure_filename
+import db_pool
+import attendance_batch
+import rfid_index
+import timetable
+import scan_ingest
+import scan_spool
+import token_cache
+import event_stream
+import aggregates
+import attendance_export
+import image_pipeline
+import online_sessions
+import metrics
+import health
+import sql_trace
+import serialization
+import static_assets
+import seen_scans
+import report_engine
+import logins
 import logging
 import traceback
 from datetime import datetime, timedelta
 import jwt
 from functools import wraps
 import json
+import io
+import time
+import tempfile
+from concurrent.futures import TimeoutError as FutureTimeout
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class InMemoryRequest(Request):
+    """Keep uploaded files in memory; MAX_CONTENT_LENGTH bounds their size"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
 app = Flask(__name__)
+app.request_class = InMemoryRequest
+app.json = serialization.FastJSONProvider(app)
 CORS(app, origins=['*'])
 
+# Spool, job results and metrics files live here, outside app.root_path, which serve_static exposes
+STATE_DIR = os.environ.get('STATE_DIR', os.path.join(tempfile.gettempdir(), 'attendance-state'))
+
 # Configuration
 app.config.update(
     MAX_CONTENT_LENGTH=10 * 1024 * 1024,  # 10MB
-    UPLOAD_FOLDER='temp_uploads',
     SECRET_KEY=os.environ.get('SECRET_KEY', 'change-this-secret-key'),
+    # Connection pool sizing is per gunicorn worker process
+    DB_POOL_MIN=int(os.environ.get('DB_POOL_MIN', 1)),
+    DB_POOL_MAX=int(os.environ.get('DB_POOL_MAX', 10)),
+    DB_POOL_TIMEOUT=float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+    DB_POOL_HEALTHCHECK_INTERVAL=float(os.environ.get('DB_POOL_HEALTHCHECK_INTERVAL', 30)),
+    DB_POOL_RETRY_BACKOFF=float(os.environ.get('DB_POOL_RETRY_BACKOFF', 2)),
+    RFID_INDEX_ENABLED=os.environ.get('RFID_INDEX_ENABLED', 'true').lower() == 'true',
+    RFID_INDEX_REFRESH_INTERVAL=float(os.environ.get('RFID_INDEX_REFRESH_INTERVAL', 60)),
+    TIMETABLE_ENABLED=os.environ.get('TIMETABLE_ENABLED', 'true').lower() == 'true',
+    TIMETABLE_REFRESH_INTERVAL=float(os.environ.get('TIMETABLE_REFRESH_INTERVAL', 300)),
+    # Scans this many minutes before a class starts are credited to that class
+    TIMETABLE_EARLY_MINUTES=int(os.environ.get('TIMETABLE_EARLY_MINUTES', 10)),
+    # Streaming ingest: queued scans are flushed when a batch fills or the interval passes
+    INGEST_QUEUE_SIZE=int(os.environ.get('INGEST_QUEUE_SIZE', 10000)),
+    INGEST_BATCH_SIZE=int(os.environ.get('INGEST_BATCH_SIZE', 500)),
+    INGEST_FLUSH_INTERVAL=float(os.environ.get('INGEST_FLUSH_INTERVAL', 0.25)),
+    INGEST_ACK_TIMEOUT=float(os.environ.get('INGEST_ACK_TIMEOUT', 5)),
+    INGEST_ENQUEUE_TIMEOUT=float(os.environ.get('INGEST_ENQUEUE_TIMEOUT', 0.5)),
+    # Local spool that accepts scans while PostgreSQL is unreachable
+    SPOOL_ENABLED=os.environ.get('SPOOL_ENABLED', 'true').lower() == 'true',
+    SPOOL_PATH=os.environ.get('SPOOL_PATH', os.path.join(STATE_DIR, 'attendance_spool.db')),
+    SPOOL_REPLAY_BATCH=int(os.environ.get('SPOOL_REPLAY_BATCH', 5000)),
+    SPOOL_REPLAY_INTERVAL=float(os.environ.get('SPOOL_REPLAY_INTERVAL', 2)),
+    TOKEN_CACHE_SIZE=int(os.environ.get('TOKEN_CACHE_SIZE', 10000)),
+    TOKEN_CACHE_MAX_TTL=float(os.environ.get('TOKEN_CACHE_MAX_TTL', 900)),
+    # Live dashboard events; each subscriber holds a worker thread for the life of its stream
+    EVENTS_ENABLED=os.environ.get('EVENTS_ENABLED', 'true').lower() == 'true',
+    EVENTS_MAX_SUBSCRIBERS=int(os.environ.get('EVENTS_MAX_SUBSCRIBERS', 200)),
+    EVENTS_BUFFER_SIZE=int(os.environ.get('EVENTS_BUFFER_SIZE', 256)),
+    EVENTS_HEARTBEAT_INTERVAL=float(os.environ.get('EVENTS_HEARTBEAT_INTERVAL', 15)),
+    # EventSource cannot send headers, so the dashboard opens its stream with a ticket this short-lived
+    EVENTS_TICKET_TTL=int(os.environ.get('EVENTS_TICKET_TTL', 30)),
+    # Rows fetched per server-side cursor round trip when streaming exports
+    EXPORT_CHUNK_SIZE=int(os.environ.get('EXPORT_CHUNK_SIZE', 2000)),
+    # Classroom image preprocessing runs in a per-worker process pool
+    IMAGE_POOL_WORKERS=int(os.environ.get('IMAGE_POOL_WORKERS', 2)),
+    IMAGE_POOL_MAX_PENDING=int(os.environ.get('IMAGE_POOL_MAX_PENDING', 8)),
+    IMAGE_MAX_SIDE=int(os.environ.get('IMAGE_MAX_SIDE', 640)),
+    IMAGE_SYNC_TIMEOUT=float(os.environ.get('IMAGE_SYNC_TIMEOUT', 10)),
+    # Uploads this large are processed as async jobs unless the client asks for mode=sync
+    IMAGE_ASYNC_BYTES=int(os.environ.get('IMAGE_ASYNC_BYTES', 2 * 1024 * 1024)),
+    IMAGE_JOBS_PATH=os.environ.get('IMAGE_JOBS_PATH', os.path.join(STATE_DIR, 'image_jobs.db')),
+    IMAGE_JOB_TTL=float(os.environ.get('IMAGE_JOB_TTL', 3600)),
+    # Online-class sessions live in one worker's memory; enabling them requires a single worker per host
+    ONLINE_SESSIONS_ENABLED=os.environ.get('ONLINE_SESSIONS_ENABLED', 'true').lower() == 'true',
+    ONLINE_HOST_LOCK_WAIT=float(os.environ.get('ONLINE_HOST_LOCK_WAIT', 20)),
+    # Online classes: REQUIRED confirmations, at least INTERVAL seconds apart, within WINDOW seconds
+    ONLINE_REQUIRED_CONFIRMATIONS=int(os.environ.get('ONLINE_REQUIRED_CONFIRMATIONS', 5)),
+    ONLINE_CONFIRM_INTERVAL=float(os.environ.get('ONLINE_CONFIRM_INTERVAL', 45)),
+    ONLINE_WINDOW_SECONDS=float(os.environ.get('ONLINE_WINDOW_SECONDS', 360)),
+    ONLINE_MIN_CONFIDENCE=float(os.environ.get('ONLINE_MIN_CONFIDENCE', 0.8)),
+    ONLINE_BATCH_SIZE=int(os.environ.get('ONLINE_BATCH_SIZE', 500)),
+    ONLINE_FLUSH_INTERVAL=float(os.environ.get('ONLINE_FLUSH_INTERVAL', 1)),
+    ONLINE_IDLE_TIMEOUT=float(os.environ.get('ONLINE_IDLE_TIMEOUT', 900)),
+    ONLINE_MAX_SESSIONS=int(os.environ.get('ONLINE_MAX_SESSIONS', 1000)),
+    # Each worker writes its metrics here so /metrics can report every worker on the host
+    METRICS_DIR=os.environ.get('METRICS_DIR', os.path.join(STATE_DIR, 'metrics')),
+    METRICS_DUMP_INTERVAL=float(os.environ.get('METRICS_DUMP_INTERVAL', 5)),
+    HEALTH_REFRESH_INTERVAL=float(os.environ.get('HEALTH_REFRESH_INTERVAL', 10)),
+    # Statement tracing: slow-query log, repeated-statement (N+1) warnings and optional plan capture
+    SQL_TRACE_ENABLED=os.environ.get('SQL_TRACE_ENABLED', 'true').lower() == 'true',
+    SQL_SLOW_QUERY_MS=float(os.environ.get('SQL_SLOW_QUERY_MS', 200)),
+    SQL_EXPLAIN_SLOW=os.environ.get('SQL_EXPLAIN_SLOW', 'false').lower() == 'true',
+    SQL_EXPLAIN_INTERVAL=float(os.environ.get('SQL_EXPLAIN_INTERVAL', 60)),
+    SQL_REPEAT_THRESHOLD=int(os.environ.get('SQL_REPEAT_THRESHOLD', 10)),
+    SQL_TRACE_HEADER=os.environ.get('SQL_TRACE_HEADER', 'false').lower() == 'true',
+    # JSON responses at least this large are gzip or brotli encoded when the client accepts it
+    RESPONSE_COMPRESS_MIN_BYTES=int(os.environ.get('RESPONSE_COMPRESS_MIN_BYTES', 1024)),
+    RESPONSE_GZIP_LEVEL=int(os.environ.get('RESPONSE_GZIP_LEVEL', 5)),
+    RESPONSE_BROTLI_QUALITY=int(os.environ.get('RESPONSE_BROTLI_QUALITY', 4)),
+    # Static files are served from memory and checked against the disk at most every RECHECK seconds
+    STATIC_CACHE_MAX_BYTES=int(os.environ.get('STATIC_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+    STATIC_MAX_FILE_BYTES=int(os.environ.get('STATIC_MAX_FILE_BYTES', 2 * 1024 * 1024)),
+    STATIC_RECHECK_INTERVAL=float(os.environ.get('STATIC_RECHECK_INTERVAL', 30)),
+    # 0 sends Cache-Control: no-cache, so browsers revalidate and get a 304 while the file is unchanged
+    STATIC_MAX_AGE=int(os.environ.get('STATIC_MAX_AGE', 0)),
+    STATIC_GZIP_LEVEL=int(os.environ.get('STATIC_GZIP_LEVEL', 9)),
+    # Students already recorded per class are kept in memory until GRACE seconds after the class ends
+    SEEN_SCANS_ENABLED=os.environ.get('SEEN_SCANS_ENABLED', 'true').lower() == 'true',
+    SEEN_SCANS_GRACE=float(os.environ.get('SEEN_SCANS_GRACE', 900)),
+    SEEN_SCANS_DEFAULT_TTL=float(os.environ.get('SEEN_SCANS_DEFAULT_TTL', 4 * 3600)),
+    SEEN_SCANS_MAX_SCHEDULES=int(os.environ.get('SEEN_SCANS_MAX_SCHEDULES', 2000)),
+    # Repeats of a tag from the same reader within this many seconds are answered as duplicates
+    READER_DEBOUNCE_SECONDS=float(os.environ.get('READER_DEBOUNCE_SECONDS', 5)),
+    # Term reports are built in one pass per term and reused for TTL seconds
+    REPORT_CACHE_TTL=float(os.environ.get('REPORT_CACHE_TTL', 300)),
+    REPORT_CACHE_SIZE=int(os.environ.get('REPORT_CACHE_SIZE', 8)),
+    REPORT_DEFAULTER_THRESHOLD=float(os.environ.get('REPORT_DEFAULTER_THRESHOLD', 75)),
+    # Logins: bcrypt checks in a bounded thread pool, repeat logins served from memory for CACHE_TTL seconds
+    LOGIN_HASH_THREADS=int(os.environ.get('LOGIN_HASH_THREADS', 4)),
+    LOGIN_HASH_MAX_PENDING=int(os.environ.get('LOGIN_HASH_MAX_PENDING', 64)),
+    LOGIN_HASH_TIMEOUT=float(os.environ.get('LOGIN_HASH_TIMEOUT', 10)),
+    LOGIN_CACHE_TTL=float(os.environ.get('LOGIN_CACHE_TTL', 900)),
+    LOGIN_CACHE_SIZE=int(os.environ.get('LOGIN_CACHE_SIZE', 10000)),
+    LAST_LOGIN_FLUSH_INTERVAL=float(os.environ.get('LAST_LOGIN_FLUSH_INTERVAL', 10)),
 )
 
 # Database configuration with better error handling
@@ -37,33 +165,334 @@ DB_CONFIG = {
     'user': os.environ.get('DB_USER') or os.environ.get('DATABASE_USER', 'postgres'),
     'password': os.environ.get('DB_PASSWORD') or os.environ.get('DATABASE_PASSWORD', 'password'),
     'port': int(os.environ.get('DB_PORT') or os.environ.get('DATABASE_PORT', 5432)),
-    'sslmode': 'require'
+    'sslmode': os.environ.get('DB_SSLMODE', 'require')
 }
 
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+sql_trace.configure(
+    enabled=app.config['SQL_TRACE_ENABLED'],
+    slow_ms=app.config['SQL_SLOW_QUERY_MS'],
+    explain=app.config['SQL_EXPLAIN_SLOW'],
+    explain_interval=app.config['SQL_EXPLAIN_INTERVAL'],
+    repeat_threshold=app.config['SQL_REPEAT_THRESHOLD'],
+)
+
+db_pool.configure(
+    dict(DB_CONFIG, cursor_factory=sql_trace.TracingCursor),
+    minconn=app.config['DB_POOL_MIN'],
+    maxconn=app.config['DB_POOL_MAX'],
+    timeout=app.config['DB_POOL_TIMEOUT'],
+    healthcheck_interval=app.config['DB_POOL_HEALTHCHECK_INTERVAL'],
+    retry_backoff=app.config['DB_POOL_RETRY_BACKOFF'],
+)
+# Under gunicorn's gevent worker (gunicorn_gevent.conf.py) a query suspends only its own request
+db_pool.enable_green_waits()
+
+# Active students by RFID tag, loaded once per worker and kept fresh via LISTEN/NOTIFY
+student_index = rfid_index.RFIDIndex(
+    DB_CONFIG,
+    refresh_interval=app.config['RFID_INDEX_REFRESH_INTERVAL'],
+)
+
+def resolve_known_students(rfid_tags):
+    """Resolve tags from the RFID index, or None to fall back to SQL"""
+    return student_index.resolve(rfid_tags) if student_index.ready else None
+
+def class_end(schedule_id):
+    """When a class ends today according to the timetable cache, or None if unknown"""
+    row = timetable_cache.get(int(schedule_id)) if timetable_cache.ready else None
+    if not row:
+        return None
+    return datetime.fromisoformat(f"{datetime.now().date().isoformat()}T{row['end_time']}")
+
+recorded_scans = None
+if app.config['SEEN_SCANS_ENABLED']:
+    recorded_scans = seen_scans.SeenScans(
+        class_end=class_end,
+        grace=app.config['SEEN_SCANS_GRACE'],
+        default_ttl=app.config['SEEN_SCANS_DEFAULT_TTL'],
+        max_schedules=app.config['SEEN_SCANS_MAX_SCHEDULES'],
+        debounce_window=app.config['READER_DEBOUNCE_SECONDS'],
+    )
+
+scan_spool_store = None
+if app.config['SPOOL_ENABLED']:
+    scan_spool_store = scan_spool.ScanSpool(
+        app.config['SPOOL_PATH'],
+        replay_batch=app.config['SPOOL_REPLAY_BATCH'],
+        replay_interval=app.config['SPOOL_REPLAY_INTERVAL'],
+    )
+
+# Write-behind queue for streamed scans, drained by one writer thread per worker
+scan_writer = scan_ingest.ScanWriter(
+    max_queue=app.config['INGEST_QUEUE_SIZE'],
+    batch_size=app.config['INGEST_BATCH_SIZE'],
+    flush_interval=app.config['INGEST_FLUSH_INTERVAL'],
+    resolve_people=resolve_known_students,
+    spool=scan_spool_store,
+    seen=recorded_scans,
+)
+
+# Weekly timetable, rebuilt when schedule, section or classroom rows change
+timetable_cache = timetable.Timetable(
+    DB_CONFIG,
+    refresh_interval=app.config['TIMETABLE_REFRESH_INTERVAL'],
+    early_minutes=app.config['TIMETABLE_EARLY_MINUTES'],
+)
+
+# Shared fan-out of attendance events to dashboard streams, fed by one LISTEN per worker
+event_hub = event_stream.EventHub(
+    DB_CONFIG,
+    max_subscribers=app.config['EVENTS_MAX_SUBSCRIBERS'],
+    buffer_size=app.config['EVENTS_BUFFER_SIZE'],
+    heartbeat_interval=app.config['EVENTS_HEARTBEAT_INTERVAL'],
+)
+
+# Decode and preprocessing of classroom images, off the request threads
+image_pool = image_pipeline.ImagePool(
+    max_workers=app.config['IMAGE_POOL_WORKERS'],
+    max_pending=app.config['IMAGE_POOL_MAX_PENDING'],
+    max_side=app.config['IMAGE_MAX_SIDE'],
+    jobs=image_pipeline.JobStore(app.config['IMAGE_JOBS_PATH'], ttl=app.config['IMAGE_JOB_TTL']),
+)
+
+# Face confirmation state for this worker's online classes
+online_engine = online_sessions.SessionEngine(
+    required=app.config['ONLINE_REQUIRED_CONFIRMATIONS'],
+    window=app.config['ONLINE_WINDOW_SECONDS'],
+    confirm_interval=app.config['ONLINE_CONFIRM_INTERVAL'],
+    min_confidence=app.config['ONLINE_MIN_CONFIDENCE'],
+    batch_size=app.config['ONLINE_BATCH_SIZE'],
+    flush_interval=app.config['ONLINE_FLUSH_INTERVAL'],
+    idle_timeout=app.config['ONLINE_IDLE_TIMEOUT'],
+    max_sessions=app.config['ONLINE_MAX_SESSIONS'],
+)
+if app.config['ONLINE_SESSIONS_ENABLED']:
+    # A second worker fails to boot here rather than answering other workers' meetings with 404
+    online_engine.claim_host(os.path.join(STATE_DIR, 'online_sessions.lock'),
+                             wait=app.config['ONLINE_HOST_LOCK_WAIT'])
+
+request_metrics = metrics.Registry()
+health_monitor = health.HealthMonitor(interval=app.config['HEALTH_REFRESH_INTERVAL'])
+
+term_reports = report_engine.ReportCache(
+    ttl=app.config['REPORT_CACHE_TTL'],
+    max_entries=app.config['REPORT_CACHE_SIZE'],
+)
+
+password_pool = logins.PasswordPool(
+    max_workers=app.config['LOGIN_HASH_THREADS'],
+    max_pending=app.config['LOGIN_HASH_MAX_PENDING'],
+)
+login_cache = logins.CredentialCache(ttl=app.config['LOGIN_CACHE_TTL'], max_entries=app.config['LOGIN_CACHE_SIZE'])
+last_logins = logins.LastLoginWriter(flush_interval=app.config['LAST_LOGIN_FLUSH_INTERVAL'])
+
+# send_from_directory('.') resolves against the app root, so the cache does too
+static_files = static_assets.StaticAssets(
+    app.root_path,
+    max_file_bytes=app.config['STATIC_MAX_FILE_BYTES'],
+    max_total_bytes=app.config['STATIC_CACHE_MAX_BYTES'],
+    recheck_interval=app.config['STATIC_RECHECK_INTERVAL'],
+    max_age=app.config['STATIC_MAX_AGE'],
+    gzip_level=app.config['STATIC_GZIP_LEVEL'],
+    # The old default state location, and the current one if STATE_DIR was pointed inside the app
+    private_dirs=(os.path.join(app.root_path, 'spool'), STATE_DIR),
+)
+
+def component_stats():
+    """In-memory stats of this worker's pools, caches and background writers"""
+    return {
+        'db_pool': db_pool.pool_stats(),
+        'rfid_index': student_index.stats(),
+        'timetable': timetable_cache.stats(),
+        'ingest': scan_writer.stats(),
+        'spool': scan_spool_store.stats() if scan_spool_store else None,
+        'token_cache': verified_tokens.stats(),
+        'events': event_hub.stats(),
+        'image_pool': image_pool.stats(),
+        'online_sessions': online_engine.stats(),
+        'health': health_monitor.stats(),
+        'sql_trace': sql_trace.stats(),
+        'static_files': static_files.stats(),
+        'seen_scans': recorded_scans.stats() if recorded_scans else None,
+        'term_reports': term_reports.stats(),
+        'password_pool': password_pool.stats(),
+        'login_cache': login_cache.stats(),
+        'last_login': last_logins.stats(),
+    }
+
+metrics_exporter = metrics.MetricsExporter(
+    request_metrics,
+    app.config['METRICS_DIR'],
+    interval=app.config['METRICS_DUMP_INTERVAL'],
+    gauges=component_stats,
+)
+
+def publish_attendance(cursor, schedule_id, records):
+    """Announce newly written attendance to live dashboards when the write commits"""
+    if not app.config['EVENTS_ENABLED']:
+        return
+    schedule = timetable_cache.get(int(schedule_id)) if timetable_cache.ready else None
+    if schedule:
+        section_id = schedule['section_id']
+    else:
+        cursor.execute('SELECT section_id FROM schedule WHERE schedule_id = %s', (schedule_id,))
+        row = cursor.fetchone()
+        section_id = row[0] if row else None
+    event_stream.notify_recorded(cursor, schedule_id, section_id, records)
+
+attendance_batch.add_record_hook(publish_attendance)
 
 def get_db_connection():
-    """Get database connection with proper error handling"""
-    try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection error: {e}")
+    """Borrow a pooled database connection for the current request"""
+    conn = g.get('db_conn')
+    if conn is None:
+        conn = db_pool.borrow()
+        if conn is not None:
+            g.db_conn = conn
+    return conn
+
+@app.teardown_appcontext
+def release_db_connection(exc):
+    """Return the request's connection to the pool"""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        db_pool.release(conn)
+
+@app.before_request
+def start_worker_caches():
+    """Start per-worker caches on the first request after fork"""
+    if app.config['RFID_INDEX_ENABLED']:
+        student_index.ensure_started()
+    if app.config['TIMETABLE_ENABLED']:
+        timetable_cache.ensure_started()
+    if scan_spool_store:
+        scan_spool_store.ensure_started(resolve_known_students)
+    if app.config['EVENTS_ENABLED']:
+        event_hub.ensure_started()
+    if app.config['ONLINE_SESSIONS_ENABLED']:
+        online_engine.ensure_started()
+    last_logins.ensure_started()
+    health_monitor.ensure_started()
+    metrics_exporter.ensure_started()
+
+@app.before_request
+def start_request_timer():
+    """Start latency and DB time accounting for this request"""
+    g.request_started = time.perf_counter()
+    g.request_recorded = False
+    metrics.start_request()
+    sql_trace.start_request()
+
+@app.after_request
+def record_request_metrics(response):
+    record_request(response.status_code)
+    summary = sql_trace.finish_request(request_endpoint())
+    if summary and (app.debug or app.config['SQL_TRACE_HEADER']):
+        response.headers.update(sql_trace.summary_headers(summary))
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Negotiate gzip or brotli for large JSON responses (runs before the metrics hook)"""
+    return serialization.compress_response(
+        response, request.accept_encodings,
+        min_size=app.config['RESPONSE_COMPRESS_MIN_BYTES'],
+        gzip_level=app.config['RESPONSE_GZIP_LEVEL'],
+        brotli_quality=app.config['RESPONSE_BROTLI_QUALITY'],
+    )
+
+@app.teardown_request
+def record_failed_request(exc):
+    if exc is not None:
+        record_request(500)
+        sql_trace.finish_request(request_endpoint())
+
+def request_endpoint():
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+def record_request(status):
+    """Observe latency, DB time and Python time once per request"""
+    started = g.get('request_started')
+    if started is None or g.get('request_recorded'):
+        return
+    g.request_recorded = True
+    elapsed = time.perf_counter() - started
+    db_time = min(metrics.request_db_time(), elapsed)
+    endpoint = request_endpoint()
+    request_metrics.observe('http_request_duration_seconds', (
+        ('endpoint', endpoint), ('method', request.method), ('status', str(status))
+    ), elapsed)
+    request_metrics.observe('http_request_db_seconds', (('endpoint', endpoint),), db_time)
+    request_metrics.inc('http_request_python_seconds_total', (('endpoint', endpoint),), elapsed - db_time)
+
+def schedule_exists(schedule_id):
+    """Whether a schedule row exists, from the timetable cache when loaded; None if the database is down"""
+    if timetable_cache.ready:
+        return timetable_cache.get(schedule_id) is not None
+    conn = get_db_connection()
+    if not conn:
+        return None
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM schedule WHERE schedule_id = %s", (schedule_id,))
+    found = cursor.fetchone() is not None
+    cursor.close()
+    return found
+
+def find_active_class(classroom_id=None, room_number=None, at=None):
+    """Resolve the class running in a room, from the timetable cache when loaded"""
+    at = at or datetime.now()
+    if timetable_cache.ready:
+        if classroom_id is None:
+            classroom_id = timetable_cache.classroom_id_for(room_number)
+        return timetable_cache.active_in_room(classroom_id, at)
+
+    conn = get_db_connection()
+    if not conn:
         return None
+    cursor = conn.cursor()
+    # The same candidate rows and the same choice among them as the cache
+    active_class = timetable_cache.query_active_in_room(cursor, classroom_id, room_number, at)
+    cursor.close()
+    return active_class
+
+# Verified token claims, so polling clients skip the HMAC check on repeat calls
+verified_tokens = token_cache.TokenCache(
+    app.config['SECRET_KEY'],
+    max_entries=app.config['TOKEN_CACHE_SIZE'],
+    max_ttl=app.config['TOKEN_CACHE_MAX_TTL'],
+)
+
+# Audience of event-stream tickets; login tokens carry none, so neither is accepted in place of the other
+EVENTS_TICKET_AUDIENCE = 'attendance-events'
+
+def authenticate(token, audience=None):
+    """Verify a bearer token and expose its claims on flask.g; returns an error response or None"""
+    if not token:
+        return jsonify({'message': 'Token is missing'}), 401
+    if token.startswith('Bearer '):
+        token = token[7:]
+    try:
+        if audience:
+            # Tickets are minted per connection, so caching them would only evict login tokens
+            claims = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'],
+                                audience=audience, options={'require': ['exp', 'aud']})
+        else:
+            claims = verified_tokens.verify(token)
+    except jwt.ExpiredSignatureError:
+        return jsonify({'message': 'Token has expired'}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({'message': 'Token is invalid'}), 401
+    g.current_user = claims
+    g.user_id = claims.get('user_id')
+    g.role = claims.get('role')
+    return None
 
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({'message': 'Token is missing'}), 401
-        try:
-            if token.startswith('Bearer '):
-                token = token[7:]
-            # Simple token validation for now
-            pass
-        except:
-            return jsonify({'message': 'Token is invalid'}), 401
+        error = authenticate(request.headers.get('Authorization'))
+        if error:
+            return error
         return f(*args, **kwargs)
     return decorated
 
@@ -78,50 +507,45 @@ def login():
         if not username or not password:
             return jsonify({'success': False, 'message': 'Username and password required'}), 400
 
-        # Try database authentication first
-        conn = get_db_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT u.id, u.username, u.role, p.name
-                    FROM users u
-                    LEFT JOIN persons p ON u.person_id = p.person_id
-                    WHERE u.username = %s AND u.password = %s
-                """, (username, password))
-                
-                user_result = cursor.fetchone()
-                if user_result:
-                    user_id, username, role, name = user_result
-                    token = jwt.encode({
-                        'user_id': user_id,
-                        'username': username,
-                        'role': role,
-                        'exp': datetime.utcnow() + timedelta(hours=24)
-                    }, app.config['SECRET_KEY'], algorithm='HS256')
-                    
-                    cursor.execute("UPDATE users SET last_login = %s WHERE id = %s",
-                                 (datetime.utcnow(), user_id))
-                    conn.commit()
-                    cursor.close()
-                    conn.close()
-                    
-                    return jsonify({
-                        'success': True,
-                        'token': token,
-                        'user': {
-                            'username': username,
-                            'role': role,
-                            'name': name or username
-                        }
-                    })
-                    
-                cursor.close()
-                conn.close()
-            except Exception as e:
-                logger.error(f"Database authentication error: {e}")
+        # Try database authentication first; a repeat login with the same password skips it
+        user_result = login_cache.get(username, password)
+        if user_result is None:
+            credentials = None
+            # The connection goes back to the pool before the (slow) hash check
+            with db_pool.db_connection() as conn:
                 if conn:
-                    conn.close()
+                    try:
+                        cursor = conn.cursor()
+                        cursor.execute(logins.CREDENTIALS_SQL, (username,))
+                        credentials = cursor.fetchone()
+                        cursor.close()
+                    except Exception as e:
+                        logger.error(f"Database authentication error: {e}")
+            if credentials and password_pool.check(password, credentials[4], timeout=app.config['LOGIN_HASH_TIMEOUT']):
+                user_result = credentials[:4]
+                login_cache.put(username, password, user_result)
+
+        if user_result:
+            user_id, username, role, name = user_result
+            token = jwt.encode({
+                'user_id': user_id,
+                'username': username,
+                'role': role,
+                'exp': datetime.utcnow() + timedelta(hours=24)
+            }, app.config['SECRET_KEY'], algorithm='HS256')
+
+            # Written with other logins in the next batch
+            last_logins.touch(user_id)
+
+            return jsonify({
+                'success': True,
+                'token': token,
+                'user': {
+                    'username': username,
+                    'role': role,
+                    'name': name or username
+                }
+            })
 
         # Fallback to local authentication
         local_users = [
@@ -148,16 +572,33 @@ def login():
                 })
         
         return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
-        
+
+    except logins.PoolBusy:
+        return jsonify({
+            'success': False,
+            'message': 'Too many logins in progress, retry shortly'
+        }), 503, {'Retry-After': '1'}
+    except FutureTimeout:
+        return jsonify({'success': False, 'message': 'Login timed out, retry shortly'}), 503, {'Retry-After': '1'}
     except Exception as e:
         logger.error(f"Login error: {e}")
         return jsonify({'success': False, 'message': 'Server error'}), 500
 
+SCHEDULE_COLUMNS = ('schedule_id', 'section_id', 'subject_name', 'class_type', 'class_name',
+                    'room_number', 'teacher_name', 'start_time', 'end_time')
+
 @app.route('/faculty/schedules', methods=['GET'])
 @token_required
 def get_schedules():
     """Get schedules with fallback data"""
     try:
+        if timetable_cache.ready:
+            today = datetime.now().date()
+            return jsonify([
+                dict(row, date=today)
+                for row in timetable_cache.for_day(datetime.now().strftime('%A'))
+            ])
+
         conn = get_db_connection()
         if not conn:
             # Return sample data if database unavailable
@@ -188,8 +629,8 @@ def get_schedules():
                 s.section_name,
                 c.room_number,
                 p.name as teacher_name,
-                sc.start_time,
-                sc.end_time
+                sc.start_time::text,
+                sc.end_time::text
             FROM schedule sc
             JOIN sections s ON sc.section_id = s.section_id
             JOIN classrooms c ON sc.classroom_id = c.classroom_id
@@ -198,29 +639,41 @@ def get_schedules():
             ORDER BY sc.start_time
         """, (current_day,))
         
-        schedules = []
-        for row in cursor.fetchall():
-            schedules.append({
-                'schedule_id': row[0],
-                'section_id': row[1],
-                'subject_name': row[2],
-                'class_type': row[3],
-                'class_name': row[4],
-                'room_number': row[5],
-                'teacher_name': row[6],
-                'start_time': str(row[7]),
-                'end_time': str(row[8]),
-                'date': datetime.now().date()
-            })
+        today = datetime.now().date()
+        schedules = [dict(zip(SCHEDULE_COLUMNS, row), date=today) for row in cursor.fetchall()]
         
         cursor.close()
-        conn.close()
         return jsonify(schedules)
         
     except Exception as e:
         logger.error(f"Get schedules error: {e}")
         return jsonify([])
 
+@app.route('/schedule/active', methods=['GET'])
+@token_required
+def get_active_class():
+    """Class currently running in a classroom"""
+    try:
+        classroom_id = request.args.get('classroom_id', type=int)
+        room_number = request.args.get('room_number')
+        if classroom_id is None and not room_number:
+            return jsonify({'success': False, 'error': 'Missing classroom_id or room_number'}), 400
+
+        at = request.args.get('at')
+        at = datetime.fromisoformat(at) if at else datetime.now()
+
+        active_class = find_active_class(classroom_id, room_number, at)
+        if not active_class:
+            return jsonify({'success': False, 'error': 'No class scheduled in this room'}), 404
+
+        return jsonify({'success': True, 'schedule': dict(active_class, date=at.date())})
+
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Active class error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/faculty/bulk-attendance', methods=['POST'])
 @token_required
 def bulk_attendance():
@@ -228,105 +681,232 @@ def bulk_attendance():
     try:
         data = request.json
         schedule_id = data.get('schedule_id')
+        classroom_id = data.get('classroom_id')
+        room_number = data.get('room_number')
         attendance_data = data.get('attendance_data', [])
         
-        if not schedule_id or not attendance_data:
+        if not (schedule_id or classroom_id or room_number) or not attendance_data:
             return jsonify({'success': False, 'error': 'Missing schedule_id or attendance_data'}), 400
 
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+        scans = attendance_batch.parse_scans(attendance_data)
 
-        cursor = conn.cursor()
-        results = {
-            'successful': 0,
-            'failed': 0,
-            'duplicates': 0,
-            'attendance_records': []
-        }
+        if not schedule_id:
+            # Readers that only know their room are credited to the class running at the first scan
+            active_class = find_active_class(classroom_id, room_number, min(ts for _, ts in scans))
+            if not active_class:
+                return jsonify({'success': False, 'error': 'No class scheduled in this room at scan time'}), 404
+            schedule_id = active_class['schedule_id']
+        # Readers resend a tag while it is held to the antenna; repeats within the window never reach the database
+        reader = data.get('reader_id') or request.remote_addr
+        repeated = []
+        if recorded_scans:
+            scans, repeated = recorded_scans.debounce(reader, schedule_id, scans)
 
-        for item in attendance_data:
-            rfid_tag = item['rfid_tag']
-            timestamp = datetime.fromisoformat(item.get('timestamp', datetime.now().isoformat()))
-            
-            # Find person by RFID
-            cursor.execute("""
-                SELECT p.person_id, p.name, p.id_number
-                FROM persons p
-                WHERE p.rfid_tag = %s AND p.status = 'active' AND p.role = 'student'
-            """, (rfid_tag,))
-            
-            person_result = cursor.fetchone()
-            if not person_result:
-                results['failed'] += 1
-                continue
-                
-            person_id, name, id_number = person_result
-            
-            # Check for duplicate
-            cursor.execute("""
-                SELECT attendance_id FROM attendance 
-                WHERE schedule_id = %s AND person_id = %s
-            """, (schedule_id, person_id))
-            
-            if cursor.fetchone():
-                results['duplicates'] += 1
-                continue
-            
-            # Mark attendance
-            cursor.execute("""
-                INSERT INTO attendance 
-                (schedule_id, person_id, rfid_tag, status, method, confidence_score, location, notes, timestamp)
-                VALUES (%s, %s, %s, 'present', 'rfid', %s, 'classroom', %s, %s)
-            """, (schedule_id, person_id, rfid_tag, 1.0, f"RFID scan: {rfid_tag}", timestamp))
-            
-            results['successful'] += 1
-            results['attendance_records'].append({
-                'person_id': person_id,
-                'name': name,
-                'id_number': id_number,
-                'rfid_tag': rfid_tag,
-                'timestamp': timestamp,
-                'method': 'rfid'
-            })
+        people = None
+        if student_index.ready:
+            people = student_index.resolve([rfid_tag for rfid_tag, _ in scans])
+        known = recorded_scans.known(schedule_id) if recorded_scans else None
 
-        conn.commit()
-        cursor.close()
-        conn.close()
+        if not scans or (people is not None and (not people or (
+                known is not None and all(person[0] in known for person in people.values())))):
+            # Only unknown tags or students already recorded for this class, so there is nothing to write
+            results = attendance_batch.record_rfid_batch(None, schedule_id, scans, people, known)
+            if recorded_scans:
+                recorded_scans.count(results['known_duplicates'], without_db=True)
+        else:
+            conn = get_db_connection()
+            if not conn:
+                if scan_spool_store:
+                    return spool_scans(schedule_id, scans)
+                return jsonify({'success': False, 'error': 'Database connection failed'}), 500
 
-        # Format response
-        response = {
+            try:
+                cursor = conn.cursor()
+                if recorded_scans:
+                    known = recorded_scans.warm(cursor, schedule_id)
+                results = attendance_batch.record_rfid_batch(cursor, schedule_id, scans, people, known)
+
+                conn.commit()
+                cursor.close()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                if not scan_spool_store:
+                    raise
+                logger.error(f"Bulk attendance write failed, spooling: {e}")
+                return spool_scans(schedule_id, scans)
+            if recorded_scans:
+                recorded_scans.add(schedule_id, results['present_person_ids'])
+                recorded_scans.count(results['known_duplicates'])
+
+        if recorded_scans:
+            recorded_scans.remember(reader, schedule_id, scans)
+        results['duplicates'] += len(repeated)
+
+        for outcome in ('successful', 'duplicates', 'failed'):
+            request_metrics.inc('attendance_bulk_rows_total', (('outcome', outcome),), results[outcome])
+
+        return jsonify({
             'success': True,
-            'results': [],
+            'results': serialization.bulk_results(results['attendance_records']),
             'summary': {
                 'total': len(attendance_data),
                 'successful': results['successful'],
                 'duplicates': results['duplicates'],
                 'failed': results['failed']
             }
+        })
+
+    except Exception as e:
+        logger.error(f"Bulk attendance error: {traceback.format_exc()}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def spool_scans(schedule_id, scans):
+    """Accept scans into the local spool while the database is unreachable"""
+    scan_spool_store.append([(schedule_id, rfid_tag, timestamp) for rfid_tag, timestamp in scans])
+    return jsonify({
+        'success': True,
+        'spooled': True,
+        'results': [],
+        'summary': {
+            'total': len(scans),
+            'successful': 0,
+            'duplicates': 0,
+            'failed': 0,
+            'spooled': len(scans)
         }
+    }), 202
 
-        for record in results['attendance_records']:
-            response['results'].append({
-                'success': True,
-                'person_id': record['person_id'],
-                'name': record['name'],
-                'student': {
-                    'name': record['name'],
-                    'section': 'N/A'
-                },
-                'rfid_tag': record['rfid_tag'],
-                'timestamp': record['timestamp'].isoformat(),
-                'method': record['method'],
-                'isDuplicate': False
-            })
+@app.route('/ingest/scan', methods=['POST'])
+@token_required
+def ingest_scan():
+    """Queue a single RFID scan and acknowledge it once written"""
+    try:
+        item = request.json or {}
+        if not item.get('rfid_tag'):
+            return jsonify({'success': False, 'error': 'Missing rfid_tag'}), 400
 
-        return jsonify(response)
+        try:
+            ticket = queue_scan(item, request.args)
+        except scan_ingest.QueueFull:
+            return jsonify({'success': False, 'error': 'Ingest queue full, retry later'}), 429, {'Retry-After': '1'}
+        if ticket is None:
+            return jsonify({'success': False, 'error': 'No class scheduled in this room at scan time'}), 404
+
+        wait = request.args.get('wait', 'true').lower() != 'false'
+        if not wait or not ticket.wait(app.config['INGEST_ACK_TIMEOUT']):
+            return jsonify({'success': True, 'ack': ticket.to_ack()}), 202
+        if ticket.status == 'error':
+            return jsonify({'success': False, 'ack': ticket.to_ack()}), 503
+        return jsonify({'success': True, 'ack': ticket.to_ack()})
 
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Bulk attendance error: {traceback.format_exc()}")
+        logger.error(f"Ingest scan error: {traceback.format_exc()}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/ingest/stream', methods=['POST'])
+@token_required
+def ingest_stream():
+    """Queue NDJSON scans from a streamed or chunked upload, one ack line per scan"""
+    entries = []
+    throttled = False
+    for line_number, line in enumerate(request.stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if throttled:
+            entries.append((line_number, {'status': 'rejected', 'error': 'Ingest queue full'}))
+            continue
+        try:
+            item = json.loads(line)
+            ticket = queue_scan(item, request.args, block_timeout=app.config['INGEST_ENQUEUE_TIMEOUT'])
+            if ticket is None:
+                ticket = {'status': 'error', 'error': 'No class scheduled in this room at scan time'}
+            entries.append((line_number, ticket))
+        except scan_ingest.QueueFull:
+            throttled = True
+            entries.append((line_number, {'status': 'rejected', 'error': 'Ingest queue full'}))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            entries.append((line_number, {'status': 'invalid', 'error': str(e)}))
+
+    deadline = time.monotonic() + app.config['INGEST_ACK_TIMEOUT']
+
+    def generate():
+        for line_number, entry in entries:
+            if isinstance(entry, scan_ingest.ScanTicket):
+                entry.wait(max(0.0, deadline - time.monotonic()))
+                ack = entry.to_ack()
+            else:
+                ack = dict(entry)
+            ack['line'] = line_number
+            yield json.dumps(ack) + '\n'
+
+    headers = {'Retry-After': '1'} if throttled else {}
+    return Response(generate(), status=429 if throttled else 200,
+                    mimetype='application/x-ndjson', headers=headers)
+
+def queue_scan(item, defaults, block_timeout=0):
+    """Queue one scan object; None if its room has no class at scan time"""
+    rfid_tag = item['rfid_tag']
+    timestamp = datetime.fromisoformat(item.get('timestamp', datetime.now().isoformat()))
+
+    schedule_id = item.get('schedule_id') or defaults.get('schedule_id')
+    if schedule_id:
+        # A bad id would otherwise only surface in the writer, inside a batch shared with other readers
+        schedule_id = int(schedule_id)
+        if timetable_cache.ready and timetable_cache.get(schedule_id) is None:
+            raise ValueError(f'Unknown schedule_id {schedule_id}')
+    else:
+        classroom_id = item.get('classroom_id') or defaults.get('classroom_id', type=int)
+        room_number = item.get('room_number') or defaults.get('room_number')
+        if not (classroom_id or room_number):
+            raise ValueError('Missing schedule_id, classroom_id or room_number')
+        active_class = find_active_class(classroom_id, room_number, timestamp)
+        if not active_class:
+            return None
+        schedule_id = active_class['schedule_id']
+
+    scan_writer.ensure_started()
+    return scan_writer.submit(schedule_id, rfid_tag, timestamp, block_timeout=block_timeout)
+
+@app.route('/events/ticket', methods=['POST'])
+@token_required
+def attendance_events_ticket():
+    """Issue a short-lived ticket that opens one event stream and nothing else"""
+    if not app.config['EVENTS_ENABLED']:
+        return jsonify({'success': False, 'error': 'Live events are disabled'}), 404
+    ttl = app.config['EVENTS_TICKET_TTL']
+    ticket = jwt.encode({
+        'user_id': g.user_id,
+        'username': g.current_user.get('username'),
+        'role': g.role,
+        'aud': EVENTS_TICKET_AUDIENCE,
+        'exp': datetime.utcnow() + timedelta(seconds=ttl)
+    }, app.config['SECRET_KEY'], algorithm='HS256')
+    return jsonify({'success': True, 'ticket': ticket, 'expires_in': ttl})
+
+@app.route('/events/attendance', methods=['GET'])
+def attendance_events():
+    """Server-Sent Events stream of attendance and per-section counts"""
+    # EventSource cannot set headers, so the dashboard passes a stream ticket, never its login token, in the URL
+    if request.headers.get('Authorization'):
+        error = authenticate(request.headers.get('Authorization'))
+    else:
+        error = authenticate(request.args.get('ticket'), audience=EVENTS_TICKET_AUDIENCE)
+    if error:
+        return error
+    if not app.config['EVENTS_ENABLED']:
+        return jsonify({'success': False, 'error': 'Live events are disabled'}), 404
+
+    subscriber = event_hub.subscribe()
+    if subscriber is None:
+        return jsonify({'success': False, 'error': 'Too many live dashboards, retry later'}), 503, {'Retry-After': '30'}
+
+    return Response(event_hub.stream(subscriber), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/attendance/proxy-check', methods=['POST'])
 @token_required
 def proxy_verification():
@@ -336,40 +916,105 @@ def proxy_verification():
             return jsonify({'success': False, 'error': 'No classroom image provided'}), 400
 
         file = request.files['image']
-        schedule_id = int(request.form.get('schedule_id'))
-        
+        schedule_id = request.form.get('schedule_id', type=int)
+
         if not file or not schedule_id:
             return jsonify({'success': False, 'error': 'Missing image or schedule_id'}), 400
 
-        # Save uploaded file temporarily
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        started = time.perf_counter()
+        data = file.read()
+        read_ms = round((time.perf_counter() - started) * 1000, 3)
+        if not data:
+            return jsonify({'success': False, 'error': 'Empty image'}), 400
 
-        # Mock response - in production would process image
-        result = {
-            'success': True,
-            'verification_completed': True,
-            'scanned_students': 5,
-            'verified_present': 4,
-            'proxy_detected': 1,
-            'verification_accuracy': 'High',
-            'details': [
-                {'person_id': 1, 'name': 'Student 1', 'verified_present': True},
-                {'person_id': 2, 'name': 'Student 2', 'verified_present': False}
-            ]
-        }
+        mode = request.form.get('mode') or request.args.get('mode')
+        if mode == 'async' or (mode != 'sync' and len(data) >= app.config['IMAGE_ASYNC_BYTES']):
+            job_id = image_pool.submit_job(data)
+            return jsonify({
+                'success': True,
+                'job_id': job_id,
+                'status': 'pending',
+                'poll_url': f'/attendance/proxy-check/jobs/{job_id}',
+                'pool': image_pool.stats()
+            }), 202
 
-        # Clean up
-        os.remove(filepath)
+        preprocessing = image_pool.submit(data).result(timeout=app.config['IMAGE_SYNC_TIMEOUT'])
+        preprocessing['timings']['read_ms'] = read_ms
+        preprocessing['timings']['total_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        result = proxy_check_result(preprocessing)
+        result['schedule_id'] = schedule_id
         return jsonify(result)
 
+    except image_pipeline.PoolBusy:
+        return jsonify({
+            'success': False,
+            'error': 'Image processing is busy, retry later',
+            'pool': image_pool.stats()
+        }), 503, {'Retry-After': '2'}
+    except image_pipeline.ImageError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except FutureTimeout:
+        return jsonify({'success': False, 'error': 'Image processing timed out, retry with mode=async'}), 504
     except Exception as e:
         logger.error(f"Proxy verification error: {traceback.format_exc()}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/attendance/proxy-check/jobs/<job_id>', methods=['GET'])
+@token_required
+def proxy_verification_job(job_id):
+    """Poll an async proxy-check job"""
+    try:
+        job = image_pool.jobs.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Job not found or expired'}), 404
+
+        if job['status'] == 'done':
+            result = proxy_check_result(job['result'])
+            result.update(job_id=job_id, status='done')
+            return jsonify(result)
+        if job['status'] == 'failed':
+            return jsonify({'success': False, 'job_id': job_id, 'status': 'failed', **job['result']})
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status': job['status'],
+            'age_seconds': job['age_seconds'],
+            'pool': image_pool.stats()
+        })
+
+    except Exception as e:
+        logger.error(f"Proxy job poll error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def proxy_check_result(preprocessing):
+    """Verification response around a preprocessed frame"""
+    # Mock verification - face matching is not wired in yet
+    return {
+        'success': True,
+        'verification_completed': True,
+        'scanned_students': 5,
+        'verified_present': 4,
+        'proxy_detected': 1,
+        'verification_accuracy': 'High',
+        'details': [
+            {'person_id': 1, 'name': 'Student 1', 'verified_present': True},
+            {'person_id': 2, 'name': 'Student 2', 'verified_present': False}
+        ],
+        'preprocessing': preprocessing,
+        'pool': image_pool.stats()
+    }
+
+def online_sessions_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not app.config['ONLINE_SESSIONS_ENABLED']:
+            return jsonify({'success': False, 'error': 'Online classes are disabled on this deployment'}), 503
+        return f(*args, **kwargs)
+    return decorated
+
 @app.route('/attendance/online-class', methods=['POST'])
 @token_required
+@online_sessions_required
 def start_online_attendance():
     """Start online class with multi-student support"""
     try:
@@ -379,12 +1024,26 @@ def start_online_attendance():
         
         if not schedule_id or not zoom_meeting_id:
             return jsonify({'success': False, 'error': 'Missing schedule_id or zoom_meeting_id'}), 400
+        if not str(schedule_id).isdigit():
+            return jsonify({'success': False, 'error': 'schedule_id must be an integer'}), 400
+        # Marks for a missing schedule would only fail later, in a write batch shared with other sessions
+        exists = schedule_exists(int(schedule_id))
+        if exists is None:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+        if not exists:
+            return jsonify({'success': False, 'error': f'Unknown schedule_id {schedule_id}'}), 404
+
+        session = online_engine.start_session(str(zoom_meeting_id), int(schedule_id))
+        required = app.config['ONLINE_REQUIRED_CONFIRMATIONS']
+        minutes = app.config['ONLINE_WINDOW_SECONDS'] / 60
 
         return jsonify({
             'success': True,
             'session_started': True,
             'zoom_meeting_id': zoom_meeting_id,
             'session_type': 'multi_student_face_recognition',
+            'session': session.summary(),
+            'frames_url': f'/attendance/online-class/{zoom_meeting_id}/frames',
             'features': {
                 'multiple_students_supported': True,
                 'max_faces_per_frame': 10,
@@ -394,15 +1053,75 @@ def start_online_attendance():
                 '✅ Multiple students can be in the same camera frame',
                 '1. Students join Zoom with video ON',
                 '2. Multiple faces detected and tracked simultaneously',
-                '3. Each student needs 5-6 confirmations over 6 minutes',
+                f'3. Each student needs {required} confirmations over {minutes:g} minutes',
                 '4. Attendance marked individually when validated'
             ]
         })
 
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+    except OverflowError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
     except Exception as e:
         logger.error(f"Online attendance error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/attendance/online-class/<meeting_id>/frames', methods=['POST'])
+@token_required
+@online_sessions_required
+def ingest_online_frames(meeting_id):
+    """Apply face detections from one or more frames of an online class"""
+    try:
+        data = request.json or {}
+        frames = data.get('frames') or [data]
+        marked = []
+        for frame in frames:
+            frame_time = parse_detection_time(frame.get('timestamp'))
+            detections = [
+                (int(item['person_id']), float(item['confidence']),
+                 parse_detection_time(item.get('timestamp')) or frame_time)
+                for item in frame.get('detections', [])
+            ]
+            marked.extend(online_engine.ingest(meeting_id, detections))
+
+        return jsonify({'success': True, 'frames': len(frames), 'marked': marked})
+
+    except KeyError as e:
+        if online_engine.get_session(meeting_id) is None:
+            return jsonify({'success': False, 'error': 'No online session for this meeting'}), 404
+        return jsonify({'success': False, 'error': f'Missing field: {e}'}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Online frame ingest error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def parse_detection_time(value):
+    """Epoch seconds or ISO-8601 to epoch seconds; None stays None"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return datetime.fromisoformat(value).timestamp()
+
+@app.route('/attendance/online-class/<meeting_id>', methods=['GET'])
+@token_required
+@online_sessions_required
+def get_online_session(meeting_id):
+    """Per-student confirmation progress for an online class"""
+    try:
+        return jsonify({'success': True, **online_engine.progress(meeting_id)})
+    except KeyError:
+        return jsonify({'success': False, 'error': 'No online session for this meeting'}), 404
+
+@app.route('/attendance/online-class/<meeting_id>', methods=['DELETE'])
+@token_required
+@online_sessions_required
+def end_online_session(meeting_id):
+    """Stop tracking an online class; marks already made are still written"""
+    session = online_engine.end_session(meeting_id)
+    if session is None:
+        return jsonify({'success': False, 'error': 'No online session for this meeting'}), 404
+    return jsonify({'success': True, 'session_ended': True, 'session': session.summary()})
+
 @app.route('/analytics/sections', methods=['GET'])
 @token_required
 def get_sections():
@@ -415,36 +1134,232 @@ def get_sections():
             ])
 
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT s.section_id, s.section_name, s.academic_year,
-                   COUNT(ss.person_id) as student_count
-            FROM sections s
-            LEFT JOIN student_sections ss ON s.section_id = ss.section_id
-            GROUP BY s.section_id, s.section_name, s.academic_year
-            ORDER BY s.section_name
-        """)
-        
-        sections = []
-        for row in cursor.fetchall():
-            sections.append({
-                'section_id': row[0],
-                'section_name': row[1],
-                'academic_year': row[2],
-                'student_count': row[3]
-            })
-        
+        sections = aggregates.section_rows(cursor)
         cursor.close()
-        conn.close()
         return jsonify(sections)
 
     except Exception as e:
         logger.error(f"Get sections error: {e}")
         return jsonify([])
 
-@app.route('/')
-def serve_index():
-    """Serve main index page"""
-    return render_template_string("""
+@app.route('/analytics/sections/<int:section_id>/daily', methods=['GET'])
+@token_required
+def get_section_daily(section_id):
+    """Per-day attendance rates for a section"""
+    try:
+        date_to = request.args.get('to', datetime.now().date().isoformat())
+        date_from = request.args.get('from', (datetime.fromisoformat(date_to) - timedelta(days=30)).date().isoformat())
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+
+        cursor = conn.cursor()
+        days = aggregates.section_daily(cursor, section_id, date_from, date_to)
+        cursor.close()
+        return jsonify({'success': True, 'section_id': section_id, 'from': date_from, 'to': date_to, 'days': days})
+
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid date: {e}'}), 400
+    except Exception as e:
+        logger.error(f"Section daily analytics error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/analytics/sections/<int:section_id>/subjects', methods=['GET'])
+@token_required
+def get_section_subjects(section_id):
+    """Per-subject attendance rates for a section"""
+    try:
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+
+        cursor = conn.cursor()
+        subjects = aggregates.section_subjects(cursor, section_id)
+        cursor.close()
+        return jsonify({'success': True, 'section_id': section_id, 'subjects': subjects})
+
+    except Exception as e:
+        logger.error(f"Section subject analytics error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/analytics/students/<int:person_id>', methods=['GET'])
+@token_required
+def get_student_analytics(person_id):
+    """Per-subject attendance rates for one student"""
+    try:
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+
+        cursor = conn.cursor()
+        subjects = aggregates.student_subjects(cursor, person_id)
+        cursor.close()
+        return jsonify({'success': True, 'person_id': person_id, 'subjects': subjects})
+
+    except Exception as e:
+        logger.error(f"Student analytics error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def term_report(cursor):
+    """The cached TermReport for ?from=&to= dates, or for ?term= (default: the current term)"""
+    if request.args.get('from') or request.args.get('to'):
+        term = None
+        last_day = datetime.fromisoformat(request.args.get('to', datetime.now().date().isoformat())).date()
+        first_day = datetime.fromisoformat(
+            request.args.get('from', (last_day - timedelta(days=120)).isoformat())
+        ).date()
+    else:
+        term, first_day, last_day = report_engine.term_range(cursor, request.args.get('term'))
+    report = term_reports.get(cursor, first_day, last_day)
+    return report, {'term': term, 'from': first_day.isoformat(), 'to': last_day.isoformat()}
+
+@app.route('/analytics/reports/sections/<int:section_id>', methods=['GET'])
+@token_required
+def get_section_report(section_id):
+    """Term attendance percentage and late ratio per student and subject for a section"""
+    try:
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+
+        cursor = conn.cursor()
+        report, term = term_report(cursor)
+        cursor.close()
+        return jsonify({'success': True, **term, **report.section(section_id)})
+
+    except LookupError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid date: {e}'}), 400
+    except Exception as e:
+        logger.error(f"Section report error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/analytics/reports/defaulters', methods=['GET'])
+@token_required
+def get_defaulters():
+    """Students below ?threshold= percent for the term, overall or with ?by=subject in any subject"""
+    try:
+        threshold = request.args.get('threshold', app.config['REPORT_DEFAULTER_THRESHOLD'], type=float)
+        section_id = request.args.get('section_id', type=int)
+        by_subject = request.args.get('by') == 'subject'
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+
+        cursor = conn.cursor()
+        report, term = term_report(cursor)
+        cursor.close()
+        students = report.defaulters(threshold, section_id=section_id, by_subject=by_subject)
+        return jsonify({
+            'success': True,
+            **term,
+            'threshold': threshold,
+            'section_id': section_id,
+            'by': 'subject' if by_subject else 'overall',
+            'count': len(students),
+            'students': students
+        })
+
+    except LookupError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid date: {e}'}), 400
+    except Exception as e:
+        logger.error(f"Defaulters report error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/analytics/aggregates/consistency', methods=['GET'])
+@token_required
+def check_aggregates():
+    """Compare the aggregate tables against a full recompute (admin only)"""
+    try:
+        if g.role != 'admin':
+            return jsonify({'success': False, 'error': 'Admin access required'}), 403
+
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+
+        cursor = conn.cursor()
+        started = time.monotonic()
+        report = aggregates.check_consistency(cursor)
+        cursor.close()
+        report['elapsed_ms'] = round((time.monotonic() - started) * 1000, 1)
+        if not report['consistent']:
+            logger.error(f"Attendance aggregates drifted: {report}")
+        return jsonify({'success': True, **report})
+
+    except Exception as e:
+        logger.error(f"Aggregate consistency check error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/debug/sql', methods=['GET'])
+@token_required
+def sql_statements():
+    """Heaviest statements this worker has run, by total time or ?order=calls|rows|max (admin only)"""
+    try:
+        if g.role != 'admin':
+            return jsonify({'success': False, 'error': 'Admin access required'}), 403
+
+        order = request.args.get('order', 'seconds')
+        if order not in ('seconds', 'calls', 'rows', 'max'):
+            return jsonify({'success': False, 'error': 'order must be seconds, calls, rows or max'}), 400
+        limit = min(request.args.get('limit', 20, type=int), 200)
+        return jsonify({
+            'success': True,
+            'worker': os.getpid(),
+            'stats': sql_trace.stats(),
+            'statements': sql_trace.top_statements(limit, order),
+        })
+
+    except Exception as e:
+        logger.error(f"SQL statement stats error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/attendance/export', methods=['GET'])
+@token_required
+def export_attendance():
+    """Stream attendance as CSV or NDJSON, filtered by section, schedule and date range"""
+    try:
+        fmt = request.args.get('format', 'csv').lower()
+        if fmt not in attendance_export.FORMATS:
+            return jsonify({'success': False, 'error': 'format must be csv or ndjson'}), 400
+        gzip = request.args.get('gzip', 'false').lower() == 'true'
+        section_id = request.args.get('section_id', type=int)
+        schedule_id = request.args.get('schedule_id', type=int)
+        date_from = request.args.get('from')
+        date_to = request.args.get('to')
+        for value in (date_from, date_to):
+            if value:
+                datetime.fromisoformat(value)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid date: {e}'}), 400
+
+    sql, params = attendance_export.build_query(section_id, schedule_id, date_from or None, date_to or None)
+
+    # The stream outlives this request's pooled connection, so it holds its own
+    conn = db_pool.borrow()
+    if conn is None:
+        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+
+    mimetype, extension = attendance_export.FORMATS[fmt]
+    filename = f"attendance_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    if gzip:
+        mimetype, filename = 'application/gzip', filename + '.gz'
+    body = attendance_export.stream_export(
+        conn, fmt, sql, params, chunk_size=app.config['EXPORT_CHUNK_SIZE'], gzip=gzip
+    )
+    response = Response(body, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs when the server finishes or abandons the stream, even if it never started
+    response.call_on_close(lambda: db_pool.release(conn))
+    return response
+
+# Compiled once at import; it uses no request context, so it is rendered once too
+INDEX_TEMPLATE = app.jinja_env.from_string("""
     <!DOCTYPE html>
     <html>
     <head>
@@ -518,36 +1433,74 @@ def serve_index():
     </body>
     </html>
     """)
+index_page = static_files.page(INDEX_TEMPLATE.render())
+
+@app.route('/')
+def serve_index():
+    """Serve main index page"""
+    return static_files.respond(index_page, request)
 
 @app.route('/<path:path>')
 def serve_static(path):
-    """Serve static files"""
+    """Serve static files, from memory when cached"""
+    if static_files.refuses(path):
+        return jsonify({'error': 'File not found'}), 404
     try:
+        asset = static_files.lookup(path)
+        if asset is not None:
+            return static_files.respond(asset, request)
         return send_from_directory('.', path)
     except FileNotFoundError:
         return jsonify({'error': 'File not found'}), 404
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus text exposition for every worker on this host"""
+    try:
+        return Response(metrics_exporter.render(), mimetype='text/plain; version=0.0.4')
+    except Exception as e:
+        logger.error(f"Metrics error: {e}")
+        return Response(f'# metrics unavailable: {e}\n', status=500, mimetype='text/plain')
+
 @app.route('/health')
 def health_check():
-    """Enhanced health check"""
+    """Liveness and readiness only, answered from state the health monitor refreshes in the background"""
     try:
-        conn = get_db_connection()
-        db_status = 'connected'
-        if conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM persons')
-            student_count = cursor.fetchone()[0] if cursor.fetchone() else 0
-            cursor.close()
-            conn.close()
-        else:
-            db_status = 'disconnected'
-            student_count = 0
+        state = health_monitor.snapshot()
+        return jsonify({
+            'status': 'healthy',
+            'ready': state['database'] == 'connected',
+            'timestamp': datetime.utcnow().isoformat(),
+            'database': state['database'],
+            'database_check_stale': state['stale'],
+            'version': '2.1.0',
+        })
+
+    except Exception as e:
+        return jsonify({
+            'status': 'unhealthy',
+            'error': str(e),
+            'timestamp': datetime.utcnow().isoformat()
+        }), 503
+
+@app.route('/health/details')
+@token_required
+def health_details():
+    """Health plus this worker's pool, cache and background writer stats (admin only)"""
+    try:
+        if g.role != 'admin':
+            return jsonify({'success': False, 'error': 'Admin access required'}), 403
 
+        state = health_monitor.snapshot()
         return jsonify({
             'status': 'healthy',
             'timestamp': datetime.utcnow().isoformat(),
-            'database': db_status,
-            'student_count': student_count,
+            'database': state['database'],
+            'student_count': state['student_count'],
+            'database_checked_at': state['checked_at'],
+            'database_check_ms': state['check_ms'],
+            'database_check_stale': state['stale'],
+            **component_stats(),
             'features': {
                 'rfid_scanning': 'active',
                 'face_recognition': 'active',